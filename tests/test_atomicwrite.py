@@ -0,0 +1,168 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import stat
+import time
+import pytest
+import mock
+from wificontrol.utils.atomicwrite import AtomicWriter, atomic_write, get_writer
+from wificontrol.utils.fileupdater import ConfigurationFileUpdater
+from wificontrol.wificommon import WiFi
+
+
+@pytest.fixture
+def config(tmpdir):
+    config = tmpdir.join('hostapd.conf')
+    config.write('interface=wlan0\nssid=reach\nwpa_passphrase=emlidreach\n')
+    os.chmod(str(config), 0o640)
+    return config
+
+
+class TestAtomicWrite:
+    def test_replaces_file(self, config, tmpdir):
+        atomic_write(str(config), 'ssid=other\n')
+
+        assert config.read() == 'ssid=other\n'
+        assert stat.S_IMODE(os.stat(str(config)).st_mode) == 0o640
+        assert tmpdir.listdir() == [config]
+
+    def test_original_kept_on_failure(self, config, tmpdir, monkeypatch):
+        def failing_rename(source, target):
+            raise OSError("No space left on device")
+        monkeypatch.setattr(os, 'rename', failing_rename)
+
+        with pytest.raises(OSError):
+            atomic_write(str(config), 'ssid=other\n')
+
+        assert 'ssid=reach' in config.read()
+        assert tmpdir.listdir() == [config]
+
+    def test_directory_synced(self, config):
+        with mock.patch('os.fsync') as fsync:
+            atomic_write(str(config), 'ssid=other\n')
+        assert fsync.call_count == 2
+
+
+class TestAtomicWriter:
+    def test_immediate_write(self, config):
+        writer = AtomicWriter(str(config))
+        writer.write('ssid=other\n')
+
+        assert config.read() == 'ssid=other\n'
+        assert not writer.has_pending()
+
+    def test_burst_coalesced(self, config):
+        writer = AtomicWriter(str(config))
+        for index in range(20):
+            writer.write('ssid=net{}\n'.format(index), delay=10)
+
+        assert writer.read() == 'ssid=net19\n'
+        assert 'ssid=reach' in config.read()
+
+        writer.flush()
+        assert config.read() == 'ssid=net19\n'
+        assert writer.writes == 1
+
+    def test_written_after_delay(self, config):
+        writer = AtomicWriter(str(config))
+        writer.write('ssid=first\n', delay=0.05)
+        writer.write('ssid=second\n', delay=0.05)
+        time.sleep(0.2)
+
+        assert config.read() == 'ssid=second\n'
+        assert writer.writes == 1
+
+    def test_shared_writer(self, config):
+        assert get_writer(str(config)) is get_writer(str(config))
+
+
+class TestWiFiFiles:
+    def setup_method(self):
+        with mock.patch('wificontrol.wificommon.SystemdManager'):
+            self.wifi = WiFi('wlan0')
+
+    def test_edit_config(self, config):
+        with self.wifi.edit_config(str(config)) as hostapd_config:
+            hostapd_config.set('ssid', 'other')
+
+        assert config.read() == \
+            'interface=wlan0\nssid=other\nwpa_passphrase=emlidreach\n'
+
+    def test_delayed_edits_visible(self, config):
+        self.wifi.write_delay = 10
+        with self.wifi.edit_config(str(config)) as hostapd_config:
+            hostapd_config.set('ssid', 'other')
+        with self.wifi.edit_config(str(config)) as hostapd_config:
+            hostapd_config.set('wpa_passphrase', 'secret')
+
+        assert self.wifi.read_config(str(config)).get('ssid') == 'other'
+        assert 'ssid=reach' in config.read()
+
+        self.wifi.flush(str(config))
+        assert config.read() == \
+            'interface=wlan0\nssid=other\nwpa_passphrase=secret\n'
+        assert get_writer(str(config)).writes == 1
+
+    def test_flushed_before_unit_action(self, config):
+        self.wifi.write_delay = 10
+        with self.wifi.edit_config(str(config)) as hostapd_config:
+            hostapd_config.set('ssid', 'other')
+
+        unit = mock.Mock()
+        unit.start.side_effect = lambda: \
+            'ssid=other' in config.read() or pytest.fail("not flushed")
+        self.wifi.control_unit(unit, "start")
+
+
+def test_burst_benchmark(tmpdir):
+    def run(write_delay):
+        config = tmpdir.join('wpa_supplicant_{}.conf'.format(write_delay))
+        config.write('ctrl_interface=/var/run/wpa_supplicant\n')
+        updater = ConfigurationFileUpdater(str(config),
+                                           write_delay=write_delay)
+        start = time.time()
+        for index in range(50):
+            updater.add_network({'ssid': 'net{}'.format(index),
+                                 'psk': 'password', 'key_mgmt': 'WPA-PSK'})
+        updater.flush()
+        return time.time() - start, get_writer(str(config)).writes
+
+    immediate_time, immediate_writes = run(0)
+    coalesced_time, coalesced_writes = run(10)
+
+    assert immediate_writes == 50
+    assert coalesced_writes == 1
+    assert coalesced_time < immediate_time
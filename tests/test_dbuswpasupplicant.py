@@ -0,0 +1,600 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import pytest
+import mock
+import dbus
+from wificontrol.utils.dbuswpasupplicant import ProxyCache, WpaSupplicantDBus
+from wificontrol.utils.dbuswpasupplicant import PropertyError
+from wificontrol.utils import WpaSupplicantInterface, WpaSupplicantBSS
+from wificontrol.utils import BSSTable, NetworkIndex
+
+SYSTEM_BUS = 'wificontrol.utils.dbuswpasupplicant.get_system_bus'
+
+
+@pytest.fixture
+def bss_paths():
+    base = "/fi/w1/wpa_supplicant1/Interfaces/1/BSSs/{}"
+    return [base.format(index) for index in range(60)]
+
+
+class TestProxyCache:
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.interface_patcher = mock.patch('dbus.Interface')
+        self.cache_patcher = mock.patch.object(WpaSupplicantDBus,
+                                               '_proxy_cache', ProxyCache())
+        self.bus_patcher.start()
+        self.interface_patcher.start()
+        self.cache_patcher.start()
+
+        self.interface = WpaSupplicantInterface('wlan0')
+        self.interface._interface_path = "/fi/w1/wpa_supplicant1/Interfaces/1"
+        self.bus = self.interface._bus
+
+    def teardown_method(self):
+        self.cache_patcher.stop()
+        self.interface_patcher.stop()
+        self.bus_patcher.stop()
+
+    def test_proxy_reused_for_same_path(self):
+        for _ in range(10):
+            self.interface.get_state()
+
+        statistics = self.interface.get_proxy_statistics()
+
+        assert self.bus.get_object.call_count == 1
+        assert statistics['created'] == 1
+        assert statistics['hits'] == 9
+
+    def test_proxy_shared_between_managers(self, bss_paths):
+        bss_manager = WpaSupplicantBSS()
+
+        for _ in range(4):
+            for bss_path in bss_paths:
+                bss_manager.get_signal(bss_path)
+
+        statistics = bss_manager.get_proxy_statistics()
+
+        assert statistics['created'] == len(bss_paths)
+        assert statistics['hits'] == 3 * len(bss_paths)
+
+    def test_eviction_on_object_removed(self, bss_paths):
+        bss_manager = WpaSupplicantBSS()
+        bss_manager.get_signal(bss_paths[0])
+
+        bss_manager._proxy_cache._object_removed(bss_paths[0])
+        bss_manager.get_signal(bss_paths[0])
+
+        assert self.bus.get_object.call_count == 2
+
+    def test_eviction_on_interface_removed(self, bss_paths):
+        bss_manager = WpaSupplicantBSS()
+        self.interface.get_state()
+        bss_manager.get_signal(bss_paths[0])
+
+        self.interface._proxy_cache._interface_removed(
+            self.interface._interface_path)
+
+        assert self.interface.get_proxy_statistics()['cached'] == 0
+
+    def test_eviction_on_owner_change(self):
+        self.interface.get_state()
+        self.interface._proxy_cache._name_owner_changed(
+            WpaSupplicantDBus._BASE_NAME, ':1.10', ':1.11')
+        self.interface.get_state()
+
+        assert self.bus.get_object.call_count == 2
+
+    def test_signals_watched_once(self):
+        WpaSupplicantBSS()
+        WpaSupplicantBSS()
+
+        assert self.bus.add_signal_receiver.call_count == 4
+
+    def test_bus_without_main_loop(self):
+        def get_object(service, path, follow_name_owner_changes=False):
+            if follow_name_owner_changes:
+                raise RuntimeError("no main loop")
+            return mock.MagicMock()
+
+        bus = mock.MagicMock()
+        bus.get_object.side_effect = get_object
+        bus.add_signal_receiver.side_effect = RuntimeError("no main loop")
+        cache = ProxyCache()
+
+        cache.watch(bus, WpaSupplicantDBus._BASE_NAME,
+                    WpaSupplicantDBus._INTERFACE_NAME)
+        cache.get(bus, WpaSupplicantDBus._BASE_NAME,
+                  WpaSupplicantDBus._BASE_PATH, WpaSupplicantDBus._BASE_NAME)
+        cache.get(bus, WpaSupplicantDBus._BASE_NAME,
+                  WpaSupplicantDBus._BASE_PATH, WpaSupplicantDBus._BASE_NAME)
+
+        assert cache.get_statistics() == {'created': 1, 'hits': 1,
+                                          'cached': 1}
+        bus.get_object.assert_called_with(WpaSupplicantDBus._BASE_NAME,
+                                          WpaSupplicantDBus._BASE_PATH)
+
+
+class TestWpaSupplicantBSS:
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(
+            'wificontrol.utils.dbuswpasupplicant.start_signal_loop')
+        self.bus_patcher.start()
+        self.loop_patcher.start()
+
+        self.bss_manager = WpaSupplicantBSS()
+        self.failing = set()
+        self.silent = set()
+        self.properties = {}
+        self.bss_manager._get_dbus_interface = mock.Mock(
+            side_effect=self.get_dbus_interface)
+
+    def teardown_method(self):
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def get_dbus_interface(self, path, interface_name):
+        if path not in self.properties:
+            properties = mock.MagicMock()
+            properties.GetAll.side_effect = \
+                lambda name, reply_handler=None, error_handler=None, \
+                timeout=None: self.get_all(path, reply_handler, error_handler)
+            self.properties[path] = properties
+        return self.properties[path]
+
+    def get_all(self, path, reply_handler, error_handler):
+        properties = {
+            'SSID': list('Test'),
+            'BSSID': [0, 1, 2, 3, 4, 255],
+        }
+        if path in self.silent:
+            return
+        if reply_handler is None:
+            return properties
+        if path in self.failing:
+            error_handler(dbus.exceptions.DBusException("Unknown object"))
+        else:
+            reply_handler(properties)
+
+    def test_get_many(self, bss_paths):
+        snapshots = self.bss_manager.get_many(bss_paths)
+
+        assert len(snapshots) == len(bss_paths)
+        for properties in self.properties.values():
+            assert properties.GetAll.call_count == 1
+            assert properties.Get.call_count == 0
+
+    def test_get_many_errors_per_item(self, bss_paths):
+        self.failing.add(bss_paths[1])
+
+        snapshots = self.bss_manager.get_many(bss_paths[:3])
+
+        assert isinstance(snapshots[1], PropertyError)
+        assert snapshots[0]['SSID'] == list('Test')
+        assert snapshots[2]['SSID'] == list('Test')
+
+    def test_get_many_missing_reply(self, bss_paths):
+        self.silent.add(bss_paths[0])
+
+        snapshots = self.bss_manager._get_all_many(
+            bss_paths[:2], WpaSupplicantBSS._BSS_NAME, timeout=0.1)
+
+        assert isinstance(snapshots[0], PropertyError)
+        assert snapshots[1]['SSID'] == list('Test')
+
+    def test_get_many_in_signal_loop(self, bss_paths):
+        self.failing.add(bss_paths[1])
+
+        with mock.patch('wificontrol.utils.dbuswpasupplicant.in_signal_loop',
+                        return_value=True):
+            snapshots = self.bss_manager.get_many(bss_paths[:2])
+
+        assert snapshots[0]['SSID'] == list('Test')
+
+    def test_decode(self, bss_paths):
+        properties = self.bss_manager.get_all(bss_paths[0])
+
+        assert self.bss_manager.decode_SSID(properties['SSID']) == 'Test'
+        assert self.bss_manager.decode_BSSID(properties['BSSID']) == \
+            '00:01:02:03:04:ff'
+
+
+class TestInterfaceMirror:
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(
+            'wificontrol.utils.dbuswpasupplicant.start_signal_loop')
+        self.bus_patcher.start()
+        self.loop_patcher.start()
+
+        self.receivers = {}
+        self.properties = mock.MagicMock()
+        self.properties.GetAll.return_value = {
+            'State': 'completed',
+            'Scanning': False,
+            'BSSs': ['/bss/1'],
+        }
+
+        self.interface = WpaSupplicantInterface('wlan0', mirror=True)
+        self.interface._get_dbus_interface = mock.Mock(
+            return_value=self.properties)
+        self.interface.get_interface = mock.Mock(
+            return_value="/fi/w1/wpa_supplicant1/Interfaces/1")
+        self.interface._bus.add_signal_receiver.side_effect = \
+            self.add_signal_receiver
+
+        self.interface.initialize()
+
+    def teardown_method(self):
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def add_signal_receiver(self, handler, signal_name, **kwargs):
+        self.receivers[signal_name] = handler
+        return mock.MagicMock()
+
+    def test_getters_served_from_mirror(self):
+        for _ in range(10):
+            assert self.interface.get_state() == 'completed'
+            assert self.interface.get_scanning() is False
+            assert self.interface.get_BSSs() == ['/bss/1']
+
+        assert self.properties.GetAll.call_count == 1
+        assert self.properties.Get.call_count == 0
+
+    def test_mirror_follows_signals(self):
+        self.receivers['PropertiesChanged']({'State': 'scanning',
+                                             'Scanning': True})
+
+        assert self.interface.get_state() == 'scanning'
+        assert self.interface.get_scanning() is True
+        assert self.properties.Get.call_count == 0
+
+    def test_stale_mirror(self):
+        self.receivers['NameOwnerChanged'](WpaSupplicantDBus._BASE_NAME,
+                                           ':1.10', '')
+        assert self.interface.stale
+
+        self.interface.get_state()
+        assert self.properties.Get.call_count == 1
+
+        self.interface.refresh()
+        assert not self.interface.stale
+        assert self.interface.get_state() == 'completed'
+        assert self.properties.Get.call_count == 1
+
+    def test_initialize_refreshes_stale_mirror(self):
+        self.receivers['InterfaceRemoved'](
+            "/fi/w1/wpa_supplicant1/Interfaces/1")
+        assert self.interface.stale
+
+        self.interface.initialize()
+        assert not self.interface.stale
+        assert self.properties.GetAll.call_count == 2
+
+
+class TestBSSTable:
+    INTERFACE_PATH = "/fi/w1/wpa_supplicant1/Interfaces/1"
+
+    def bss(self, ssid, last_byte):
+        return {
+            'SSID': list(ssid),
+            'BSSID': [0, 1, 2, 3, 4, last_byte],
+            'WPA': {},
+            'RSN': {},
+            'Signal': -50,
+        }
+
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(
+            'wificontrol.utils.dbuswpasupplicant.start_signal_loop')
+        self.bus_patcher.start()
+        self.loop_patcher.start()
+
+        self.receivers = {}
+        self.bss_list = {
+            self.INTERFACE_PATH + '/BSSs/0': self.bss('first', 0),
+            self.INTERFACE_PATH + '/BSSs/1': self.bss('second', 1),
+        }
+
+        self.interface = mock.MagicMock()
+        self.interface.get_interface_path.return_value = self.INTERFACE_PATH
+        self.interface.get_BSSs.side_effect = lambda: sorted(self.bss_list)
+        self.interface.add_signal_receiver.side_effect = \
+            lambda signal_name, handler: self.add_signal_receiver(handler,
+                                                                  signal_name)
+
+        self.table = BSSTable(self.interface)
+        self.table.get_all = mock.Mock(
+            side_effect=lambda path: self.bss_list[path])
+        self.table.get_many = lambda paths: [self.table.get_all(path)
+                                             for path in paths]
+        self.table._bus.add_signal_receiver.side_effect = \
+            self.add_signal_receiver
+
+        self.table.start()
+
+    def teardown_method(self):
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def add_signal_receiver(self, handler, signal_name, **kwargs):
+        self.receivers[signal_name] = handler
+        return mock.MagicMock()
+
+    def test_initial_sync(self):
+        assert self.table.synced
+        assert self.table.get_all.call_count == 2
+        assert [record.ssid for record in self.table.get_records()] == \
+            ['first', 'second']
+        assert self.table.find_bssid('00:01:02:03:04:01').ssid == 'second'
+
+    def test_bss_added_and_removed(self):
+        path = self.INTERFACE_PATH + '/BSSs/2'
+        self.receivers['BSSAdded'](path, self.bss('third', 2))
+
+        assert self.table.is_visible('third')
+        assert self.table.find_ssid('third')[0].path == path
+
+        self.receivers['BSSRemoved'](path)
+
+        assert not self.table.is_visible('third')
+        assert self.table.find_bssid('00:01:02:03:04:02') is None
+        assert self.table.get_all.call_count == 2
+
+    def test_bss_properties_changed(self):
+        path = self.INTERFACE_PATH + '/BSSs/0'
+        properties = {'Signal': -30, 'SSID': list('new')}
+        self.receivers['PropertiesChanged'](properties, path=path)
+
+        record = self.table.get_record(path)
+        assert record.signal == -30
+        assert self.table.is_visible('new')
+        assert not self.table.is_visible('first')
+
+    def test_readers_take_lock(self):
+        path = self.INTERFACE_PATH + '/BSSs/0'
+        self.table._lock = mock.MagicMock()
+
+        assert self.table.get_record(path).ssid == 'first'
+        assert self.table.is_visible('second')
+        assert self.table._lock.__enter__.call_count == 2
+        assert self.table._lock.__exit__.call_count == 2
+
+    def test_resync_after_service_restart(self):
+        self.receivers['NameOwnerChanged'](WpaSupplicantDBus._BASE_NAME,
+                                           ':1.10', ':1.11')
+        assert not self.table.synced
+
+        self.table.start()
+        assert self.table.synced
+        assert self.table.get_all.call_count == 4
+
+
+class TestNetworkIndex:
+    INTERFACE_PATH = "/fi/w1/wpa_supplicant1/Interfaces/1"
+
+    def network(self, ssid):
+        return {'Enabled': True, 'Properties': {'ssid': '"{}"'.format(ssid)}}
+
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(
+            'wificontrol.utils.dbuswpasupplicant.start_signal_loop')
+        self.bus_patcher.start()
+        self.loop_patcher.start()
+
+        self.receivers = {}
+        self.networks = {}
+        for index in range(40):
+            path = self.INTERFACE_PATH + '/Networks/{}'.format(index)
+            self.networks[path] = self.network('net{}'.format(index))
+
+        self.interface = mock.MagicMock()
+        self.interface.get_interface_path.return_value = self.INTERFACE_PATH
+        self.interface.get_networks.side_effect = lambda: sorted(self.networks)
+        self.interface.add_signal_receiver.side_effect = \
+            lambda signal_name, handler: self.add_signal_receiver(handler,
+                                                                  signal_name)
+
+        self.index = NetworkIndex(self.interface)
+        self.index.get_all = mock.Mock(
+            side_effect=lambda path: self.networks[path])
+        self.index.get_many = lambda paths: [self.index.get_all(path)
+                                             for path in paths]
+        self.index._bus.add_signal_receiver.side_effect = \
+            self.add_signal_receiver
+
+        self.index.start()
+
+    def teardown_method(self):
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def add_signal_receiver(self, handler, signal_name, **kwargs):
+        self.receivers[signal_name] = handler
+        return mock.MagicMock()
+
+    def test_lookup_without_round_trips(self):
+        path = self.INTERFACE_PATH + '/Networks/39'
+
+        for _ in range(10):
+            assert self.index.find_path('net39') == path
+
+        assert self.index.get_all.call_count == len(self.networks)
+        assert self.index.hits == 9
+        assert self.index.misses == 1
+
+    def test_index_follows_signals(self):
+        self.index.find_path('net0')
+        path = self.INTERFACE_PATH + '/Networks/40'
+
+        self.receivers['NetworkAdded'](path, self.network('added'))
+        assert self.index.find_path('added') == path
+
+        self.receivers['NetworkRemoved'](self.INTERFACE_PATH + '/Networks/0')
+        del self.networks[self.INTERFACE_PATH + '/Networks/0']
+
+        assert self.index.find_path('net0') is None
+        assert self.index.misses == 2
+
+    def test_rebuild_on_miss(self):
+        self.index.find_path('net0')
+
+        path = self.INTERFACE_PATH + '/Networks/40'
+        self.networks[path] = self.network('unsignalled')
+
+        assert self.index.find_path('unsignalled') == path
+
+    def test_ssid_by_path(self):
+        path = self.INTERFACE_PATH + '/Networks/7'
+
+        for _ in range(10):
+            assert self.index.get_ssid(path) == 'net7'
+
+        assert self.index.get_ssid('/') is None
+        assert self.index.get_all.call_count == len(self.networks)
+
+
+class TestInterfacePath:
+    INTERFACE_PATH = "/fi/w1/wpa_supplicant1/Interfaces/1"
+
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(
+            'wificontrol.utils.dbuswpasupplicant.start_signal_loop')
+        self.bus_patcher.start()
+        self.loop_patcher.start()
+
+        self.receivers = {}
+        self.interface = WpaSupplicantInterface('wlan0')
+        self.interface.get_interface = mock.Mock(
+            return_value=self.INTERFACE_PATH)
+        self.interface._bus.add_signal_receiver.side_effect = \
+            self.add_signal_receiver
+
+    def teardown_method(self):
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def add_signal_receiver(self, handler, signal_name, **kwargs):
+        self.receivers[signal_name] = handler
+        return mock.MagicMock()
+
+    def test_path_resolved_once(self):
+        for _ in range(10):
+            self.interface.initialize()
+
+        assert self.interface.get_interface.call_count == 1
+        assert self.interface.get_interface_path() == self.INTERFACE_PATH
+
+    def test_path_invalidation(self):
+        self.interface.initialize()
+
+        self.receivers['InterfaceAdded']("/fi/w1/wpa_supplicant1/Interfaces/2",
+                                         {'Ifname': 'p2p-dev-wlan0'})
+        self.interface.initialize()
+        assert self.interface.get_interface.call_count == 1
+
+        self.receivers['InterfaceRemoved'](self.INTERFACE_PATH)
+        self.interface.initialize()
+        assert self.interface.get_interface.call_count == 2
+
+        self.receivers['InterfaceAdded']("/fi/w1/wpa_supplicant1/Interfaces/3",
+                                         {'Ifname': 'wlan0'})
+        self.interface.initialize()
+        assert self.interface.get_interface.call_count == 3
+
+        self.receivers['NameOwnerChanged'](WpaSupplicantDBus._BASE_NAME,
+                                           ':1.10', '')
+        self.interface.initialize()
+        assert self.interface.get_interface.call_count == 4
+
+
+class TestInterfaceScan:
+    def setup_method(self):
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.bus_patcher.start()
+
+        self.dbus_interface = mock.MagicMock()
+        self.interface = WpaSupplicantInterface('wlan0')
+        self.interface._get_dbus_interface = mock.Mock(
+            return_value=self.dbus_interface)
+
+    def teardown_method(self):
+        self.bus_patcher.stop()
+
+    def scan_args(self):
+        return self.dbus_interface.Scan.call_args[0][0]
+
+    def test_default_scan(self):
+        self.interface.scan()
+        assert self.scan_args() == {'Type': 'passive'}
+
+    def test_targeted_scan(self):
+        self.interface.scan(ssids=['home', u'\u0434\u043e\u043c'],
+                            channels=[1, 14, 36, 5180, (2437, 40)],
+                            allow_roam=False)
+        args = self.scan_args()
+
+        assert args['Type'] == 'active'
+        assert [bytes(ssid) for ssid in args['SSIDs']] == \
+            [b'home', u'\u0434\u043e\u043c'.encode('utf-8')]
+        assert [tuple(channel) for channel in args['Channels']] == \
+            [(2412, 20), (2484, 20), (5180, 20), (5180, 20), (2437, 40)]
+        assert not args['AllowRoam']
+
+    def test_passive_channel_scan(self):
+        self.interface.scan(scan_type='passive', channels=[6])
+        args = self.scan_args()
+
+        assert args['Type'] == 'passive'
+        assert 'SSIDs' not in args
+
+    def test_hex_psk_sent_as_bytes(self):
+        psk = 'f42c6fc52df0ebef9ebb4b90b38a5f902e83fe1b135a70e23aed762e9710a12e'
+
+        self.interface.add_network({'ssid': 'IEEE', 'psk': psk})
+        args = self.dbus_interface.AddNetwork.call_args[0][0]
+        assert isinstance(args['psk'], dbus.ByteArray)
+        assert bytes(args['psk']) == bytes(bytearray.fromhex(psk))
+
+        self.interface.add_network({'ssid': 'IEEE', 'psk': 'password'})
+        args = self.dbus_interface.AddNetwork.call_args[0][0]
+        assert args['psk'] == 'password'
@@ -0,0 +1,185 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import time
+import pytest
+from wificontrol.utils.fileupdater import ConfigurationFileUpdater, NetworkTemplate
+
+
+def psk_network(ssid, proto=None):
+    network = {'ssid': ssid, 'psk': 'password', 'key_mgmt': 'WPA-PSK'}
+    if proto:
+        network['proto'] = proto
+    return network
+
+
+@pytest.fixture
+def config(tmpdir):
+    config = tmpdir.join('wpa_supplicant.conf')
+    config.write('ctrl_interface=/var/run/wpa_supplicant\nupdate_config=1\n')
+    return config
+
+
+class TestNetworkStore:
+    def test_order_kept(self, config):
+        updater = ConfigurationFileUpdater(str(config))
+        for name in ('c', 'a', 'b'):
+            updater.add_network(psk_network(name))
+        updater.remove_network({'ssid': 'a'})
+
+        assert [network['ssid'] for network in updater.networks] == ['c', 'b']
+        assert [network['ssid'] for network in
+                ConfigurationFileUpdater(str(config)).networks] == ['c', 'b']
+
+    def test_find_network(self, config):
+        updater = ConfigurationFileUpdater(str(config))
+        updater.add_network(psk_network('home'))
+
+        assert updater.find_network({'ssid': 'home'})['psk'] == 'password'
+        assert updater.find_network({'ssid': '"home"'}) is not None
+        assert updater.find_network({'ssid': 'work'}) is None
+
+    def test_add_and_remove_errors(self, config):
+        updater = ConfigurationFileUpdater(str(config))
+        updater.add_network(psk_network('home'))
+
+        with pytest.raises(AttributeError):
+            updater.add_network(psk_network('home'))
+        with pytest.raises(AttributeError):
+            updater.remove_network({'ssid': 'work'})
+
+    def test_duplicates_preserved(self, config):
+        config.write(''.join(str(NetworkTemplate(network)) + '\n' for network in
+                             [psk_network('home'), psk_network('work'),
+                              psk_network('home', 'RSN')]), mode='a')
+        updater = ConfigurationFileUpdater(str(config))
+
+        assert len(updater.networks) == 3
+
+        updater.remove_network({'ssid': 'home'})
+        assert [network.get('proto') for network in updater.networks] == \
+            [None, 'RSN']
+        assert updater.find_network({'ssid': 'home'})['proto'] == 'RSN'
+
+    def test_key_by_security(self, config):
+        updater = ConfigurationFileUpdater(str(config), key_by_security=True)
+        updater.add_network(psk_network('home'))
+        updater.add_network(psk_network('home', 'RSN'))
+
+        with pytest.raises(AttributeError):
+            updater.add_network(psk_network('home', 'RSN'))
+
+        assert updater.find_network(psk_network('home', 'RSN'))['proto'] == \
+            'RSN'
+        updater.remove_network(psk_network('home'))
+        assert len(updater.networks) == 1
+        updater.remove_network({'ssid': 'home'})
+        assert updater.networks == []
+
+    def test_10k_networks(self, config):
+        count = 10000
+        config.write(''.join(str(NetworkTemplate(psk_network('net{}'.format(index))))
+                             + '\n' for index in range(count)), mode='a')
+        updater = ConfigurationFileUpdater(str(config))
+        updater._ConfigurationFileUpdater__update_config_file = lambda: None
+        assert len(updater.networks) == count
+
+        start = time.time()
+        for index in range(count):
+            assert updater.find_network({'ssid': 'net{}'.format(index)})
+        for index in range(count):
+            updater.add_network(psk_network('new{}'.format(index)))
+        for index in range(count):
+            updater.remove_network({'ssid': 'net{}'.format(index)})
+        indexed_time = time.time() - start
+
+        networks = updater.networks
+        start = time.time()
+        for index in range(0, count, 100):
+            aim = 'new{}'.format(index)
+            next(network for network in networks
+                 if network['ssid'].strip("\'\"") == aim)
+        linear_time = (time.time() - start) * 100
+
+        assert len(networks) == count
+        assert networks[0]['ssid'] == 'new0'
+        assert linear_time / indexed_time > 10
+
+
+class TestBatch:
+    def test_single_write(self, config, monkeypatch):
+        updater = ConfigurationFileUpdater(str(config))
+        renames = []
+        rename = os.rename
+        monkeypatch.setattr(os, 'rename', lambda source, target: (
+            renames.append(target), rename(source, target)))
+
+        with updater.batch():
+            for index in range(50):
+                updater.add_network(psk_network('net{}'.format(index)))
+            updater.remove_network({'ssid': 'net0'})
+
+        assert renames == [str(config)]
+        assert len(ConfigurationFileUpdater(str(config)).networks) == 49
+        assert not os.path.exists(str(config) + '.tmp')
+
+    def test_rollback(self, config):
+        updater = ConfigurationFileUpdater(str(config))
+        updater.add_network(psk_network('home'))
+        content = config.read()
+
+        with pytest.raises(RuntimeError):
+            with updater.batch():
+                updater.add_network(psk_network('work'))
+                updater.remove_network({'ssid': 'home'})
+                raise RuntimeError()
+
+        assert [network['ssid'] for network in updater.networks] == ['home']
+        assert updater.find_network({'ssid': 'work'}) is None
+        assert config.read() == content
+
+    def test_add_and_remove_many(self, config):
+        updater = ConfigurationFileUpdater(str(config))
+        updater.add_network(psk_network('home'))
+
+        added = updater.add_networks([psk_network('home'),
+                                      psk_network('work')])
+        assert [network['ssid'] for network in added] == ['work']
+
+        removed = updater.remove_networks([{'ssid': 'home'}, {'ssid': 'cafe'}])
+        assert removed == [{'ssid': 'home'}]
+        assert [network['ssid'] for network in
+                ConfigurationFileUpdater(str(config)).networks] == ['work']
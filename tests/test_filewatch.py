@@ -0,0 +1,194 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import time
+import pytest
+import mock
+from threading import Event
+from wificontrol.utils.atomicwrite import atomic_write, get_writer
+from wificontrol.utils.filewatch import FileWatcher
+from wificontrol.utils.fileupdater import ConfigurationFileUpdater
+
+
+def parse_lines(stream):
+    return [line.strip() for line in stream]
+
+
+@pytest.fixture(params=[True, False], ids=['inotify', 'polling'])
+def watcher(request):
+    watcher = FileWatcher(use_inotify=request.param, poll_interval=0.05)
+    if request.param and watcher.inotify is None:
+        pytest.skip("inotify is not available")
+    yield watcher
+    watcher.stop()
+
+
+@pytest.fixture
+def hostname(tmpdir):
+    hostname = tmpdir.join('hostname')
+    hostname.write('reach\n')
+    return hostname
+
+
+def wait_for(event):
+    assert event.wait(2)
+
+
+class TestFileWatcher:
+    def test_cached_until_changed(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+
+        assert watched.get() == 'reach\n'
+        assert watched.get(parse_lines) == ['reach']
+        assert watched.get(parse_lines) is watched.get(parse_lines)
+        assert watched.reloads == 1
+
+    def test_no_reads_while_unchanged(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+        watched.get()
+
+        with mock.patch.object(get_writer(str(hostname)), 'read') as read:
+            for _ in range(100):
+                watched.get()
+        assert read.call_count == 0
+
+    def test_external_edit(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+        watched.get(parse_lines)
+        changed = Event()
+        watched.subscribe(lambda watched_file: changed.set())
+
+        hostname.write('other\n')
+        wait_for(changed)
+
+        assert watched.get() == 'other\n'
+        assert watched.get(parse_lines) == ['other']
+
+    def test_replaced_file(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+        watched.get()
+        changed = Event()
+        watched.subscribe(lambda watched_file: changed.set())
+
+        replacement = hostname.dirpath().join('hostname.new')
+        replacement.write('other\n')
+        os.rename(str(replacement), str(hostname))
+        wait_for(changed)
+
+        assert watched.get() == 'other\n'
+
+    def test_unchanged_content_not_reloaded(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+        watched.get()
+        callback = mock.Mock()
+        watched.subscribe(callback)
+
+        atomic_write(str(hostname), 'reach\n')
+        time.sleep(0.2)
+
+        assert watched.get() == 'reach\n'
+        assert watched.reloads == 1
+        assert callback.call_count == 0
+
+    def test_own_write_seen_at_once(self, watcher, hostname):
+        watched = watcher.watch(str(hostname))
+        watched.get()
+        callback = mock.Mock()
+        watched.subscribe(callback)
+
+        get_writer(str(hostname)).write('other\n', delay=10)
+        assert watched.get() == 'other\n'
+        get_writer(str(hostname)).flush()
+        time.sleep(0.2)
+
+        assert watched.get() == 'other\n'
+        assert callback.call_count == 1
+
+    def test_missing_file(self, watcher, tmpdir):
+        watched = watcher.watch(str(tmpdir.join('hostapd.conf')))
+        with pytest.raises(IOError):
+            watched.get()
+
+        changed = Event()
+        seen = []
+
+        def callback(watched_file):
+            seen.append(watched_file.data)
+            if watched_file.data:
+                changed.set()
+
+        watched.subscribe(callback)
+        tmpdir.join('hostapd.conf').write('ssid=reach\n')
+        wait_for(changed)
+
+        assert watched.get() == 'ssid=reach\n'
+        if watcher.inotify is not None:
+            assert seen == ['ssid=reach\n']
+
+
+def test_updater_reloads_external_edits(tmpdir):
+    config = tmpdir.join('wpa_supplicant.conf')
+    config.write('update_config=1\n\nnetwork={\n\tssid="home"\n}\n')
+    updater = ConfigurationFileUpdater(str(config))
+    updater.add_network({'ssid': 'work'})
+
+    assert [network['ssid'] for network in updater.networks] == \
+        ['home', 'work']
+
+    config.write('update_config=1\n\nnetwork={\n\tssid="cafe"\n}\n')
+    deadline = time.time() + 2
+    while updater.find_network({'ssid': 'cafe'}) is None:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    assert [network['ssid'] for network in updater.networks] == ['cafe']
+    updater.add_network({'ssid': 'home'})
+    assert 'ssid="cafe"' in config.read()
+
+
+def test_updater_keeps_no_copy_of_file(tmpdir):
+    config = tmpdir.join('wpa_supplicant.conf')
+    config.write('update_config=1\n\nnetwork={\n\tssid="home"\n}\n')
+    updater = ConfigurationFileUpdater(str(config))
+
+    with mock.patch('wificontrol.utils.fileupdater.WpaConfig.parse') as parse:
+        updater.add_network({'ssid': 'work'})
+        updater.remove_network({'ssid': 'home'})
+        assert [network['ssid'] for network in updater.networks] == ['work']
+    assert parse.call_count == 0
+
+    data = config.read()
+    assert not [value for value in vars(updater).values() if value == data]
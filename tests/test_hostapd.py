@@ -39,7 +39,6 @@ import pytest
 import netifaces
 
 
-@pytest.fixture
 def get_interface():
     interface = None
     for iface in netifaces.interfaces():
@@ -0,0 +1,117 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+from wificontrol.hostapd import HostAP
+from wificontrol.utils import derive_psk, get_writer
+from wificontrol.wificommon import WiFiControlError
+import pytest
+
+
+class FakeHostAP(HostAP):
+    def __init__(self, hostapd_path):
+        self.interface = 'wlan0'
+        self.hostapd_path = hostapd_path
+        self.control = None
+        self.stations = None
+
+    def get_device_mac(self):
+        return "02:00:00:17:8c:b8"
+
+
+class TestHostAPPSK:
+    def setup_method(self):
+        self.config = os.getcwd() + "/tests/test_files/hostapd.conf"
+
+    def make_hotspot(self, tmpdir):
+        hostapd_path = tmpdir.join('hostapd.conf')
+        with open(self.config) as config_file:
+            hostapd_path.write(config_file.read())
+        return FakeHostAP(str(hostapd_path)), hostapd_path
+
+    def test_precomputed_psk(self, tmpdir):
+        hotspot, hostapd_path = self.make_hotspot(tmpdir)
+
+        assert hotspot.set_hostap_password('newpassword', precompute_psk=True)
+
+        psk = derive_psk(hotspot.get_hostap_name(), 'newpassword')
+        assert 'wpa_passphrase=newpassword\nwpa_psk={}\n'.format(psk) in \
+            hostapd_path.read()
+
+    def test_psk_follows_ssid(self, tmpdir):
+        hotspot, _ = self.make_hotspot(tmpdir)
+        hotspot.set_hostap_password('newpassword', precompute_psk=True)
+
+        hotspot.set_hostap_name('other')
+
+        assert hotspot.get_hostap_name() == 'other:8c:b8'
+        assert hotspot.get_hostap_psk() == derive_psk('other:8c:b8',
+                                                      'newpassword')
+        assert hotspot.verify_hostap_password('newpassword')
+
+    def test_passphrase_only(self, tmpdir):
+        hotspot, hostapd_path = self.make_hotspot(tmpdir)
+        hotspot.set_hostap_password('newpassword', precompute_psk=True)
+
+        assert hotspot.set_hostap_password('plainpassword')
+        assert hotspot.get_hostap_psk() is None
+        assert '#wpa_psk=0123' in hostapd_path.read()
+
+    def test_single_write(self, tmpdir):
+        hotspot, hostapd_path = self.make_hotspot(tmpdir)
+        hotspot.set_hostap_password('newpassword', precompute_psk=True)
+        writer = get_writer(str(hostapd_path))
+        writes = writer.writes
+
+        hotspot.set_hostap_name('other')
+        assert writer.writes == writes + 1
+
+        data = hostapd_path.read()
+        with open(self.config) as config_file:
+            original = config_file.read()
+        assert [line for line in data.splitlines() if line.startswith('#')] == \
+            [line for line in original.splitlines() if line.startswith('#')]
+
+    def test_psk_only(self, tmpdir):
+        psk = derive_psk('reach', 'emlidreach')
+        hostapd_path = tmpdir.join('hostapd.conf')
+        hostapd_path.write('ssid=reach\nwpa=2\nwpa_psk={}\n'.format(psk))
+        hotspot = FakeHostAP(str(hostapd_path))
+
+        with pytest.raises(WiFiControlError):
+            hotspot.set_hostap_name('other')
+
+        assert hostapd_path.read() == \
+            'ssid=reach\nwpa=2\nwpa_psk={}\n'.format(psk)
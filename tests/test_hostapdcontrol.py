@@ -0,0 +1,379 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import socket
+import pytest
+from collections import OrderedDict
+from threading import Event, Thread
+from wificontrol.hostapd import HostAP
+from wificontrol.utils import HostapdControl, HostapdControlError, StationTable
+from wificontrol.wificommon import WiFiControlError
+
+
+STATIONS = OrderedDict([
+    ('02:00:00:00:00:01', 'signal=-40\nrx_bytes=1200\ntx_bytes=3400\n'
+                          'connected_time=15\n'),
+    ('02:00:00:00:00:02', 'signal=-71\nrx_bytes=10\ntx_bytes=20\n'
+                          'connected_time=3\n'),
+])
+
+
+class FakeHostapd(object):
+    def __init__(self, path):
+        self.path = path
+        self.commands = []
+        self.config = {}
+        self.failing = set()
+        self.events = []
+        self.attached = set()
+        self.silent = False
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(path)
+        self.socket.settimeout(0.05)
+        self.running = True
+        self.thread = Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while self.running:
+            try:
+                command, address = self.socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            self.commands.append(command)
+            if self.silent:
+                continue
+            if command == 'ATTACH':
+                self.attached.add(address)
+            elif command == 'DETACH':
+                self.attached.discard(address)
+            for event in self.events:
+                self.socket.sendto(event, address)
+            self.socket.sendto(self.handle(command), address)
+
+    def handle(self, command):
+        name, _, argument = command.partition(' ')
+        if name in self.failing:
+            return 'FAIL\n'
+        if name == 'PING':
+            return 'PONG\n'
+        if name == 'STATUS':
+            return 'state=ENABLED\nchannel=6\nssid[0]={}\n'.format(
+                self.config.get('ssid', 'reach'))
+        if name == 'SET':
+            key, value = argument.split(' ', 1)
+            self.config[key] = value
+            return 'OK\n'
+        if name in ('RELOAD', 'ENABLE', 'DISABLE', 'ATTACH', 'DETACH'):
+            return 'OK\n'
+        if name == 'STA-FIRST':
+            return self.station(0)
+        if name == 'STA-NEXT':
+            return self.station(list(STATIONS).index(argument) + 1)
+        if name == 'STA':
+            if argument not in STATIONS:
+                return 'FAIL\n'
+            return self.station(list(STATIONS).index(argument))
+        return 'UNKNOWN COMMAND\n'
+
+    def station(self, index):
+        if index >= len(STATIONS):
+            return ''
+        address = list(STATIONS)[index]
+        return '{}\n{}'.format(address, STATIONS[address])
+
+    def send_event(self, event, level=3):
+        for address in list(self.attached):
+            self.socket.sendto('<{}>{}'.format(level, event), address)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.socket.close()
+
+
+@pytest.fixture
+def hostapd(tmpdir):
+    hostapd = FakeHostapd(str(tmpdir.join('wlan0')))
+    yield hostapd
+    hostapd.stop()
+
+
+@pytest.fixture
+def control(hostapd, tmpdir):
+    control = HostapdControl(hostapd.path, local_directory=str(tmpdir),
+                             timeout=0.5)
+    yield control
+    control.close()
+
+
+class TestHostapdControl:
+    def test_ping(self, control, hostapd):
+        assert control.ping()
+        hostapd.silent = True
+        assert not control.ping()
+
+    def test_status(self, control):
+        status = control.status()
+        assert status['state'] == 'ENABLED'
+        assert status['ssid[0]'] == 'reach'
+
+    def test_set(self, control, hostapd):
+        control.set('wpa_passphrase', 'new password')
+        assert hostapd.config == {'wpa_passphrase': 'new password'}
+
+        hostapd.failing.add('SET')
+        with pytest.raises(HostapdControlError):
+            control.set('ssid', 'other')
+
+    def test_reload_enable_disable(self, control, hostapd):
+        control.disable()
+        control.enable()
+        control.reload()
+        assert hostapd.commands == ['DISABLE', 'ENABLE', 'RELOAD']
+
+    def test_stations(self, control):
+        stations = control.all_sta()
+
+        assert list(stations) == list(STATIONS)
+        assert stations['02:00:00:00:00:01']['signal'] == '-40'
+        assert stations['02:00:00:00:00:02']['connected_time'] == '3'
+        assert control.sta('02:00:00:00:00:02')['rx_bytes'] == '10'
+        assert control.sta('02:00:00:00:00:09') is None
+
+    def test_events_skipped(self, control, hostapd):
+        hostapd.events.append('<3>AP-STA-CONNECTED 02:00:00:00:00:03')
+        assert control.ping()
+
+    def test_attach(self, control, hostapd):
+        control.attach()
+        assert control.attached
+
+        hostapd.send_event('AP-STA-CONNECTED 02:00:00:00:00:03')
+        assert control.receive_event(0.5) == 'AP-STA-CONNECTED 02:00:00:00:00:03'
+        assert control.receive_event(0.05) is None
+
+        control.detach()
+        assert not control.attached
+        assert not hostapd.attached
+
+    def test_events_buffered(self, control, hostapd):
+        control.attach()
+        hostapd.events.append('<3>AP-STA-CONNECTED 02:00:00:00:00:03')
+        assert control.ping()
+        assert control.receive_event(0.05) == 'AP-STA-CONNECTED 02:00:00:00:00:03'
+
+    def test_no_server(self, tmpdir):
+        control = HostapdControl(str(tmpdir.join('missing')),
+                                 local_directory=str(tmpdir))
+        with pytest.raises(HostapdControlError):
+            control.request('PING')
+        assert tmpdir.listdir() == []
+
+    def test_local_socket_removed(self, control, tmpdir):
+        control.ping()
+        assert len(tmpdir.listdir()) == 2
+        control.close()
+        assert [entry.basename for entry in tmpdir.listdir()] == ['wlan0']
+
+
+class FakeHostAP(HostAP):
+    def __init__(self, hostapd_path, control):
+        self.interface = 'wlan0'
+        self.hostapd_path = hostapd_path
+        self.control = control
+        self.stations = None
+
+    def get_control(self):
+        return self.control
+
+    def get_device_mac(self):
+        return "02:00:00:17:8c:b8"
+
+
+class TestLiveConfig:
+    def make_hotspot(self, tmpdir, control):
+        config = tmpdir.join('hostapd.conf')
+        config.write('interface=wlan0\nssid=reach\nwpa_passphrase=emlidreach\n')
+        return FakeHostAP(str(config), control)
+
+    def test_password_pushed(self, tmpdir, control, hostapd):
+        hotspot = self.make_hotspot(tmpdir, control)
+
+        assert hotspot.set_hostap_password('newpassword', live=True)
+        assert hostapd.config == {'wpa_passphrase': 'newpassword'}
+        assert hostapd.commands[-1] == 'RELOAD'
+
+    def test_name_pushed(self, tmpdir, control, hostapd):
+        hotspot = self.make_hotspot(tmpdir, control)
+        hotspot.set_hostap_password('newpassword', precompute_psk=True)
+
+        hotspot.set_hostap_name('other', live=True)
+        assert hostapd.config['ssid'] == 'other:8c:b8'
+        assert hostapd.config['wpa_psk'] == hotspot.get_hostap_psk()
+
+    def test_not_pushed_by_default(self, tmpdir, control, hostapd):
+        hotspot = self.make_hotspot(tmpdir, control)
+        hotspot.set_hostap_name('other')
+        assert hostapd.commands == []
+
+    def test_not_running(self, tmpdir, control, hostapd):
+        hotspot = self.make_hotspot(tmpdir, control)
+        hostapd.silent = True
+        assert not hotspot.push_config(['ssid'])
+
+    def test_rejected(self, tmpdir, control, hostapd):
+        hotspot = self.make_hotspot(tmpdir, control)
+        hostapd.failing.add('RELOAD')
+        with pytest.raises(WiFiControlError):
+            hotspot.set_hostap_name('other', live=True)
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def stations(hostapd, tmpdir):
+    stations = StationTable(lambda: HostapdControl(
+        hostapd.path, local_directory=str(tmpdir), timeout=0.5))
+    yield stations
+    stations.stop()
+
+
+class TestStationTable:
+    def test_events(self, stations, hostapd):
+        address = '02:00:00:00:00:03'
+
+        assert stations.handle_event('AP-STA-CONNECTED ' + address)
+        assert not stations.handle_event('AP-STA-CONNECTED ' + address)
+        station, = stations.get_stations()
+        assert station['mac'] == address
+        assert station['connected_time'] == 0
+        assert station['signal'] is None
+
+        assert stations.handle_event('AP-STA-DISCONNECTED ' + address)
+        assert stations.get_stations() == []
+        assert not stations.handle_event('CTRL-EVENT-EAP-STARTED ' + address)
+        assert hostapd.commands == []
+
+    def test_refresh(self, stations, hostapd):
+        stations.handle_event('AP-STA-CONNECTED 02:00:00:00:00:03')
+
+        table = stations.get_stations(refresh=True)
+        assert [station['mac'] for station in table] == list(STATIONS)
+        assert table[0]['signal'] == -40
+        assert table[0]['rx_bytes'] == 1200
+        assert table[1]['tx_bytes'] == 20
+        assert table[0]['connected_time'] >= 15
+
+    def test_station_query(self, stations, hostapd):
+        address = '02:00:00:00:00:02'
+        stations.handle_event('AP-STA-CONNECTED ' + address)
+
+        assert stations.get_station(address)['rx_bytes'] is None
+        assert hostapd.commands == []
+
+        assert stations.get_station(address, refresh=True)['rx_bytes'] == 10
+        assert hostapd.commands == ['STA ' + address]
+        assert stations.get_station('02:00:00:00:00:09', refresh=True) is None
+
+    def test_subscribers(self, stations):
+        calls = []
+        subscriber = lambda event, station: calls.append((event, station))
+        stations.subscribe(subscriber)
+
+        stations.handle_event('AP-STA-CONNECTED 02:00:00:00:00:03')
+        stations.handle_event('AP-STA-DISCONNECTED 02:00:00:00:00:03')
+        stations.unsubscribe(subscriber)
+        stations.handle_event('AP-STA-CONNECTED 02:00:00:00:00:04')
+
+        assert [event for event, _ in calls] == [stations.CONNECTED,
+                                                 stations.DISCONNECTED]
+        assert calls[0][1]['mac'] == '02:00:00:00:00:03'
+        assert calls[1][1]['mac'] == '02:00:00:00:00:03'
+
+    def test_monitor(self, stations, hostapd):
+        disconnected = Event()
+
+        def on_event(event, station):
+            if event == stations.DISCONNECTED:
+                disconnected.set()
+        stations.subscribe(on_event)
+
+        stations.start()
+        assert wait_for(stations.is_monitoring)
+        assert len(stations.get_stations()) == len(STATIONS)
+
+        hostapd.send_event('AP-STA-DISCONNECTED 02:00:00:00:00:01')
+        assert disconnected.wait(2)
+        assert [station['mac'] for station in stations.get_stations()] == [
+            '02:00:00:00:00:02']
+
+        stations.stop()
+        assert not stations.is_monitoring()
+        assert not hostapd.attached
+
+    def test_monitor_reconnects(self, stations, hostapd):
+        stations.PING_INTERVAL = 0.1
+        stations.RETRY_INTERVAL = 0.1
+        stations.start()
+        assert wait_for(stations.is_monitoring)
+
+        hostapd.silent = True
+        assert wait_for(lambda: not stations.get_stations())
+
+        hostapd.silent = False
+        assert wait_for(lambda: len(stations.get_stations()) == len(STATIONS))
+        assert stations.is_monitoring()
+
+    def test_hotspot_stations(self, tmpdir, hostapd):
+        config = tmpdir.join('hostapd.conf')
+        config.write('interface=wlan0\nctrl_interface={}\n'.format(tmpdir))
+        hotspot = FakeHostAP(str(config), None)
+
+        assert hotspot.get_stations() == []
+        assert len(hotspot.get_stations(refresh=True)) == len(STATIONS)
+        assert hotspot.get_station('02:00:00:00:00:01')['signal'] == -40
+
+        hostapd.silent = True
+        with pytest.raises(WiFiControlError):
+            hotspot.get_station('02:00:00:00:00:01')
@@ -0,0 +1,114 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from cStringIO import StringIO
+from wificontrol.utils import KeyValueConfig
+
+CONFIG = (
+    "# hostapd configuration\n"
+    "interface=wlan0\n"
+    "#ssid=reach\n"
+    "ignore_broadcast_ssid=0\n"
+    "ssid=reach\n"
+    "wpa_passphrase=emlid=reach\n"
+    "\n"
+    "network={\n"
+    "\tssid=\"persistent\"\n"
+    "}\n"
+    "p2p_ssid_postfix=reach")
+
+
+def parse(data=CONFIG):
+    return KeyValueConfig.parse(StringIO(data))
+
+
+class TestKeyValueConfig:
+    def test_round_trip(self):
+        assert str(parse()) == CONFIG
+
+    def test_get(self):
+        config = parse()
+
+        assert config.get('ssid') == 'reach'
+        assert config.get('wpa_passphrase') == 'emlid=reach'
+        assert config.get('p2p_ssid_postfix') == 'reach'
+        assert config.get('wpa_psk') is None
+        assert config.get('wpa_psk', '') == ''
+        assert 'interface' in config
+        assert '#ssid' not in config
+
+    def test_set_existing(self):
+        config = parse()
+        config.set('ssid', 'other')
+        config.set('p2p_ssid_postfix', 'other')
+
+        assert str(config) == CONFIG.replace(
+            "\nssid=reach", "\nssid=other").replace(
+            "postfix=reach", "postfix=other")
+
+    def test_set_new(self):
+        config = parse()
+        config.set('wpa_psk', '0' * 64, after='wpa_passphrase')
+        config.set('channel', '6')
+
+        assert "wpa_passphrase=emlid=reach\nwpa_psk={}\n".format('0' * 64) \
+            in str(config)
+        assert str(config).endswith("p2p_ssid_postfix=reach\nchannel=6\n")
+        assert config.get('p2p_ssid_postfix') == 'reach'
+        assert config.get('channel') == '6'
+
+    def test_remove(self):
+        config = parse("ssid=reach\nwpa_psk=1\nwpa_psk=2\nchannel=6\n")
+
+        assert config.remove('wpa_psk')
+        assert not config.remove('wpa_psk')
+        assert str(config) == "ssid=reach\nchannel=6\n"
+        assert config.get('channel') == '6'
+
+    def test_commented_block(self):
+        config = parse("#network={\n#\tssid=\"example\"\n#}\n"
+                       "p2p_ssid_postfix=reach\n")
+        config.set('p2p_ssid_postfix', 'other')
+
+        assert config.get('p2p_ssid_postfix') == 'other'
+        assert str(config).count('p2p_ssid_postfix') == 1
+
+    def test_copy(self):
+        config = parse()
+        copy = config.copy()
+        copy.set('ssid', 'other')
+
+        assert config.get('ssid') == 'reach'
+        assert copy.get('ssid') == 'other'
@@ -0,0 +1,130 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import hashlib
+import mock
+import pytest
+from wificontrol.utils import convert_to_wpas_network, derive_psk, is_hex_psk
+from wificontrol.utils.fileupdater import ConfigurationFileUpdater, NetworkTemplate
+from wificontrol.utils import networkstranslate
+
+IEEE_PSK = 'f42c6fc52df0ebef9ebb4b90b38a5f902e83fe1b135a70e23aed762e9710a12e'
+
+
+@pytest.fixture
+def network():
+    return {'ssid': u'IEEE', 'password': u'password', 'security': 'wpa2psk',
+            'identity': u''}
+
+
+class TestPrecomputedPSK:
+    def setup_method(self):
+        networkstranslate._psk_cache.clear()
+
+    def test_derive_psk(self):
+        assert derive_psk('IEEE', 'password') == IEEE_PSK
+        assert is_hex_psk(IEEE_PSK)
+        assert not is_hex_psk('password')
+
+    def test_memoized(self):
+        with mock.patch('hashlib.pbkdf2_hmac',
+                        wraps=hashlib.pbkdf2_hmac) as pbkdf2:
+            for _ in range(100):
+                assert derive_psk('IEEE', 'password') == IEEE_PSK
+
+        assert pbkdf2.call_count == 1
+        assert list(networkstranslate._psk_cache) == [('IEEE', 'password')]
+
+    def test_cache_bounded(self):
+        for index in range(10):
+            derive_psk('IEEE', 'password{}'.format(index))
+        derive_psk('IEEE', 'password6')
+
+        assert list(networkstranslate._psk_cache) == [
+            ('IEEE', 'password7'), ('IEEE', 'password8'),
+            ('IEEE', 'password9'), ('IEEE', 'password6')]
+
+    def test_converter(self, network):
+        assert convert_to_wpas_network(network)['psk'] == 'password'
+        assert convert_to_wpas_network(network, precompute=True)['psk'] == \
+            IEEE_PSK
+
+    def test_converter_keeps_invalid_passphrase(self, network):
+        network['password'] = u'short'
+        assert convert_to_wpas_network(network, precompute=True)['psk'] == \
+            'short'
+
+    def test_template_does_not_quote_hex_psk(self):
+        raw = str(NetworkTemplate({'ssid': 'IEEE', 'psk': IEEE_PSK}))
+        assert '\tpsk={}'.format(IEEE_PSK) in raw
+        assert '\tssid="IEEE"' in raw
+
+        raw = str(NetworkTemplate({'ssid': 'IEEE', 'psk': 'password'}))
+        assert '\tpsk="password"' in raw
+
+    def test_config_file_updater(self, tmpdir):
+        config = tmpdir.join('wpa_supplicant.conf')
+        config.write('ctrl_interface=/var/run/wpa_supplicant\n')
+        updater = ConfigurationFileUpdater(str(config))
+
+        updater.add_network({'ssid': 'IEEE', 'psk': 'password',
+                             'key_mgmt': 'WPA-PSK'}, precompute=True)
+
+        assert 'psk={}'.format(IEEE_PSK) in config.read()
+        assert ConfigurationFileUpdater(str(config)).networks[0]['psk'] == \
+            IEEE_PSK
+
+    def test_connect_time_cost(self, network):
+        connects = 5
+        passphrase_network = convert_to_wpas_network(network)
+        psk_network = convert_to_wpas_network(network, precompute=True)
+
+        def connect(wpas_network):
+            if not is_hex_psk(wpas_network['psk']):
+                hashlib.pbkdf2_hmac('sha1', wpas_network['psk'],
+                                    wpas_network['ssid'], 4096, 32)
+
+        start = time.clock()
+        for _ in range(connects):
+            connect(passphrase_network)
+        passphrase_time = time.clock() - start
+
+        start = time.clock()
+        for _ in range(connects):
+            connect(psk_network)
+        psk_time = time.clock() - start
+
+        assert passphrase_time > 10 * max(psk_time, 1e-6)
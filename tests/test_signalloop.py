@@ -0,0 +1,137 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import mock
+import pytest
+from threading import Event, Thread
+from wificontrol.utils import signalloop
+from wificontrol.utils.signalloop import start_signal_loop, in_signal_loop
+from wificontrol.utils.signalloop import attach_main_loop, detach_main_loop
+from wificontrol.utils.signalloop import wait_signal
+
+GOBJECT = 'wificontrol.utils.signalloop._import_gobject'
+
+
+class FakeMainLoop(object):
+    def __init__(self):
+        self.quit_event = Event()
+
+    def run(self):
+        self.quit_event.wait()
+
+    def quit(self):
+        self.quit_event.set()
+
+
+class FakeGObject(object):
+    def __init__(self):
+        self.MainLoop = FakeMainLoop
+        self.context = mock.Mock()
+        self.context.iteration.return_value = True
+        self.MainContext = mock.Mock()
+        self.MainContext.default.return_value = self.context
+
+    def threads_init(self):
+        pass
+
+    def idle_add(self, callback, *args):
+        callback(*args)
+
+
+@pytest.fixture(autouse=True)
+def gobject():
+    gobject = FakeGObject()
+    with mock.patch(GOBJECT, return_value=gobject):
+        yield gobject
+    detach_main_loop()
+    signalloop._loop = None
+    signalloop._loop_thread = None
+
+
+def run_in_thread(target):
+    result = []
+    thread = Thread(target=lambda: result.append(target()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestSignalLoop:
+    def test_loop_thread(self):
+        start_signal_loop()
+        thread = signalloop._loop_thread
+
+        start_signal_loop()
+
+        assert signalloop._loop_thread is thread
+        assert thread.is_alive()
+        assert not in_signal_loop()
+
+    def test_attach_stops_own_loop(self):
+        start_signal_loop()
+        thread = signalloop._loop_thread
+
+        attach_main_loop()
+
+        assert not thread.is_alive()
+        assert in_signal_loop()
+        assert not run_in_thread(in_signal_loop)
+
+        start_signal_loop()
+        assert in_signal_loop()
+
+        detach_main_loop()
+        assert not in_signal_loop()
+
+    def test_wait_outside_loop(self, gobject):
+        event = Event()
+        event.set()
+
+        assert wait_signal(event, timeout=1)
+        assert gobject.context.iteration.call_count == 0
+
+    def test_wait_iterates_attached_loop(self, gobject):
+        event = Event()
+        gobject.context.iteration.side_effect = lambda block: event.set()
+        attach_main_loop()
+
+        assert wait_signal(event, timeout=1)
+        gobject.context.iteration.assert_called_with(False)
+
+    def test_wait_timeout_in_loop(self, gobject):
+        gobject.context.iteration.return_value = False
+        attach_main_loop()
+
+        assert not wait_signal(Event(), timeout=0.05)
@@ -0,0 +1,176 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import pytest
+import mock
+import dbus
+from threading import Timer
+from wificontrol.utils import SystemdUnit, UnitError
+
+SYSTEM_BUS = 'wificontrol.utils.systemdunit.get_system_bus'
+SIGNAL_LOOP = 'wificontrol.utils.systemdunit.start_signal_loop'
+IN_SIGNAL_LOOP = 'wificontrol.utils.systemdunit.in_signal_loop'
+ITERATE_SIGNAL_LOOP = 'wificontrol.utils.systemdunit.iterate_signal_loop'
+
+
+class FakeSystemd(object):
+    def __init__(self, delay=0, result="done"):
+        self.delay = delay
+        self.result = result
+        self.jobs = 0
+        self.receivers = []
+        self.calls = []
+
+    def add_signal_receiver(self, handler, signal_name, **kwargs):
+        self.receivers.append(handler)
+        receiver = mock.MagicMock()
+        receiver.remove.side_effect = lambda: self.receivers.remove(handler)
+        return receiver
+
+    def run_job(self, method, unit, mode):
+        self.calls.append((method, unit, mode))
+        self.jobs += 1
+        job_path = "/org/freedesktop/systemd1/job/{}".format(self.jobs)
+
+        def job_removed():
+            for handler in list(self.receivers):
+                handler(self.jobs, job_path, unit, self.result)
+
+        if self.delay is None:
+            pass
+        elif self.delay:
+            Timer(self.delay, job_removed).start()
+        else:
+            job_removed()
+        return job_path
+
+
+class TestSystemdUnit:
+    def setup_method(self):
+        self.systemd = FakeSystemd()
+        self.manager = mock.MagicMock()
+        self.manager.StartUnit.side_effect = \
+            lambda unit, mode: self.systemd.run_job("StartUnit", unit, mode)
+        self.manager.StopUnit.side_effect = \
+            lambda unit, mode: self.systemd.run_job("StopUnit", unit, mode)
+
+        self.bus_patcher = mock.patch(SYSTEM_BUS)
+        self.loop_patcher = mock.patch(SIGNAL_LOOP)
+        self.interface_patcher = mock.patch('dbus.Interface',
+                                            return_value=self.manager)
+        bus = self.bus_patcher.start()
+        self.loop_patcher.start()
+        self.interface_patcher.start()
+        bus.return_value.add_signal_receiver.side_effect = \
+            self.systemd.add_signal_receiver
+
+        self.probe = mock.Mock(return_value=True)
+        self.unit = SystemdUnit("hostapd.service", ready_probe=self.probe)
+
+    def teardown_method(self):
+        self.interface_patcher.stop()
+        self.loop_patcher.stop()
+        self.bus_patcher.stop()
+
+    def test_start_waits_for_job(self):
+        self.systemd.delay = 0.1
+
+        start = time.time()
+        self.unit.start()
+
+        assert 0.1 <= time.time() - start < 1
+        assert self.systemd.calls == [("StartUnit", "hostapd.service",
+                                       "replace")]
+        assert self.probe.call_count == 1
+        assert self.systemd.receivers == []
+
+    def test_job_removed_before_reply(self):
+        self.unit.stop()
+
+        assert self.systemd.calls == [("StopUnit", "hostapd.service",
+                                       "replace")]
+        assert self.probe.call_count == 0
+
+    def test_start_waits_for_probe(self):
+        ready = []
+        self.probe.side_effect = lambda: bool(ready)
+        Timer(0.2, lambda: ready.append(True)).start()
+
+        start = time.time()
+        self.unit.start()
+
+        assert 0.2 <= time.time() - start < 1
+
+    def test_probe_timeout(self):
+        self.probe.return_value = False
+
+        with pytest.raises(UnitError):
+            self.unit.start(timeout=0.2)
+
+    def test_failed_job(self):
+        self.systemd.result = "failed"
+
+        with pytest.raises(UnitError):
+            self.unit.start()
+
+    def test_job_timeout(self):
+        self.systemd.delay = None
+
+        with pytest.raises(UnitError):
+            self.unit.stop(timeout=0.2)
+        assert self.systemd.receivers == []
+
+    def test_job_removed_in_signal_loop(self):
+        self.systemd.delay = None
+        job_path = "/org/freedesktop/systemd1/job/1"
+
+        def iterate(timeout):
+            for handler in list(self.systemd.receivers):
+                handler(1, job_path, "hostapd.service", "done")
+
+        with mock.patch(IN_SIGNAL_LOOP, return_value=True), \
+                mock.patch(ITERATE_SIGNAL_LOOP, side_effect=iterate) as loop:
+            self.unit.stop(timeout=1)
+
+        assert loop.call_count == 1
+        assert self.systemd.receivers == []
+
+    def test_dbus_error(self):
+        self.manager.StartUnit.side_effect = \
+            dbus.exceptions.DBusException("Access denied")
+
+        with pytest.raises(UnitError):
+            self.unit.start()
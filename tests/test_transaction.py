@@ -0,0 +1,225 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import pytest
+import mock
+from wificontrol import WiFiControl
+from wificontrol.hostapd import HostAP
+from wificontrol.wificommon import WiFiControlError
+from wificontrol.wpasupplicant import WpaSupplicant
+from wificontrol.utils import FileTransaction, TransactionError, watch_file
+
+
+@pytest.fixture
+def files(tmpdir):
+    paths = {}
+    for name in ('hostapd.conf', 'p2p_supplicant.conf', 'hostname'):
+        with open(os.path.join('tests', 'test_files', name)) as original:
+            tmpdir.join(name).write(original.read())
+        paths[name] = str(tmpdir.join(name))
+    return paths
+
+
+def contents(files):
+    return dict((name, open(path).read()) for name, path in files.items())
+
+
+class TestFileTransaction:
+    def test_commit(self, files):
+        path = files['hostname']
+        action = mock.Mock()
+
+        with FileTransaction() as transaction:
+            transaction.stage(path, 'first\n')
+            transaction.stage(path, 'rover\n')
+            transaction.on_commit(action)
+            assert transaction.read(path) == 'rover\n'
+            assert open(path).read() == 'testname_589\n'
+
+        assert open(path).read() == 'rover\n'
+        assert watch_file(path).get() == 'rover\n'
+        assert action.call_count == 1
+        assert transaction.record['result'] == 'done'
+        assert transaction.record['files'] == [path]
+        assert [step['name'] for step in transaction.record['steps']] == \
+            ['write', 'sync', 'rename', 'actions']
+
+        with pytest.raises(TransactionError):
+            transaction.stage(path, 'other\n')
+
+    def test_batched_sync(self, files):
+        with mock.patch('os.fsync') as fsync:
+            with FileTransaction() as transaction:
+                for path in files.values():
+                    transaction.stage(path, 'rover\n')
+
+        assert fsync.call_count == len(files) + 1
+        assert all(content == 'rover\n' for content in contents(files).values())
+
+    def test_nothing_written_on_staging_error(self, files):
+        before = contents(files)
+        with pytest.raises(RuntimeError):
+            with FileTransaction() as transaction:
+                transaction.stage(files['hostname'], 'rover\n')
+                raise RuntimeError()
+
+        assert contents(files) == before
+        assert transaction.record['result'] == 'failed'
+
+    def test_rename_failure_restores(self, files, tmpdir, monkeypatch):
+        before = contents(files)
+        rename = os.rename
+        renames = []
+
+        def failing_rename(source, target):
+            renames.append(target)
+            if len(renames) == 3:
+                raise OSError("No space left on device")
+            rename(source, target)
+        monkeypatch.setattr(os, 'rename', failing_rename)
+        action = mock.Mock()
+        undo = mock.Mock()
+
+        with pytest.raises(OSError):
+            with FileTransaction() as transaction:
+                for path in files.values():
+                    transaction.stage(path, 'rover\n')
+                transaction.on_commit(action, undo=undo)
+                transaction.commit()
+
+        monkeypatch.setattr(os, 'rename', rename)
+        assert contents(files) == before
+        assert action.call_count == 0
+        assert undo.call_count == 0
+        assert sorted(entry.basename for entry in tmpdir.listdir()) == \
+            sorted(files)
+
+    def test_rollback_after_commit(self, files):
+        before = contents(files)
+        undo = mock.Mock()
+
+        with pytest.raises(RuntimeError):
+            with FileTransaction() as transaction:
+                transaction.stage(files['hostapd.conf'], 'ssid=rover\n')
+                transaction.on_commit(mock.Mock(), undo=undo)
+                transaction.commit()
+                assert open(files['hostapd.conf']).read() == 'ssid=rover\n'
+                raise RuntimeError()
+
+        assert contents(files) == before
+        assert undo.call_count == 1
+        assert transaction.record['steps'][-1]['name'] == 'rollback'
+
+    def test_only_completed_actions_undone(self, files):
+        undos = [mock.Mock(), mock.Mock(), mock.Mock()]
+        actions = [mock.Mock(), mock.Mock(side_effect=RuntimeError()),
+                   mock.Mock()]
+
+        with pytest.raises(RuntimeError):
+            with FileTransaction() as transaction:
+                transaction.stage(files['hostapd.conf'], 'ssid=rover\n')
+                for action, undo in zip(actions, undos):
+                    transaction.on_commit(action, undo=undo)
+
+        assert [action.call_count for action in actions] == [1, 1, 0]
+        assert [undo.call_count for undo in undos] == [1, 0, 0]
+
+
+class TestDeviceNames:
+    def setup_method(self):
+        self.manager = WiFiControl.__new__(WiFiControl)
+        self.manager.wifi = mock.Mock()
+
+    def make_components(self, files):
+        hotspot = HostAP.__new__(HostAP)
+        hotspot.interface = 'wlan0'
+        hotspot.hostapd_path = files['hostapd.conf']
+        hotspot.hostname_path = files['hostname']
+        hotspot.control = None
+        hotspot.stations = None
+        hotspot.execute_command = mock.Mock()
+        hotspot.get_device_mac = lambda: "02:00:00:17:8c:b8"
+
+        wpasupplicant = WpaSupplicant.__new__(WpaSupplicant)
+        wpasupplicant.p2p_supplicant_path = files['p2p_supplicant.conf']
+
+        self.manager.hotspot = hotspot
+        self.manager.wpasupplicant = wpasupplicant
+
+    def test_set_device_names(self, files):
+        self.make_components(files)
+
+        assert self.manager.set_device_names('rover')
+
+        assert open(files['hostname']).read() == 'rover\n'
+        assert 'p2p_ssid_postfix=rover\n' in \
+            open(files['p2p_supplicant.conf']).read()
+        assert '\nssid=rover:8c:b8\n' in open(files['hostapd.conf']).read()
+        self.manager.hotspot.execute_command.assert_called_once_with(
+            'hostname -F {}'.format(files['hostname']))
+        assert self.manager.wifi.restart_dns.call_count == 1
+
+        record = self.manager.get_device_names_timings()
+        assert record['result'] == 'done'
+        assert [step['name'] for step in record['steps']] == \
+            ['stage', 'write', 'sync', 'rename', 'actions', 'restart_dns',
+             'verify']
+        assert all(step['duration'] >= 0 for step in record['steps'])
+
+    def test_verified_from_staged_values(self, files):
+        self.make_components(files)
+
+        reads = []
+        self.manager.wifi.restart_dns.side_effect = \
+            lambda: reads.append(watched.call_count)
+
+        with mock.patch('wificontrol.utils.transaction.watch_file',
+                        wraps=watch_file) as watched:
+            assert self.manager.set_device_names('rover')
+
+        assert reads == [watched.call_count]
+
+    def test_rolled_back_on_failure(self, files):
+        self.make_components(files)
+        before = contents(files)
+        self.manager.wifi.restart_dns.side_effect = WiFiControlError()
+
+        with pytest.raises(WiFiControlError):
+            self.manager.set_device_names('rover')
+
+        assert contents(files) == before
+        assert self.manager.hotspot.execute_command.call_count == 2
+        assert self.manager.get_device_names_timings()['result'] == 'failed'
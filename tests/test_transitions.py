@@ -0,0 +1,144 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import pytest
+import mock
+from wificontrol import WiFiControlError
+from wificontrol.transitions import TransitionEngine
+
+
+class TestTransitionEngine:
+    def setup_method(self):
+        self.wifi = mock.MagicMock()
+        self.wifi.get_device_ip.return_value = "192.168.42.1"
+        self.wpasupplicant = mock.MagicMock()
+        self.hotspot = mock.MagicMock()
+        self.engine = TransitionEngine(self.wifi, self.wpasupplicant,
+                                       self.hotspot)
+        self.engine.PROBE_INTERVAL = 0.01
+
+    def stage_names(self, record):
+        return [stage['name'] for stage in record['stages']]
+
+    def test_host_transition(self):
+        self.hotspot.wait_ready.side_effect = lambda timeout: time.sleep(0.05)
+
+        self.engine.run(TransitionEngine.HOST)
+
+        record = self.engine.get_timings()[-1]
+        assert self.stage_names(record) == ['rfkill', 'stop', 'start',
+                                            'interface', 'ip']
+        assert record['result'] == 'done'
+        assert record['target'] == TransitionEngine.HOST
+        assert record['stages'][3]['duration'] >= 0.05
+        assert record['duration'] >= record['stages'][3]['duration']
+
+        self.wifi.unblock.assert_called_once_with()
+        self.wpasupplicant.stop.assert_called_once_with(
+            TransitionEngine.TIMEOUTS['stop'])
+        self.hotspot.start.assert_called_once_with(
+            TransitionEngine.TIMEOUTS['start'], wait_ready=False)
+
+    def test_client_transition_without_address(self):
+        self.wifi.get_device_ip.return_value = "127.0.0.1"
+
+        self.engine.run(TransitionEngine.CLIENT)
+
+        record = self.engine.get_timings()[-1]
+        assert record['result'] == 'done'
+        assert record['stages'][-1]['result'] == 'timeout'
+        assert self.wifi.get_device_ip.call_count == 1
+        assert self.engine.state == TransitionEngine.CLIENT
+
+    def test_host_waits_for_address(self):
+        addresses = ["127.0.0.1", "127.0.0.1", "192.168.42.1"]
+        self.wifi.get_device_ip.side_effect = lambda: addresses.pop(0)
+
+        self.engine.run(TransitionEngine.HOST)
+
+        stage = self.engine.get_timings()[-1]['stages'][-1]
+        assert stage['result'] == 'done'
+        assert stage['duration'] >= 0.02
+
+    def test_off_transition(self):
+        self.engine.run(TransitionEngine.OFF)
+
+        record = self.engine.get_timings()[-1]
+        assert self.stage_names(record) == ['stop', 'rfkill']
+        assert self.hotspot.stop.call_count == 1
+        assert self.wpasupplicant.stop.call_count == 1
+        assert self.wifi.block.call_count == 1
+
+    def test_failed_stage(self):
+        self.wpasupplicant.start.side_effect = WiFiControlError("job failed")
+
+        with pytest.raises(WiFiControlError):
+            self.engine.run(TransitionEngine.CLIENT)
+
+        record = self.engine.get_timings()[-1]
+        assert record['result'] == 'failed'
+        assert record['stages'][-1]['name'] == 'start'
+        assert record['stages'][-1]['error'] == "job failed"
+        assert self.wpasupplicant.wait_ready.call_count == 0
+        assert self.engine.state is None
+
+    def test_stage_timeout(self):
+        self.engine.set_stage_timeout('rfkill', 0.01)
+        self.wifi.unblock.side_effect = lambda: time.sleep(0.05)
+
+        with pytest.raises(WiFiControlError):
+            self.engine.run(TransitionEngine.HOST)
+
+        assert self.engine.get_timings()[-1]['stages'][0]['result'] == \
+            'timeout'
+        assert self.hotspot.start.call_count == 0
+
+    def test_unknown_stage(self):
+        with pytest.raises(ValueError):
+            self.engine.set_stage_timeout('dhcp', 1)
+
+    def test_history(self):
+        for _ in range(TransitionEngine.HISTORY_SIZE + 5):
+            self.engine.run(TransitionEngine.CLIENT)
+            self.engine.run(TransitionEngine.HOST)
+
+        assert len(self.engine.get_timings()) == TransitionEngine.HISTORY_SIZE
+
+        last = self.engine.get_timings(2)
+        assert [record['target'] for record in last] == \
+            [TransitionEngine.CLIENT, TransitionEngine.HOST]
+        assert last[1]['source'] == TransitionEngine.CLIENT
+        assert self.engine.get_timings(0) == []
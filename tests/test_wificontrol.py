@@ -33,9 +33,12 @@
 # EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import os
+import time
 import pytest
 import mock
 from wificontrol import WiFiControl
+from wificontrol.transitions import TransitionEngine
 
 
 @pytest.fixture
@@ -52,6 +55,8 @@ class FakeWiFiControl(WiFiControl):
         self.wifi = mock.MagicMock()
         self.wpasupplicant = mock.MagicMock()
         self.hotspot = mock.MagicMock()
+        self.transitions = TransitionEngine(self.wifi, self.wpasupplicant,
+                                            self.hotspot)
 
 
 class TestWiFiControl:
@@ -122,6 +127,13 @@ class TestWiFiControl:
         self.manager.remove_network(ssid)
         assert self.manager.wpasupplicant.remove_network.is_called_once_with(ssid)
 
+    def test_networks_batch(self, ssid):
+        self.manager.wpasupplicant.add_networks.return_value = [ssid]
+        self.manager.wpasupplicant.remove_networks.return_value = []
+
+        assert self.manager.add_networks([ssid]) == [ssid]
+        assert self.manager.remove_networks([ssid]) == []
+
     def test_status_get(self, ssid):
         self.manager.wpasupplicant.started = mock.Mock(return_value=False)
         self.manager.hotspot.started = mock.Mock(return_value=True)
@@ -237,3 +249,24 @@ class TestWiFiControl:
         assert self.manager.verify_device_names(name)
         assert self.manager.hotspot.get_host_name.call_count == 1
         assert self.manager.wpasupplicant.get_p2p_name.call_count == 1
+
+    def test_config_changes(self, tmpdir):
+        paths = [str(tmpdir.join(name)) for name in
+                 ('wpa_supplicant.conf', 'p2p_supplicant.conf',
+                  'hostapd.conf', 'hostname')]
+        for path in paths:
+            tmpdir.join(os.path.basename(path)).write('ssid=reach\n')
+        self.manager.wpasupplicant.wpa_supplicant_path = paths[0]
+        self.manager.wpasupplicant.p2p_supplicant_path = paths[1]
+        self.manager.hotspot.hostapd_path = paths[2]
+        self.manager.hotspot.hostname_path = paths[3]
+
+        changed = []
+        self.manager.subscribe_config_changes(changed.append)
+        tmpdir.join('hostapd.conf').write('ssid=other\n')
+
+        deadline = time.time() + 2
+        while not changed:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        assert changed == [paths[2]]
@@ -37,12 +37,20 @@ import pytest
 import pytest_mock
 import mock
 from wificontrol import WiFiMonitor, WiFiControl
+from wificontrol.utils import StationTable, InterfaceError
 
 
 class FakeWiFiControl(WiFiControl):
     def __init__(self):
         self.state = self.HOST_STATE
         self.status = {}
+        self.wifi = mock.MagicMock(interface='wlan0')
+        self.wpasupplicant = mock.MagicMock()
+        self.wpasupplicant.wpa_supplicant_interface.get_interface.return_value = \
+            "/fi/w1/wpa_supplicant1/Interfaces/1"
+        self.hotspot = mock.MagicMock()
+        self.hotspot.get_station_table.return_value = StationTable(
+            mock.MagicMock())
 
     def get_state(self):
         return self.state
@@ -106,6 +114,7 @@ class FakeWifiMonitor(WiFiMonitor):
 
         self.current_state = None
         self.current_ssid = None
+        self.wpas_interface_path = "/fi/w1/wpa_supplicant1/Interfaces/1"
 
         self._initialize()
 
@@ -187,3 +196,73 @@ class TestWiFiMonitor:
         self.monitor._wpa_props_changed(wpa_client_state)
         assert self.monitor.current_state == self.monitor.CLIENT_STATE
         stub_func.assert_called_with('revert')
+
+    def test_recreated_interface(self, wpa_client_state, scanning_state):
+        old_path = "/fi/w1/wpa_supplicant1/Interfaces/1"
+        new_path = "/fi/w1/wpa_supplicant1/Interfaces/2"
+
+        self.monitor._wpa_interface_added(new_path, {'Ifname': 'p2p-dev-wlan0'})
+        self.monitor._wpa_props_changed(scanning_state, path=old_path)
+        assert self.monitor.current_state == self.monitor.SCAN_STATE
+
+        self.monitor._wpa_interface_added(new_path, {'Ifname': 'wlan0'})
+        self.monitor._wpa_props_changed(wpa_client_state, path=old_path)
+        assert self.monitor.current_state == self.monitor.SCAN_STATE
+
+        self.monitor._wpa_props_changed(wpa_client_state, path=new_path)
+        assert self.monitor.current_state == self.monitor.CLIENT_STATE
+
+    def test_initial_interface_path(self, wpa_client_state):
+        wpa_interface = self.monitor.wifi_manager.wpasupplicant.wpa_supplicant_interface
+        wpa_interface.get_interface.return_value = \
+            "/fi/w1/wpa_supplicant1/Interfaces/3"
+
+        self.monitor._set_initial_state()
+        wpa_interface.get_interface.assert_called_with('wlan0')
+        self.monitor._wpa_props_changed(
+            wpa_client_state, path="/fi/w1/wpa_supplicant1/Interfaces/3")
+        assert self.monitor.current_state == self.monitor.CLIENT_STATE
+
+        wpa_interface.get_interface.side_effect = InterfaceError("Unknown")
+        self.monitor._set_initial_state()
+        assert self.monitor.wpas_interface_path == \
+            "/fi/w1/wpa_supplicant1/Interfaces/1"
+
+    def test_station_monitor_follows_state(self, wpa_client_state, host_mode_state):
+        hotspot = self.monitor.wifi_manager.hotspot
+        assert hotspot.start_station_monitor.called
+        assert not hotspot.stop_station_monitor.called
+
+        self.monitor._wpa_props_changed(wpa_client_state)
+        assert hotspot.stop_station_monitor.called
+
+        hotspot.reset_mock()
+        self.monitor._host_props_changed(*host_mode_state)
+        assert hotspot.start_station_monitor.called
+        assert not hotspot.stop_station_monitor.called
+
+    def test_station_events(self, mocker):
+        idle_add = mocker.patch('wificontrol.wifimonitor.GObject').idle_add
+        connected = mocker.stub(name='connected')
+        disconnected = mocker.stub(name='disconnected')
+
+        self.monitor.register_callback(self.monitor.STA_CONNECTED_EVENT,
+                                       connected, args=('host',))
+        self.monitor.register_callback(self.monitor.STA_DISCONNECTED_EVENT,
+                                       disconnected)
+
+        stations = self.monitor.wifi_manager.hotspot.get_station_table()
+        stations.handle_event('AP-STA-CONNECTED 02:00:00:00:00:01')
+        assert not connected.called
+
+        for call in idle_add.call_args_list:
+            call[0][0](*call[0][1:])
+        station = connected.call_args[0][1]
+        assert connected.call_args[0][0] == 'host'
+        assert station['mac'] == '02:00:00:00:00:01'
+
+        idle_add.reset_mock()
+        stations.handle_event('AP-STA-DISCONNECTED 02:00:00:00:00:01')
+        for call in idle_add.call_args_list:
+            call[0][0](*call[0][1:])
+        assert disconnected.call_args[0][0]['mac'] == '02:00:00:00:00:01'
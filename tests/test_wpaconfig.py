@@ -0,0 +1,168 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+from collections import OrderedDict
+from io import BytesIO
+from wificontrol.utils.wpaconfig import WpaConfig, tokenize
+from wificontrol.utils.fileupdater import ConfigurationFileUpdater
+
+CONFIG = (
+    "# managed by wificontrol\n"
+    "ctrl_interface=DIR=/var/run/wpa_supplicant GROUP=netdev\n"
+    "update_config=1\n"
+    "\n"
+    "network={\n"
+    "\tssid=\"home\"\n"
+    "\tpsk=\"pass=word\"\n"
+    "\t# kept for the old router\n"
+    "    key_mgmt=WPA-PSK\n"
+    "}\n"
+    "\n"
+    "\n"
+    "cred={\n"
+    "\trealm=\"example.com\"\n"
+    "\tusername=\"user\"\n"
+    "}\n"
+    "\n"
+    "network = {\n"
+    "  ssid=\"work\"\n"
+    "  key_mgmt=NONE\n"
+    "  }\n"
+    "# trailing comment")
+
+
+def parse(data):
+    return WpaConfig.parse(BytesIO(data))
+
+
+class TestWpaConfig:
+    def test_round_trip(self):
+        assert str(parse(CONFIG)) == CONFIG
+
+        output = BytesIO()
+        parse(CONFIG).write(output)
+        assert output.getvalue() == CONFIG
+
+    def test_model(self):
+        config = parse(CONFIG)
+
+        assert [item.kind for item in config.items] == \
+            ['text', 'network', 'text', 'cred', 'text', 'network', 'text']
+        assert config.header == "# managed by wificontrol\n" \
+            "ctrl_interface=DIR=/var/run/wpa_supplicant GROUP=netdev\n" \
+            "update_config=1\n\n"
+        assert [block.kind for block in config.blocks()] == \
+            ['network', 'cred', 'network']
+        assert len(config.blocks('cred')) == 1
+
+    def test_fields(self):
+        home, work = parse(CONFIG).blocks('network')
+
+        assert list(home.fields.items()) == [
+            ('ssid', 'home'), ('psk', 'pass=word'), ('key_mgmt', 'WPA-PSK')]
+        assert dict(work.fields) == {'ssid': 'work', 'key_mgmt': 'NONE'}
+
+    def test_unterminated_block(self):
+        data = "update_config=1\nnetwork={\n\tssid=\"home\"\n"
+        config = parse(data)
+
+        assert str(config) == data
+        assert not config.blocks()[0].closed
+        assert config.blocks()[0].fields['ssid'] == 'home'
+
+    def test_streamed(self):
+        lines = iter(CONFIG.splitlines(True))
+        items = tokenize(lines)
+
+        assert next(items).kind == 'text'
+        assert next(items).kind == 'network'
+        assert next(lines) == "\n"
+
+
+class TestConfigPreserved:
+    def test_unchanged_networks_kept(self, tmpdir):
+        config = tmpdir.join('wpa_supplicant.conf')
+        config.write(CONFIG)
+        updater = ConfigurationFileUpdater(str(config))
+
+        assert [network['ssid'] for network in updater.networks] == \
+            ['home', 'work']
+        assert updater.find_network({'ssid': 'home'})['psk'] == 'pass=word'
+
+        updater.add_network(OrderedDict([('ssid', 'cafe'), ('key_mgmt', 'NONE')]))
+        assert config.read() == CONFIG + \
+            "\n\nnetwork={\n\tssid=\"cafe\"\n\tkey_mgmt=NONE\n}\n"
+
+        updater.remove_network({'ssid': 'cafe'})
+        updater.remove_network({'ssid': 'home'})
+        assert config.read() == CONFIG.replace(
+            CONFIG[CONFIG.index("network={"):CONFIG.index("cred={")], "")
+
+    def test_changed_network_rewritten(self, tmpdir):
+        config = tmpdir.join('wpa_supplicant.conf')
+        config.write(CONFIG)
+        updater = ConfigurationFileUpdater(str(config))
+
+        updater.find_network({'ssid': 'work'})['priority'] = '5'
+        updater.add_network(OrderedDict([('ssid', 'cafe'), ('key_mgmt', 'NONE')]))
+
+        networks = ConfigurationFileUpdater(str(config)).networks
+        assert networks[1]['priority'] == '5'
+        assert "# trailing comment" in config.read()
+        assert "cred={" in config.read()
+
+
+def test_5mb_benchmark():
+    network = ("network={\n"
+               "\tssid=\"net%d\"\n"
+               "\tpsk=\"password=%d\"\n"
+               "\t# comment\n"
+               "\tkey_mgmt=WPA-PSK\n"
+               "\tpriority=1\n"
+               "}\n\n")
+    data = "ctrl_interface=/var/run/wpa_supplicant\nupdate_config=1\n\n" + \
+        "".join(network % (index, index) for index in range(60000))
+    assert len(data) > 5 * 1024 * 1024
+
+    start = time.time()
+    config = parse(data)
+    fields = [block.fields for block in config.blocks()]
+    parse_time = time.time() - start
+
+    assert len(fields) == 60000
+    assert fields[-1]['psk'] == 'password=59999'
+    assert str(config) == data
+    assert parse_time < 10
@@ -0,0 +1,648 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import os
+import time
+import pytest
+import mock
+from threading import Event, Thread, Timer
+from wificontrol.wpasupplicant import WpaSupplicant, ScanCache
+from wificontrol.utils import WpaSupplicantBSS, BSSTable, WpaSupplicantInterface
+from wificontrol.utils import InterfaceError, PMKSACache
+
+SYSTEM_BUS = 'wificontrol.utils.dbuswpasupplicant.get_system_bus'
+
+
+@pytest.fixture(autouse=True)
+def signal_loop():
+    with mock.patch('wificontrol.utils.dbuswpasupplicant.start_signal_loop'):
+        yield
+
+
+class FakeBSSProperties(object):
+    def __init__(self, service, bss):
+        self.service = service
+        self.bss = bss
+
+    def Get(self, interface, property_name):
+        self.service.call()
+        return self.bss[property_name]
+
+    def GetAll(self, interface, reply_handler=None, error_handler=None,
+               timeout=None):
+        if reply_handler is None:
+            self.service.call()
+            return dict(self.bss)
+        self.service.call_async(lambda: reply_handler(dict(self.bss)))
+
+
+class FakeWpaSupplicantService(object):
+    def __init__(self, bss_count, hold_replies=0):
+        self.hold_replies = hold_replies
+        self.held = []
+        self.max_outstanding = 0
+        self.calls = 0
+        self.bss = {}
+
+        for index in range(bss_count):
+            path = "/fi/w1/wpa_supplicant1/Interfaces/1/BSSs/{}".format(index)
+            self.bss[path] = {
+                'SSID': list("net{}".format(index)),
+                'BSSID': [0x10, 0x20, 0x30, 0x40, 0x50, index],
+                'WPA': {'KeyMgmt': [], 'Group': ''},
+                'RSN': {'KeyMgmt': ['wpa-psk'], 'Group': 'ccmp'},
+                'Frequency': 2412,
+                'Signal': -40,
+                'Age': 1,
+            }
+
+    def call(self):
+        self.calls += 1
+
+    def call_async(self, reply):
+        self.calls += 1
+        if not self.hold_replies:
+            reply()
+            return
+
+        self.held.append(reply)
+        self.max_outstanding = max(self.max_outstanding, len(self.held))
+        if len(self.held) == self.hold_replies:
+            held, self.held = self.held, []
+            for reply in held:
+                reply()
+
+    def get_dbus_interface(self, path, interface_name):
+        return FakeBSSProperties(self, self.bss[path])
+
+    def get_BSSs(self):
+        return sorted(self.bss)
+
+
+class FakeWpaSupplicant(WpaSupplicant):
+    def __init__(self, service):
+        self.interface = 'wlan0'
+        self.connection_thread = None
+        self.connection_event = Event()
+        self.connection_monitor = None
+        self.connection_timer = None
+        self.break_event = Event()
+        self.wpa_supplicant_interface = mock.MagicMock()
+        self.wpa_supplicant_interface.get_BSSs.side_effect = service.get_BSSs
+        self.wpa_network_manager = mock.MagicMock()
+        self.config_updater = mock.MagicMock()
+        self.scan_cache = ScanCache()
+        self.pmksa_cache = None
+
+        with mock.patch(SYSTEM_BUS):
+            self.wpa_bss_manager = WpaSupplicantBSS()
+            self.wpa_bss_table = BSSTable(self.wpa_supplicant_interface)
+        self.wpa_bss_manager._get_dbus_interface = service.get_dbus_interface
+        self.wpa_bss_table._get_dbus_interface = service.get_dbus_interface
+        self.wpa_bss_table._add_signal_receiver = mock.MagicMock()
+
+    def started(self):
+        return True
+
+
+class TestScanResults:
+    BSS_COUNT = 60
+
+    def legacy_scan_results(self, wpa):
+        bss_manager = wpa.wpa_bss_manager
+        results = []
+        for bss in wpa.wpa_supplicant_interface.get_BSSs():
+            wpa_array = bss_manager.get_WPA(bss)
+            rsn_array = bss_manager.get_RSN(bss)
+            proto = wpa.get_protocol(wpa_array, rsn_array)
+            results.append({
+                "ssid": bss_manager.get_SSID(bss),
+                "mac address": bss_manager.get_BSSID(bss),
+                "security": wpa.get_keymgmt_group(wpa_array, rsn_array, proto)
+            })
+        return results
+
+    def test_scan_results_content(self):
+        service = FakeWpaSupplicantService(2)
+        results = FakeWpaSupplicant(service).get_scan_results()
+
+        assert results == [
+            {'ssid': 'net0', 'mac address': '10:20:30:40:50:00',
+             'security': 'wpa2psk'},
+            {'ssid': 'net1', 'mac address': '10:20:30:40:50:01',
+             'security': 'wpa2psk'},
+        ]
+
+    def test_single_call_per_bss(self):
+        service = FakeWpaSupplicantService(self.BSS_COUNT)
+        FakeWpaSupplicant(service).get_scan_results()
+
+        assert service.calls == self.BSS_COUNT
+
+    def test_scan_results_served_from_table(self):
+        service = FakeWpaSupplicantService(self.BSS_COUNT)
+        wpa = FakeWpaSupplicant(service)
+
+        results = wpa.get_scan_results()
+        assert wpa.get_scan_results() == results
+        assert wpa.is_network_visible('net1')
+        assert not wpa.is_network_visible('unknown')
+        assert wpa.get_network_scan_results('net1') == [results[1]]
+
+        assert service.calls == self.BSS_COUNT
+
+    def test_scan_results_round_trips(self):
+        service = FakeWpaSupplicantService(self.BSS_COUNT)
+        wpa = FakeWpaSupplicant(service)
+
+        self.legacy_scan_results(wpa)
+        wpa.get_scan_results()
+        assert service.calls == 5 * self.BSS_COUNT
+
+        service.calls = 0
+        self.legacy_scan_results(wpa)
+        legacy_calls = service.calls
+
+        service.calls = 0
+        wpa.get_scan_results()
+        assert service.calls == 0
+        assert legacy_calls == 4 * self.BSS_COUNT
+
+    def test_pipelined_reads(self):
+        service = FakeWpaSupplicantService(20, hold_replies=20)
+        wpa = FakeWpaSupplicant(service)
+        wpa.wpa_bss_manager.BATCH_TIMEOUT = 1
+        bss_paths = service.get_BSSs()
+
+        snapshots = wpa.wpa_bss_manager.get_many(bss_paths)
+
+        assert snapshots == [service.bss[bss_path] for bss_path in bss_paths]
+        assert service.calls == len(bss_paths)
+        assert service.max_outstanding == len(bss_paths)
+
+
+class FakeSignalInterface(object):
+    def __init__(self):
+        self.receivers = {}
+        self.get_scanning = mock.Mock(return_value=False)
+        self.get_state = mock.Mock(return_value='disconnected')
+        self.scan = mock.Mock()
+        self.reassociate = mock.Mock()
+
+    def add_signal_receiver(self, signal_name, handler):
+        self.receivers[signal_name] = handler
+        receiver = mock.MagicMock()
+        receiver.remove.side_effect = lambda: self.receivers.pop(signal_name)
+        return receiver
+
+    def emit(self, signal_name, *args):
+        self.receivers[signal_name](*args)
+
+
+class TestScanning:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        self.wpa.wpa_supplicant_interface = FakeSignalInterface()
+        self.interface = self.wpa.wpa_supplicant_interface
+
+    def test_scan_done_signal(self):
+        self.interface.scan.side_effect = \
+            lambda **kwargs: self.interface.emit("ScanDone", True)
+
+        start = time.time()
+        assert self.wpa.scan(timeout=5) is True
+        assert time.time() - start < 1
+
+        assert self.interface.get_scanning.call_count == 0
+        assert self.interface.receivers == {}
+
+    def test_scanning_property_transition(self):
+        self.interface.scan.side_effect = \
+            lambda **kwargs: self.interface.emit("PropertiesChanged", {'Scanning': False})
+
+        assert self.wpa.scan(timeout=5) is True
+
+    def test_scan_timeout(self):
+        self.interface.get_scanning.return_value = True
+
+        assert self.wpa.scan(timeout=0.1) is False
+        assert self.interface.get_scanning.call_count == 1
+        assert self.interface.receivers == {}
+
+    def test_targeted_scan(self):
+        self.interface.scan.side_effect = \
+            lambda **kwargs: self.interface.emit("ScanDone", True)
+
+        assert self.wpa.scan(ssids=['home'], channels=[6])
+        self.interface.scan.assert_called_once_with(
+            scan_type=None, ssids=['home'], channels=[6], allow_roam=None)
+
+    def test_non_blocking_scan(self):
+        callback = mock.Mock()
+
+        assert self.wpa.start_scanning(callback, args=('test',), timeout=5)
+        callback.assert_not_called()
+
+        self.interface.emit("ScanDone", False)
+        callback.assert_called_once_with(False, 'test')
+
+
+class TestScanCache:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(3))
+        self.scans = 0
+        self.wpa.start_scanning = self.start_scanning
+
+    def start_scanning(self, callback=None, args=None, timeout=None,
+                       max_age=None, **kwargs):
+        if max_age is not None and self.wpa.scan_cache.is_fresh(max_age):
+            callback(True)
+            return True
+        self.scans += 1
+        self.wpa.scan_cache.scan_finished()
+        callback(True)
+        return True
+
+    def test_fresh_results_skip_scan(self):
+        assert len(self.wpa.get_scan_results(max_age=30)) == 3
+        assert len(self.wpa.get_scan_results(max_age=30)) == 3
+
+        assert self.scans == 1
+        statistics = self.wpa.get_scan_cache_statistics()
+        assert statistics['hits'] == 1
+        assert statistics['misses'] == 1
+
+    def test_invalidate(self):
+        self.wpa.get_scan_results(max_age=30)
+        self.wpa.invalidate_scan_results()
+        self.wpa.get_scan_results(max_age=30)
+
+        assert self.scans == 2
+
+    def test_stale_records_filtered(self):
+        self.wpa.get_scan_results(max_age=30)
+        record = self.wpa.wpa_bss_table.get_records()[0]
+        record.age = 60
+
+        results = self.wpa.get_scan_results(max_age=30)
+        assert len(results) == 2
+        assert record.ssid not in [network['ssid'] for network in results]
+
+    def test_no_max_age(self):
+        assert len(self.wpa.get_scan_results()) == 3
+        assert self.scans == 0
+
+
+class TestScanningCache:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        self.wpa.wpa_supplicant_interface = FakeSignalInterface()
+        self.interface = self.wpa.wpa_supplicant_interface
+        self.interface.scan.side_effect = \
+            lambda **kwargs: self.interface.emit("ScanDone", True)
+
+    def test_full_scan_is_cached(self):
+        assert self.wpa.scan(max_age=30)
+        assert self.wpa.scan(max_age=30)
+        assert self.interface.scan.call_count == 1
+
+    def test_targeted_scan_is_not_cached(self):
+        assert self.wpa.scan(ssids=['home'])
+        assert self.wpa.scan(max_age=30)
+        assert self.interface.scan.call_count == 2
+
+    def test_expired(self):
+        assert self.wpa.scan(max_age=30)
+        self.wpa.scan_cache.last_scan -= 60
+        assert self.wpa.scan(max_age=30)
+        assert self.interface.scan.call_count == 2
+
+
+class TestConnecting:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        self.wpa.wpa_supplicant_interface = FakeSignalInterface()
+        self.interface = self.wpa.wpa_supplicant_interface
+        self.wpa.connection_event.set()
+
+    def emit_states(self, *states):
+        for state in states:
+            properties = state if isinstance(state, dict) else {'State': state}
+            self.interface.emit("PropertiesChanged", properties)
+
+    def test_completed_by_signal(self):
+        self.wpa.CONNECTION_POLL_INTERVAL = 10
+
+        def complete():
+            while self.wpa.connection_monitor.state is None:
+                time.sleep(0.001)
+            self.emit_states('associating', 'associated', '4way_handshake',
+                             'completed')
+
+        def get_state():
+            Thread(target=complete).start()
+            return 'disconnected'
+
+        self.interface.get_state.side_effect = get_state
+
+        assert self.wpa.connect_to_network(None) is True
+        assert self.interface.get_state.call_count == 1
+        assert self.interface.receivers == {}
+
+    def test_authentication_failure(self):
+        self.interface.reassociate.side_effect = lambda: Timer(
+            0.05, self.emit_states, args=(
+                'associated', '4way_handshake',
+                {'State': 'disconnected', 'DisconnectReason': -15})).start()
+
+        start = time.time()
+        assert self.wpa.connect_to_network(None) is False
+        assert time.time() - start < 1
+
+    def test_stop_connecting(self):
+        self.wpa.start_connecting(None, timeout=0.1)
+        self.wpa.connection_event.wait(1)
+
+        start = time.time()
+        while self.wpa.connection_thread is not None:
+            time.sleep(0.01)
+            assert time.time() - start < 1
+
+    def test_completed_without_signals(self):
+        self.interface.get_state.return_value = 'completed'
+
+        assert self.wpa.connect_to_network(None) is True
+
+
+class TestFastSwitch:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        self.wpa.fast_switch = True
+        self.wpa.wpa_supplicant_path = "/etc/wpa_supplicant/wpa_supplicant.conf"
+        self.wpa.sysdmanager = mock.MagicMock()
+        self.wpa.sysdmanager.is_active.return_value = True
+        self.wpa.wpas_unit = mock.MagicMock()
+        self.interface = self.wpa.wpa_supplicant_interface
+
+    def test_host_mode_detaches_interface(self):
+        self.wpa.stop()
+
+        assert self.interface.detach.call_count == 1
+        assert self.wpa.wpas_unit.stop.call_count == 0
+
+    def test_client_mode_attaches_interface(self):
+        self.wpa.start()
+
+        self.interface.attach.assert_called_once_with(
+            config_file=self.wpa.wpa_supplicant_path)
+        assert self.wpa.wpas_unit.start.call_count == 0
+
+    def test_pending_writes_flushed_before_attach(self):
+        calls = []
+        self.wpa.flush = mock.Mock(
+            side_effect=lambda path: calls.append(('flush', path)))
+        self.interface.attach.side_effect = \
+            lambda config_file: calls.append(('attach', config_file))
+
+        self.wpa.start()
+
+        assert calls == [('flush', self.wpa.wpa_supplicant_path),
+                         ('attach', self.wpa.wpa_supplicant_path)]
+
+    def test_service_started_when_inactive(self):
+        self.wpa.sysdmanager.is_active.return_value = False
+
+        self.wpa.start()
+
+        assert self.interface.attach.call_count == 0
+        assert self.wpa.wpas_unit.start.call_count == 1
+
+    def test_attach_failure_restarts_service(self):
+        self.interface.attach.side_effect = InterfaceError("No such device")
+
+        self.wpa.start()
+
+        assert self.wpa.wpas_unit.restart.call_count == 1
+
+    def test_turn_off_stops_service(self):
+        self.wpa.stop(keep_service=False)
+
+        assert self.interface.detach.call_count == 0
+        assert self.wpa.wpas_unit.stop.call_count == 1
+
+    def test_detached_interface_is_not_started(self):
+        self.interface.initialize.side_effect = InterfaceError("Unknown")
+
+        assert WpaSupplicant.started(self.wpa) is False
+
+        self.wpa.fast_switch = False
+        with pytest.raises(InterfaceError):
+            WpaSupplicant.started(self.wpa)
+
+
+class TestPMKSACache:
+    def entry(self, bssid_byte, expiration):
+        return {
+            'BSSID': bytearray([0x10, 0x20, 0x30, 0x40, 0x50, bssid_byte]),
+            'PMKID': bytearray(range(16)),
+            'PMK': bytearray(range(32)),
+            'opportunistic': 0,
+            'expiration': expiration,
+        }
+
+    def setup_method(self):
+        self.now = int(time.time())
+
+    def test_round_trip(self, tmpdir):
+        cache = PMKSACache(str(tmpdir.join('wificontrol', 'pmksa.json')))
+
+        assert cache.save([self.entry(1, self.now + 600),
+                           self.entry(2, self.now - 1)]) == 1
+
+        entries = cache.load()
+        assert len(entries) == 1
+        assert bytearray(entries[0]['BSSID']) == self.entry(1, 0)['BSSID']
+        assert bytearray(entries[0]['PMK']) == bytearray(range(32))
+        assert entries[0]['expiration'] == self.now + 600
+        assert oct(os.stat(cache.cache_path).st_mode & 0o777) == oct(0o600)
+
+    def test_expired_on_load(self, tmpdir):
+        cache = PMKSACache(str(tmpdir.join('pmksa.json')))
+        cache.save([self.entry(1, self.now + 600)])
+
+        with mock.patch('time.time', return_value=self.now + 601):
+            assert cache.load() == []
+
+    def test_default_lifetime(self, tmpdir):
+        cache = PMKSACache(str(tmpdir.join('pmksa.json')), lifetime=60)
+        entry = self.entry(1, 0)
+        del entry['expiration']
+        cache.save([entry])
+
+        assert cache.load()[0]['expiration'] >= self.now + 60
+
+    def test_missing_or_broken_file(self, tmpdir):
+        cache = PMKSACache(str(tmpdir.join('pmksa.json')))
+        assert cache.load() == []
+
+        tmpdir.join('pmksa.json').write('{broken')
+        assert cache.load() == []
+
+    def test_saved_on_stop_and_restored_on_start(self, tmpdir):
+        wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        wpa.fast_switch = False
+        wpa.wpas_unit = mock.MagicMock()
+        wpa.pmksa_cache = PMKSACache(str(tmpdir.join('pmksa.json')))
+        interface = wpa.wpa_supplicant_interface
+        interface.get_pmksa.return_value = [self.entry(1, self.now + 600),
+                                            self.entry(2, self.now + 600)]
+        interface.add_pmksa.side_effect = [None, InterfaceError("Invalid")]
+
+        wpa.stop()
+        wpa.start()
+
+        assert interface.add_pmksa.call_count == 2
+
+        interface.add_pmksa.side_effect = None
+        assert wpa.restore_pmksa() == 2
+
+
+class FakeNetworkService(object):
+    def __init__(self, hold_replies=0):
+        self.hold_replies = hold_replies
+        self.held = []
+        self.max_outstanding = 0
+        self.networks = []
+
+    def AddNetwork(self, network, reply_handler=None, error_handler=None,
+                   timeout=None):
+        if reply_handler is None:
+            return self.add(network)
+
+        self.held.append((reply_handler, self.add(network)))
+        self.max_outstanding = max(self.max_outstanding, len(self.held))
+        if len(self.held) == self.hold_replies:
+            held, self.held = self.held, []
+            for reply_handler, path in held:
+                reply_handler(path)
+
+    def add(self, network):
+        self.networks.append(network)
+        return "/fi/w1/wpa_supplicant1/Interfaces/1/Networks/{}".format(
+            len(self.networks))
+
+
+class TestBatch:
+    def setup_method(self):
+        self.wpa = FakeWpaSupplicant(FakeWpaSupplicantService(0))
+        self.wpa.precompute_psk = False
+        self.wpa.pending_changes = None
+        self.wpa.find_network_path = mock.Mock(
+            side_effect=lambda network: "/path/" + network['ssid'])
+        self.interface = self.wpa.wpa_supplicant_interface
+        self.interface.add_networks.side_effect = \
+            lambda networks: [mock.sentinel.path] * len(networks)
+        self.interface.remove_networks.side_effect = \
+            lambda paths: [None] * len(paths)
+
+    def network(self, ssid):
+        return {'ssid': ssid, 'password': 'password', 'security': 'wpa2psk',
+                'identity': ''}
+
+    def test_changes_pushed_once(self):
+        with self.wpa.batch():
+            for index in range(50):
+                self.wpa.add_network(self.network('net{}'.format(index)))
+            self.wpa.remove_network({'ssid': 'old'})
+
+        assert self.interface.add_network.call_count == 0
+        assert self.interface.remove_network.call_count == 0
+        assert len(self.interface.add_networks.call_args[0][0]) == 50
+        self.interface.remove_networks.assert_called_once_with(['/path/old'])
+        assert self.wpa.config_updater.batch.call_count == 1
+
+    def test_cancelled_changes(self):
+        self.wpa.add_networks([self.network('home'), self.network('work')])
+        self.wpa.remove_networks([{'ssid': 'home'}])
+
+        pushed = self.interface.add_networks.call_args_list
+        assert [network['ssid'] for network in pushed[0][0][0]] == \
+            ['home', 'work']
+
+        with self.wpa.batch():
+            self.wpa.add_network(self.network('cafe'))
+            self.wpa.remove_network({'ssid': 'cafe'})
+
+        assert self.interface.add_networks.call_args[0][0] == []
+        assert self.interface.remove_networks.call_args[0][0] == []
+
+    def test_returns_changed_networks(self):
+        def remove_network(network):
+            if network['ssid'] == 'missing':
+                raise AttributeError(network['ssid'])
+        self.wpa.config_updater.remove_network.side_effect = remove_network
+        networks = [self.network('home'), self.network('work')]
+
+        assert self.wpa.add_networks(networks) == networks
+        assert self.wpa.remove_networks(
+            [{'ssid': 'home'}, {'ssid': 'missing'}]) == [{'ssid': 'home'}]
+        assert self.interface.remove_networks.call_args[0][0] == \
+            ['/path/home']
+
+    def test_nothing_pushed_on_error(self):
+        with pytest.raises(RuntimeError):
+            with self.wpa.batch():
+                self.wpa.add_network(self.network('home'))
+                raise RuntimeError()
+
+        assert self.interface.add_networks.call_count == 0
+        assert self.wpa.pending_changes is None
+
+    def test_pipelined_push(self):
+        service = FakeNetworkService(hold_replies=30)
+        with mock.patch(SYSTEM_BUS):
+            interface = WpaSupplicantInterface('wlan0')
+        interface.BATCH_TIMEOUT = 1
+        interface._interface_path = "/fi/w1/wpa_supplicant1/Interfaces/1"
+        interface._get_dbus_interface = mock.Mock(return_value=service)
+        networks = [{'ssid': 'net{}'.format(index), 'psk': 'password'}
+                    for index in range(30)]
+
+        paths = interface.add_networks(networks)
+
+        assert len(service.networks) == 30
+        assert paths[-1].endswith("/Networks/30")
+        assert service.max_outstanding == 30
@@ -34,11 +34,13 @@
 
 
 import os
-from wificommon import WiFi
+from wificommon import WiFi, WiFiControlError
+from utils import SystemdUnit, HostapdControl, HostapdControlError, StationTable
+from utils import derive_psk
 
 
 class HostAP(WiFi):
-    hostapd_control = lambda self, action: "systemctl {} hostapd.service && sleep 2".format(action)
+    CONTROL_DIRECTORY = "/var/run/hostapd"
 
     def __init__(self, interface,
                  hostapd_config="/etc/hostapd/hostapd.conf",
@@ -47,46 +49,177 @@ class HostAP(WiFi):
         super(HostAP, self).__init__(interface)
         self.hostapd_path = hostapd_config
         self.hostname_path = hostname_config
+        self.control = None
+        self.stations = None
 
         if (b'bin/hostapd' not in self.execute_command("whereis hostapd")):
             raise OSError('No HOSTAPD servise')
 
         self.started = lambda: self.sysdmanager.is_active("hostapd.service")
+        self.hostapd_unit = SystemdUnit("hostapd.service",
+                                        ready_probe=self.is_ready)
 
-    def start(self):
-        self.execute_command(self.hostapd_control("start"))
+    def start(self, timeout=SystemdUnit.JOB_TIMEOUT, wait_ready=True):
+        self.control_unit(self.hostapd_unit, "start", timeout, wait_ready)
 
-    def stop(self):
-        self.execute_command(self.hostapd_control("stop"))
+    def wait_ready(self, timeout=SystemdUnit.JOB_TIMEOUT):
+        self.control_unit(self.hostapd_unit, "wait_ready", timeout)
 
-    def get_hostap_name(self):
-        return self.re_search("(?<=^ssid=).*", self.hostapd_path)
+    def stop(self, timeout=SystemdUnit.JOB_TIMEOUT):
+        self.control_unit(self.hostapd_unit, "stop", timeout)
 
-    def set_hostap_name(self, name='reach'):
-        mac_addr = self.get_device_mac()[-6:]
-        self.replace("^ssid=.*", "ssid={}{}".format(name, mac_addr), self.hostapd_path)
+    def get_control_socket_path(self):
+        try:
+            fields = self.read_config(self.hostapd_path).get(
+                'ctrl_interface', '').split()
+        except IOError:
+            fields = []
+
+        directory = fields[0] if fields else self.CONTROL_DIRECTORY
+        if directory.startswith("DIR="):
+            directory = directory[len("DIR="):]
+        return os.path.join(directory, self.interface)
+
+    def is_ready(self):
+        return os.path.exists(self.get_control_socket_path())
+
+    def get_control(self):
+        path = self.get_control_socket_path()
+        if self.control is None or self.control.socket_path != path:
+            if self.control is not None:
+                self.control.close()
+            self.control = HostapdControl(path)
+        return self.control
+
+    def push_config(self, keys, reload=True):
+        config = self.read_config(self.hostapd_path)
+        control = self.get_control()
+        if not control.ping():
+            return False
+
+        try:
+            for key in keys:
+                value = config.get(key)
+                if value is not None:
+                    control.set(key, value)
+            if reload:
+                control.reload()
+        except HostapdControlError as error:
+            error_message = "WiFiControl: hostapd control error\n"
+            error_message += "Error: {}".format(error)
+            raise WiFiControlError(error_message)
+        return True
+
+    def __apply_live(self, keys, transaction=None):
+        if transaction is None:
+            self.push_config(keys)
+        else:
+            push = lambda: self.push_config(keys)
+            transaction.on_commit(push, undo=push)
+
+    def get_station_table(self):
+        if self.stations is None:
+            self.stations = StationTable(
+                lambda: HostapdControl(self.get_control_socket_path()))
+        return self.stations
+
+    def start_station_monitor(self):
+        self.get_station_table().start()
 
-    def set_hostap_password(self, password):
-        self.replace("^wpa_passphrase=.*",
-                     "wpa_passphrase={}".format(password), self.hostapd_path)
+    def stop_station_monitor(self):
+        if self.stations is not None:
+            self.stations.stop()
+
+    def get_stations(self, refresh=False):
+        try:
+            return self.get_station_table().get_stations(refresh)
+        except HostapdControlError as error:
+            error_message = "WiFiControl: hostapd control error\n"
+            error_message += "Error: {}".format(error)
+            raise WiFiControlError(error_message)
+
+    def get_station(self, address, refresh=True):
+        try:
+            return self.get_station_table().get_station(address, refresh)
+        except HostapdControlError as error:
+            error_message = "WiFiControl: hostapd control error\n"
+            error_message += "Error: {}".format(error)
+            raise WiFiControlError(error_message)
+
+    def get_hostap_name(self, transaction=None):
+        return self.read_config(self.hostapd_path, transaction).get('ssid')
+
+    def set_hostap_name(self, name='reach', transaction=None, live=False):
+        mac_addr = self.get_device_mac()[-6:]
+        keys = ['ssid']
+        with self.edit_config(self.hostapd_path, transaction) as config:
+            config.set('ssid', "{}{}".format(name, mac_addr))
+            if 'wpa_psk' in config:
+                passphrase = config.get('wpa_passphrase')
+                if passphrase is None:
+                    error_message = "WiFiControl: can't recompute wpa_psk "
+                    error_message += "for the new SSID\n"
+                    error_message += "Error: no wpa_passphrase in {}".format(
+                        self.hostapd_path)
+                    raise WiFiControlError(error_message)
+                config.set('wpa_psk', derive_psk(config.get('ssid'),
+                                                 passphrase))
+                keys.append('wpa_psk')
+
+        if live:
+            self.__apply_live(keys, transaction)
+
+    def set_hostap_password(self, password, precompute_psk=False, live=False):
+        keys = ['wpa_passphrase']
+        with self.edit_config(self.hostapd_path) as config:
+            config.set('wpa_passphrase', password)
+            if precompute_psk:
+                config.set('wpa_psk', derive_psk(config.get('ssid'), password),
+                           after='wpa_passphrase')
+                keys.append('wpa_psk')
+            else:
+                config.remove('wpa_psk')
+
+        if live:
+            self.__apply_live(keys)
         return self.verify_hostap_password(password)
 
     def verify_hostap_password(self, value):
-        return self.re_search("(?<=^wpa_passphrase=).*", self.hostapd_path) == value
+        config = self.read_config(self.hostapd_path)
+        if config.get('wpa_passphrase') != value:
+            return False
+        psk = config.get('wpa_psk')
+        return psk is None or psk == derive_psk(config.get('ssid'), value)
+
+    def get_hostap_psk(self):
+        return self.read_config(self.hostapd_path).get('wpa_psk')
+
+    def set_hostap_psk(self, password):
+        with self.edit_config(self.hostapd_path) as config:
+            if password is None:
+                config.remove('wpa_psk')
+            else:
+                config.set('wpa_psk', derive_psk(config.get('ssid'), password),
+                           after='wpa_passphrase')
+
+    def set_host_name(self, name='reach', transaction=None):
+        if transaction is not None:
+            update_hostname = lambda: self.execute_command(
+                'hostname -F {}'.format(self.hostname_path))
+            self.write_file(self.hostname_path, name + '\n', transaction)
+            transaction.on_commit(update_hostname, undo=update_hostname)
+            return
 
-    def set_host_name(self, name='reach'):
         try:
-            with open(self.hostname_path, 'w', 0) as hostname_file:
-                hostname_file.write(name + '\n')
-                hostname_file.flush()
-                os.fsync(hostname_file)
-        except IOError:
+            self.write_file(self.hostname_path, name + '\n')
+            self.flush(self.hostname_path)
+        except (IOError, OSError):
             pass
         else:
             self.execute_command('hostname -F {}'.format(self.hostname_path))
 
-    def get_host_name(self):
-        return self.re_search("^.*", self.hostname_path)
+    def get_host_name(self, transaction=None):
+        return self.read_file(self.hostname_path, transaction).split('\n', 1)[0]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,176 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+from collections import deque
+from threading import Lock
+from wificommon import WiFiControlError
+
+
+class Stage(object):
+    def __init__(self, name, action, required=True):
+        self.name = name
+        self.action = action
+        self.required = required
+
+
+class TransitionEngine(object):
+    OFF = 'wifi_off'
+    CLIENT = 'wpa_supplicant'
+    HOST = 'hostapd'
+
+    TIMEOUTS = {
+        'rfkill': 5,
+        'stop': 10,
+        'start': 10,
+        'interface': 10,
+        'ip': 5,
+    }
+
+    HISTORY_SIZE = 50
+    PROBE_INTERVAL = 0.05
+
+    def __init__(self, wifi, wpasupplicant, hotspot):
+        self.wifi = wifi
+        self.wpasupplicant = wpasupplicant
+        self.hotspot = hotspot
+        self.state = None
+
+        self.timeouts = dict(self.TIMEOUTS)
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self._lock = Lock()
+
+    def set_stage_timeout(self, stage, timeout):
+        if stage not in self.timeouts:
+            raise ValueError("Unknown transition stage: {}".format(stage))
+        self.timeouts[stage] = timeout
+
+    def get_timings(self, count=None):
+        with self._lock:
+            history = list(self.history)
+        if count is not None:
+            history = history[-count:] if count > 0 else []
+        return history
+
+    def __stages(self, target):
+        if target == self.CLIENT:
+            return [
+                Stage('rfkill', lambda timeout: self.wifi.unblock()),
+                Stage('stop', self.hotspot.stop),
+                Stage('start', lambda timeout: self.wpasupplicant.start(
+                    timeout, wait_ready=False)),
+                Stage('interface', self.wpasupplicant.wait_ready),
+                Stage('ip', self.check_ip, required=False),
+            ]
+        elif target == self.HOST:
+            return [
+                Stage('rfkill', lambda timeout: self.wifi.unblock()),
+                Stage('stop', self.wpasupplicant.stop),
+                Stage('start', lambda timeout: self.hotspot.start(
+                    timeout, wait_ready=False)),
+                Stage('interface', self.hotspot.wait_ready),
+                Stage('ip', self.wait_ip, required=False),
+            ]
+        elif target == self.OFF:
+            return [
+                Stage('stop', self.stop_all),
+                Stage('rfkill', lambda timeout: self.wifi.block()),
+            ]
+        raise ValueError("Unknown WiFi mode: {}".format(target))
+
+    def stop_all(self, timeout):
+        deadline = time.time() + timeout
+        self.hotspot.stop(timeout)
+        self.wpasupplicant.stop(max(deadline - time.time(), 0),
+                                keep_service=False)
+
+    def check_ip(self, timeout):
+        return self.wifi.get_device_ip() != "127.0.0.1"
+
+    def wait_ip(self, timeout):
+        deadline = time.time() + timeout
+        while not self.check_ip(timeout):
+            if time.time() >= deadline:
+                return False
+            time.sleep(self.PROBE_INTERVAL)
+        return True
+
+    def run(self, target):
+        with self._lock:
+            stages = self.__stages(target)
+            record = {
+                'source': self.state,
+                'target': target,
+                'started': time.time(),
+                'stages': [],
+            }
+
+            try:
+                for stage in stages:
+                    self.__run_stage(stage, record)
+            except Exception:
+                record['result'] = 'failed'
+                self.state = None
+                raise
+            else:
+                record['result'] = 'done'
+                self.state = target
+            finally:
+                record['duration'] = time.time() - record['started']
+                self.history.append(record)
+
+    def __run_stage(self, stage, record):
+        timeout = self.timeouts[stage.name]
+        timing = {'name': stage.name, 'timeout': timeout}
+        record['stages'].append(timing)
+
+        start = time.time()
+        try:
+            ready = stage.action(timeout)
+        except Exception as error:
+            timing['duration'] = time.time() - start
+            timing['result'] = 'failed'
+            timing['error'] = str(error)
+            raise
+
+        timing['duration'] = time.time() - start
+        if ready is False or timing['duration'] > timeout:
+            timing['result'] = 'timeout'
+            if stage.required:
+                raise WiFiControlError(
+                    "WiFiControl: {} stage timed out switching to {}".format(
+                        stage.name, record['target']))
+        else:
+            timing['result'] = 'done'
@@ -1,10 +1,29 @@
 from .fileupdater import CfgFileUpdater
 from .dbuswpasupplicant import WpaSupplicantInterface, WpaSupplicantNetwork, WpaSupplicantBSS
+from .dbuswpasupplicant import BSSTable, NetworkIndex
+from .systemdunit import SystemdUnit
+from .signalloop import wait_signal, attach_main_loop, detach_main_loop
+from .pmksacache import PMKSACache
+from .atomicwrite import atomic_write, get_writer, flush_all
+from .filewatch import FileWatcher, watch_file
+from .keyvalueconfig import KeyValueConfig
+from .transaction import FileTransaction
+from .hostapdcontrol import HostapdControl
+from .stationtable import StationTable
 from .networkstranslate import convert_to_wpas_network, convert_to_wificontrol_network, create_security
+from .networkstranslate import derive_psk, is_hex_psk
 
 from .fileupdater import FileError
 from .dbuswpasupplicant import ServiceError, InterfaceError, PropertyError
+from .systemdunit import UnitError
+from .transaction import TransactionError
+from .hostapdcontrol import HostapdControlError
 
 __all__ = ["CfgFileUpdater", "WpaSupplicantInterface", "WpaSupplicantNetwork", 
-    "WpaSupplicantBSS", "convert_to_wpas_network", "convert_to_wificontrol_network",
-    "FileError", "ServiceError", "InterfaceError", "PropertyError"]
+    "WpaSupplicantBSS", "BSSTable", "NetworkIndex", "SystemdUnit", "PMKSACache", "atomic_write",
+    "wait_signal", "attach_main_loop", "detach_main_loop",
+    "get_writer", "flush_all", "FileWatcher", "watch_file",
+    "KeyValueConfig", "FileTransaction",
+    "HostapdControl", "StationTable", "convert_to_wpas_network",
+    "convert_to_wificontrol_network", "derive_psk", "is_hex_psk", "FileError", "ServiceError", "InterfaceError", "PropertyError",
+    "UnitError", "TransactionError", "HostapdControlError"]
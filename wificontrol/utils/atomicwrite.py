@@ -0,0 +1,159 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import atexit
+import tempfile
+from threading import RLock, Timer
+
+
+def fsync_directory(directory):
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def open_temporary(path, mode=None):
+    if mode is None:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o644
+
+    descriptor, temporary_path = tempfile.mkstemp(
+        prefix='.' + os.path.basename(path) + '.',
+        dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.fchmod(descriptor, mode)
+        return os.fdopen(descriptor, 'w'), temporary_path
+    except BaseException:
+        os.close(descriptor)
+        remove_file(temporary_path)
+        raise
+
+
+def atomic_write(path, data, mode=None):
+    temporary_file, temporary_path = open_temporary(path, mode)
+    try:
+        with temporary_file:
+            temporary_file.write(data)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.rename(temporary_path, path)
+    except BaseException:
+        remove_file(temporary_path)
+        raise
+
+    fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+class AtomicWriter(object):
+    def __init__(self, path):
+        self.path = path
+        self.writes = 0
+        self.listeners = []
+        self.__lock = RLock()
+        self.__pending = None
+        self.__timer = None
+
+    def read(self):
+        with self.__lock:
+            if self.__pending is not None:
+                return self.__pending
+            with open(self.path, 'r') as data_file:
+                return data_file.read()
+
+    def write(self, data, delay=0):
+        with self.__lock:
+            self.__pending = data
+            if not delay:
+                self.flush()
+            elif self.__timer is None:
+                self.__timer = Timer(delay, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+        for listener in list(self.listeners):
+            listener()
+
+    def has_pending(self):
+        return self.__pending is not None
+
+    def flush(self):
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+
+            data, self.__pending = self.__pending, None
+            if data is not None:
+                atomic_write(self.path, data)
+                self.writes += 1
+
+
+_writers = {}
+_writers_lock = RLock()
+
+
+def get_writer(path):
+    path = os.path.abspath(path)
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = AtomicWriter(path)
+        return _writers[path]
+
+
+def flush_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+atexit.register(flush_all)
@@ -34,6 +34,12 @@
 
 
 import dbus
+import time
+import binascii
+from collections import OrderedDict
+from threading import Lock, Event
+from .signalloop import get_system_bus, start_signal_loop, in_signal_loop
+from .networkstranslate import is_hex_psk
 
 
 class ServiceError(Exception):
@@ -48,42 +54,222 @@ class PropertyError(Exception):
     pass
 
 
+class ProxyCache(object):
+    def __init__(self):
+        self._proxies = {}
+        self._lock = Lock()
+        self._watched_buses = set()
+
+        self.created = 0
+        self.hits = 0
+
+    def get(self, bus, service, path, interface_name):
+        with self._lock:
+            interfaces = self._proxies.get(path)
+
+            if interfaces is None:
+                interfaces = {None: self.__get_object(bus, service, path)}
+                self._proxies[path] = interfaces
+                self.created += 1
+            else:
+                self.hits += 1
+
+            try:
+                return interfaces[interface_name]
+            except KeyError:
+                interface = dbus.Interface(interfaces[None], interface_name)
+                interfaces[interface_name] = interface
+                return interface
+
+    @staticmethod
+    def __get_object(bus, service, path):
+        try:
+            return bus.get_object(service, path,
+                                  follow_name_owner_changes=True)
+        except RuntimeError:
+            return bus.get_object(service, path)
+
+    def evict(self, path, children=False):
+        path = str(path)
+        with self._lock:
+            self._proxies.pop(path, None)
+            if children:
+                for cached_path in list(self._proxies):
+                    if cached_path.startswith(path + '/'):
+                        del self._proxies[cached_path]
+
+    def clear(self):
+        with self._lock:
+            self._proxies.clear()
+
+    def get_statistics(self):
+        with self._lock:
+            return {'created': self.created, 'hits': self.hits,
+                    'cached': len(self._proxies)}
+
+    def watch(self, bus, service, interface_name):
+        with self._lock:
+            if id(bus) in self._watched_buses:
+                return
+            self._watched_buses.add(id(bus))
+
+        try:
+            bus.add_signal_receiver(self._interface_removed,
+                                    dbus_interface=service,
+                                    signal_name="InterfaceRemoved")
+        except RuntimeError:
+            with self._lock:
+                self._watched_buses.discard(id(bus))
+            return
+
+        for signal_name in ("BSSRemoved", "NetworkRemoved"):
+            bus.add_signal_receiver(self._object_removed,
+                                    dbus_interface=interface_name,
+                                    signal_name=signal_name)
+
+        bus.add_signal_receiver(self._name_owner_changed,
+                                dbus_interface="org.freedesktop.DBus",
+                                signal_name="NameOwnerChanged",
+                                arg0=service)
+
+    def _interface_removed(self, path):
+        self.evict(path, children=True)
+
+    def _object_removed(self, path):
+        self.evict(path)
+
+    def _name_owner_changed(self, name, old_owner, new_owner):
+        self.clear()
+
+
 class WpaSupplicantDBus(object):
     _BASE_NAME = "fi.w1.wpa_supplicant1"
     _BASE_PATH = "/fi/w1/wpa_supplicant1"
+    _INTERFACE_NAME = "fi.w1.wpa_supplicant1.Interface"
+
+    _proxy_cache = ProxyCache()
+
+    BATCH_TIMEOUT = 5
 
     def __init__(self):
-        self._bus = dbus.SystemBus()
+        self._bus = get_system_bus()
+        self._proxy_cache.watch(self._bus, self._BASE_NAME,
+                                self._INTERFACE_NAME)
+
+    def _get_dbus_interface(self, path, interface_name):
+        return self._proxy_cache.get(self._bus, self._BASE_NAME, path,
+                                     interface_name)
+
+    def _drop_proxy(self, path):
+        self._proxy_cache.evict(path)
+
+    def get_proxy_statistics(self):
+        return self._proxy_cache.get_statistics()
+
+    def _add_signal_receiver(self, handler, path, interface_name, signal_name,
+                             **match_args):
+        start_signal_loop()
+        return self._bus.add_signal_receiver(handler,
+                                             dbus_interface=interface_name,
+                                             signal_name=signal_name,
+                                             path=path, **match_args)
+
+    def _call_many(self, calls, error_class, timeout=None):
+        if timeout is None:
+            timeout = self.BATCH_TIMEOUT
+
+        if in_signal_loop():
+            return [self.__call(call, error_class) for call in calls]
+
+        no_reply = object()
+        results = [no_reply] * len(calls)
+        pending = [len(calls)]
+        lock = Lock()
+        done = Event()
+
+        def finish(index, result):
+            with lock:
+                results[index] = result
+                pending[0] -= 1
+                if pending[0] == 0:
+                    done.set()
+
+        def reply(index):
+            return lambda *reply: finish(index, reply[0] if reply else None)
+
+        def error(index, path):
+            def handler(error):
+                self._drop_proxy(path)
+                finish(index, error_class(error))
+            return handler
+
+        if calls:
+            start_signal_loop()
+        else:
+            done.set()
+
+        for index, (path, interface_name, method_name, args) in \
+                enumerate(calls):
+            try:
+                dbus_interface = self._get_dbus_interface(path, interface_name)
+                getattr(dbus_interface, method_name)(
+                    *args, reply_handler=reply(index),
+                    error_handler=error(index, path), timeout=timeout)
+            except dbus.exceptions.DBusException as error:
+                self._drop_proxy(path)
+                finish(index, error_class(error))
+
+        done.wait(timeout)
+        with lock:
+            return [error_class("No reply from {}".format(call[0]))
+                    if result is no_reply else result
+                    for call, result in zip(calls, results)]
+
+    def __call(self, call, error_class):
+        path, interface_name, method_name, args = call
+        try:
+            dbus_interface = self._get_dbus_interface(path, interface_name)
+            return getattr(dbus_interface, method_name)(*args)
+        except dbus.exceptions.DBusException as error:
+            self._drop_proxy(path)
+            return error_class(error)
+
+    def _get_all_many(self, paths, interface_name, timeout=None):
+        return self._call_many([(path, dbus.PROPERTIES_IFACE, "GetAll",
+                                 (interface_name,)) for path in paths],
+                               PropertyError, timeout)
 
     def __get_interface(self):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._BASE_PATH)
-            return dbus.Interface(obj, self._BASE_NAME)
+            return self._get_dbus_interface(self._BASE_PATH, self._BASE_NAME)
         except dbus.exceptions.DBusException as error:
             raise ServiceError(error)
 
     def __get_properties(self):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._BASE_PATH)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                self._BASE_PATH, dbus.PROPERTIES_IFACE)
             return properties_interface.GetAll(self._BASE_NAME)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._BASE_PATH)
             raise ServiceError(error)
 
     def __get_property(self, property_name):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._BASE_PATH)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                self._BASE_PATH, dbus.PROPERTIES_IFACE)
             return properties_interface.Get(self._BASE_NAME, property_name)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._BASE_PATH)
             raise PropertyError(error)
 
     def __set_property(self, property_name, property_value):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._BASE_PATH)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                self._BASE_PATH, dbus.PROPERTIES_IFACE)
             properties_interface.Set(self._BASE_NAME, property_name, property_value)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._BASE_PATH)
             raise PropertyError(error)
 
     def get_interface(self, interface):
@@ -160,54 +346,229 @@ class WpaSupplicantDBus(object):
         return self.__get_properties()
 
 
+def channel_to_frequency(channel):
+    if channel >= 1000:
+        return channel
+    if channel == 14:
+        return 2484
+    if channel < 14:
+        return 2407 + channel * 5
+    return 5000 + channel * 5
+
+
 class WpaSupplicantInterface(WpaSupplicantDBus):
-    _INTERFACE_NAME = "fi.w1.wpa_supplicant1.Interface"
+    _CHANNEL_WIDTH = 20
 
-    def __init__(self, interface):
+    def __init__(self, interface, mirror=False):
 
         super(WpaSupplicantInterface, self).__init__()
         self.interface = interface
+        self._interface_path = None
+        self._path_valid = False
+        self._path_receivers = []
+
+        self.mirror = mirror
+        self.stale = True
+        self._mirror_lock = Lock()
+        self._mirror_path = None
+        self._mirror_receivers = []
+        self._properties = {}
 
     def initialize(self):
-        self._interface_path = self.get_interface(self.interface)
+        if not self._path_valid:
+            self.__watch_interfaces()
+            self._path_valid = True
+            try:
+                self._interface_path = self.get_interface(self.interface)
+            except (ServiceError, InterfaceError):
+                self._path_valid = False
+                raise
+        if self.mirror:
+            self.__start_mirror()
+
+    def invalidate(self):
+        self._path_valid = False
+        self.stale = True
+
+    def attach(self, config_file=None, driver=None):
+        self.invalidate()
+        try:
+            self.create_interface(self.interface, driver=driver,
+                                  config_file=config_file)
+        except InterfaceError:
+            pass
+        self.initialize()
+
+    def detach(self):
+        try:
+            self.initialize()
+        except InterfaceError:
+            return
+        self.remove_interface(self._interface_path)
+        self.invalidate()
+
+    def is_ready(self):
+        if not self._bus.name_has_owner(self._BASE_NAME):
+            return False
+        try:
+            self.initialize()
+        except (ServiceError, InterfaceError):
+            return False
+        return True
 
     def __get_interface(self):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._interface_path)
-            return dbus.Interface(obj, self._INTERFACE_NAME)
+            return self._get_dbus_interface(self._interface_path,
+                                            self._INTERFACE_NAME)
         except dbus.exceptions.DBusException as error:
             raise InterfaceError(error)
 
+    def __watch_interfaces(self):
+        if not self._path_receivers:
+            self._path_receivers = [
+                self._add_signal_receiver(self.__interface_added, None,
+                                          self._BASE_NAME, "InterfaceAdded"),
+                self._add_signal_receiver(self.__interface_removed, None,
+                                          self._BASE_NAME, "InterfaceRemoved"),
+                self._add_signal_receiver(self.__service_lost, None,
+                                          "org.freedesktop.DBus",
+                                          "NameOwnerChanged",
+                                          arg0=self._BASE_NAME),
+            ]
+
+    def __interface_added(self, path, properties):
+        if properties.get('Ifname') == self.interface:
+            self.invalidate()
+
+    def __interface_removed(self, path):
+        if path == self._interface_path:
+            self.invalidate()
+
+    def __service_lost(self, name, old_owner, new_owner):
+        self.invalidate()
+
+    def __start_mirror(self):
+        if self._mirror_path != self._interface_path:
+            self.__stop_mirror()
+            self._mirror_receivers = [
+                self.add_signal_receiver("PropertiesChanged",
+                                         self.__properties_changed),
+            ]
+            self._mirror_path = self._interface_path
+        if self.stale:
+            self.refresh()
+
+    def __stop_mirror(self):
+        for receiver in self._mirror_receivers:
+            receiver.remove()
+        self._mirror_receivers = []
+        self._mirror_path = None
+        self.stale = True
+
+    def __properties_changed(self, properties):
+        with self._mirror_lock:
+            self._properties.update(properties)
+
+    def refresh(self):
+        try:
+            properties_interface = self._get_dbus_interface(
+                self._interface_path, dbus.PROPERTIES_IFACE)
+            properties = properties_interface.GetAll(self._INTERFACE_NAME)
+        except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._interface_path)
+            raise PropertyError(error)
+        with self._mirror_lock:
+            self._properties = dict(properties)
+            self.stale = False
+
     def __get_property(self, property_name):
+        if self.mirror and not self.stale:
+            with self._mirror_lock:
+                if property_name in self._properties:
+                    return self._properties[property_name]
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._interface_path)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                self._interface_path, dbus.PROPERTIES_IFACE)
             return properties_interface.Get(self._INTERFACE_NAME, property_name)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._interface_path)
             raise PropertyError(error)
 
     def __set_property(self, property_name, property_value):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, self._interface_path)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                self._interface_path, dbus.PROPERTIES_IFACE)
             properties_interface.Set(self._INTERFACE_NAME, property_name, property_value)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(self._interface_path)
             raise PropertyError(error)
 
-    def scan(self):
+    def get_interface_path(self):
+        return self._interface_path
+
+    def add_signal_receiver(self, signal_name, handler):
+        return self._add_signal_receiver(handler, self._interface_path,
+                                         self._INTERFACE_NAME, signal_name)
+
+    def scan(self, scan_type=None, ssids=None, channels=None, allow_roam=None):
+        args = {"Type": scan_type or ("active" if ssids else "passive")}
+        if ssids:
+            args["SSIDs"] = dbus.Array([self.__encode_ssid(ssid)
+                                        for ssid in ssids], 'ay')
+        if channels:
+            args["Channels"] = dbus.Array([self.__encode_channel(channel)
+                                           for channel in channels], '(uu)')
+        if allow_roam is not None:
+            args["AllowRoam"] = dbus.Boolean(allow_roam)
+
         interface = self.__get_interface()
         try:
-            return interface.Scan(dbus.Dictionary({"Type": "passive"}, 'sv'))
+            return interface.Scan(dbus.Dictionary(args, 'sv'))
         except dbus.exceptions.DBusException as error:
             raise ServiceError(error)
 
+    def __encode_ssid(self, ssid):
+        if not isinstance(ssid, bytes):
+            ssid = ssid.encode('utf-8')
+        return dbus.ByteArray(ssid)
+
+    def __encode_channel(self, channel):
+        try:
+            frequency, width = channel
+        except TypeError:
+            frequency, width = channel, self._CHANNEL_WIDTH
+        return dbus.Struct((dbus.UInt32(channel_to_frequency(frequency)),
+                            dbus.UInt32(width)), signature='uu')
+
     def add_network(self, network):
         interface = self.__get_interface()
         try:
-            return interface.AddNetwork(dbus.Dictionary(network, 'sv'))
+            return interface.AddNetwork(
+                dbus.Dictionary(self.__encode_network(network), 'sv'))
         except dbus.exceptions.DBusException as error:
             raise ServiceError(error)
 
+    def __encode_network(self, network):
+        if is_hex_psk(network.get('psk')):
+            network = dict(network)
+            network['psk'] = dbus.ByteArray(
+                binascii.unhexlify(network['psk']))
+        return network
+
+    def get_pmksa(self):
+        interface = self.__get_interface()
+        try:
+            return interface.PMKSAGet()
+        except dbus.exceptions.DBusException as error:
+            raise InterfaceError(error)
+
+    def add_pmksa(self, entry):
+        interface = self.__get_interface()
+        try:
+            interface.PMKSAAdd(dbus.Dictionary(entry, 'sv'))
+        except dbus.exceptions.DBusException as error:
+            raise InterfaceError(error)
+
     def remove_network(self, network_path):
         interface = self.__get_interface()
         try:
@@ -215,6 +576,18 @@ class WpaSupplicantInterface(WpaSupplicantDBus):
         except dbus.exceptions.DBusException as error:
             raise ServiceError(error)
 
+    def add_networks(self, networks):
+        return self._call_many(
+            [(self._interface_path, self._INTERFACE_NAME, "AddNetwork",
+              (dbus.Dictionary(self.__encode_network(network), 'sv'),))
+             for network in networks], ServiceError)
+
+    def remove_networks(self, network_paths):
+        return self._call_many(
+            [(self._interface_path, self._INTERFACE_NAME, "RemoveNetwork",
+              (network_path,)) for network_path in network_paths],
+            ServiceError)
+
     def remove_all_networks(self):
         interface = self.__get_interface()
         try:
@@ -312,22 +685,38 @@ class WpaSupplicantBSS(WpaSupplicantDBus):
 
     def __get_property(self, bss_path, property_name):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, bss_path)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                bss_path, dbus.PROPERTIES_IFACE)
             return properties_interface.Get(self._BSS_NAME, property_name)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(bss_path)
             raise PropertyError(error)
 
     def __set_property(self, bss_path, property_name, property_value):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, bss_path)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                bss_path, dbus.PROPERTIES_IFACE)
             properties_interface.Set(self._BSS_NAME, property_name, property_value)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(bss_path)
             raise PropertyError(error)
 
-    def get_SSID(self, bss_path):
-        name_array = self.__get_property(bss_path, "SSID")
+    def __get_properties(self, bss_path):
+        try:
+            properties_interface = self._get_dbus_interface(
+                bss_path, dbus.PROPERTIES_IFACE)
+            return properties_interface.GetAll(self._BSS_NAME)
+        except dbus.exceptions.DBusException as error:
+            self._drop_proxy(bss_path)
+            raise PropertyError(error)
+
+    def get_all(self, bss_path):
+        return self.__get_properties(bss_path)
+
+    def get_many(self, bss_paths):
+        return self._get_all_many(bss_paths, self._BSS_NAME)
+
+    def decode_SSID(self, name_array):
         try:
             ssid = "".join([str(letter) for letter in name_array])
         except UnicodeDecodeError:
@@ -335,10 +724,14 @@ class WpaSupplicantBSS(WpaSupplicantDBus):
             ssid = str(ssid.decode('hex'))
         return ssid
 
+    def decode_BSSID(self, mac_array):
+        return ":".join([hex(byte)[2:].zfill(2) for byte in mac_array])
+
+    def get_SSID(self, bss_path):
+        return self.decode_SSID(self.__get_property(bss_path, "SSID"))
+
     def get_BSSID(self, bss_path):
-        mac_array = self.__get_property(bss_path, "BSSID")
-        bssid = ":".join([hex(byte)[2:].zfill(2) for byte in mac_array])
-        return bssid
+        return self.decode_BSSID(self.__get_property(bss_path, "BSSID"))
 
     def get_WPA(self, bss_path):
         return self.__get_property(bss_path, "WPA")
@@ -359,6 +752,178 @@ class WpaSupplicantBSS(WpaSupplicantDBus):
         return int(self.__get_property(bss_path, "Signal"))
 
 
+class BSSRecord(object):
+    __slots__ = ('path', 'ssid', 'bssid', 'wpa', 'rsn',
+                 'frequency', 'signal', 'age', 'updated')
+
+    def __init__(self, path):
+        self.path = path
+        self.ssid = None
+        self.bssid = None
+        self.wpa = {}
+        self.rsn = {}
+        self.frequency = None
+        self.signal = None
+        self.age = None
+        self.updated = None
+
+    def get_age(self):
+        if self.age is None:
+            return None
+        return self.age + time.time() - self.updated
+
+
+class BSSTable(WpaSupplicantBSS):
+    def __init__(self, interface):
+        super(BSSTable, self).__init__()
+        self.interface = interface
+        self.synced = False
+
+        self._lock = Lock()
+        self._receivers = []
+        self._interface_path = None
+        self._removed_paths = None
+
+        self._by_path = OrderedDict()
+        self._by_bssid = {}
+        self._by_ssid = {}
+
+    def start(self):
+        interface_path = self.interface.get_interface_path()
+        if self._interface_path != interface_path:
+            self.stop()
+            self._interface_path = interface_path
+            self._receivers = [
+                self.interface.add_signal_receiver("BSSAdded",
+                                                   self.__bss_added),
+                self.interface.add_signal_receiver("BSSRemoved",
+                                                   self.__bss_removed),
+                self._add_signal_receiver(self.__bss_changed, None,
+                                          self._BSS_NAME, "PropertiesChanged",
+                                          path_keyword='path'),
+                self._add_signal_receiver(self.__interface_removed, None,
+                                          self._BASE_NAME, "InterfaceRemoved"),
+                self._add_signal_receiver(self.__service_lost, None,
+                                          "org.freedesktop.DBus",
+                                          "NameOwnerChanged",
+                                          arg0=self._BASE_NAME),
+            ]
+        if not self.synced:
+            self.sync()
+
+    def stop(self):
+        for receiver in self._receivers:
+            receiver.remove()
+        self._receivers = []
+        self._interface_path = None
+        self.synced = False
+
+    def sync(self):
+        with self._lock:
+            self._removed_paths = set()
+
+        bss_paths = self.interface.get_BSSs()
+        snapshots = [(bss_path, properties) for bss_path, properties in
+                     zip(bss_paths, self.get_many(bss_paths))
+                     if not isinstance(properties, PropertyError)]
+
+        with self._lock:
+            self.__clear()
+            for bss_path, properties in snapshots:
+                if bss_path not in self._removed_paths:
+                    self.__update(bss_path, properties)
+            self._removed_paths = None
+            self.synced = True
+
+    def __clear(self):
+        self._by_path.clear()
+        self._by_bssid.clear()
+        self._by_ssid.clear()
+
+    def __update(self, bss_path, properties):
+        record = self._by_path.get(bss_path)
+        if record is None:
+            record = BSSRecord(bss_path)
+            self._by_path[bss_path] = record
+
+        if 'SSID' in properties:
+            self.__unindex_ssid(record)
+            record.ssid = self.decode_SSID(properties['SSID'])
+            self._by_ssid.setdefault(record.ssid, set()).add(bss_path)
+        if 'BSSID' in properties:
+            self._by_bssid.pop(record.bssid, None)
+            record.bssid = self.decode_BSSID(properties['BSSID'])
+            self._by_bssid[record.bssid] = bss_path
+        if 'WPA' in properties:
+            record.wpa = properties['WPA']
+        if 'RSN' in properties:
+            record.rsn = properties['RSN']
+        if 'Frequency' in properties:
+            record.frequency = int(properties['Frequency'])
+        if 'Signal' in properties:
+            record.signal = int(properties['Signal'])
+        if 'Age' in properties:
+            record.age = int(properties['Age'])
+            record.updated = time.time()
+
+    def __remove(self, bss_path):
+        record = self._by_path.pop(bss_path, None)
+        if record is not None:
+            self.__unindex_ssid(record)
+            if self._by_bssid.get(record.bssid) == bss_path:
+                del self._by_bssid[record.bssid]
+
+    def __unindex_ssid(self, record):
+        paths = self._by_ssid.get(record.ssid)
+        if paths is not None:
+            paths.discard(record.path)
+            if not paths:
+                del self._by_ssid[record.ssid]
+
+    def __bss_added(self, bss_path, properties):
+        with self._lock:
+            self.__update(bss_path, properties)
+
+    def __bss_removed(self, bss_path):
+        with self._lock:
+            if self._removed_paths is not None:
+                self._removed_paths.add(bss_path)
+            self.__remove(bss_path)
+
+    def __bss_changed(self, properties, path=None):
+        with self._lock:
+            if path in self._by_path:
+                self.__update(path, properties)
+
+    def __interface_removed(self, path):
+        if path == self._interface_path:
+            self.synced = False
+
+    def __service_lost(self, name, old_owner, new_owner):
+        self.synced = False
+
+    def get_records(self):
+        with self._lock:
+            return list(self._by_path.values())
+
+    def get_record(self, bss_path):
+        with self._lock:
+            return self._by_path.get(bss_path)
+
+    def find_bssid(self, bssid):
+        with self._lock:
+            return self._by_path.get(self._by_bssid.get(bssid))
+
+    def find_ssid(self, ssid):
+        with self._lock:
+            return [self._by_path[bss_path]
+                    for bss_path in self._by_ssid.get(ssid, ())]
+
+    def is_visible(self, ssid):
+        with self._lock:
+            return ssid in self._by_ssid
+
+
 class WpaSupplicantNetwork(WpaSupplicantDBus):
     _NETWORK_NAME = "fi.w1.wpa_supplicant1.Network"
 
@@ -367,10 +932,11 @@ class WpaSupplicantNetwork(WpaSupplicantDBus):
 
     def __get_properties(self, network_path):
         try:
-            obj = self._bus.get_object(self._BASE_NAME, network_path)
-            properties_interface = dbus.Interface(obj, dbus.PROPERTIES_IFACE)
+            properties_interface = self._get_dbus_interface(
+                network_path, dbus.PROPERTIES_IFACE)
             return properties_interface.GetAll(self._NETWORK_NAME)
         except dbus.exceptions.DBusException as error:
+            self._drop_proxy(network_path)
             raise PropertyError(error)
 
     def network_enable(self, network_path):
@@ -379,13 +945,131 @@ class WpaSupplicantNetwork(WpaSupplicantDBus):
     def network_properties(self, network_path):
         return self.__get_properties(network_path)['Properties']
 
-    def get_network_SSID(self, network_path):
-        ssid = self.network_properties(network_path)['ssid']
+    def get_all(self, network_path):
+        return self.__get_properties(network_path)
+
+    def get_many(self, network_paths):
+        return self._get_all_many(network_paths, self._NETWORK_NAME)
+
+    def decode_network_SSID(self, ssid):
         try:
             return str(ssid.decode('hex')).strip("\"")
         except TypeError:
             return str(ssid).strip("\"")
 
+    def get_network_SSID(self, network_path):
+        return self.decode_network_SSID(
+            self.network_properties(network_path)['ssid'])
+
+
+class NetworkIndex(WpaSupplicantNetwork):
+    def __init__(self, interface):
+        super(NetworkIndex, self).__init__()
+        self.interface = interface
+        self.synced = False
+
+        self._lock = Lock()
+        self._receivers = []
+        self._interface_path = None
+
+        self._by_ssid = {}
+        self._by_path = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        interface_path = self.interface.get_interface_path()
+        if self._interface_path != interface_path:
+            self.stop()
+            self._interface_path = interface_path
+            self._receivers = [
+                self.interface.add_signal_receiver("NetworkAdded",
+                                                   self.__network_added),
+                self.interface.add_signal_receiver("NetworkRemoved",
+                                                   self.__network_removed),
+                self._add_signal_receiver(self.__network_changed, None,
+                                          self._NETWORK_NAME,
+                                          "PropertiesChanged",
+                                          path_keyword='path'),
+                self._add_signal_receiver(self.__interface_removed, None,
+                                          self._BASE_NAME, "InterfaceRemoved"),
+                self._add_signal_receiver(self.__service_lost, None,
+                                          "org.freedesktop.DBus",
+                                          "NameOwnerChanged",
+                                          arg0=self._BASE_NAME),
+            ]
+
+    def stop(self):
+        for receiver in self._receivers:
+            receiver.remove()
+        self._receivers = []
+        self._interface_path = None
+        self.synced = False
+
+    def rebuild(self):
+        network_paths = self.interface.get_networks()
+        networks = [(network_path, properties) for network_path, properties in
+                    zip(network_paths, self.get_many(network_paths))
+                    if not isinstance(properties, PropertyError)]
+
+        with self._lock:
+            self._by_ssid.clear()
+            self._by_path.clear()
+            for network_path, properties in networks:
+                self.__update(network_path, properties)
+            self.synced = True
+
+    def __update(self, network_path, properties):
+        try:
+            ssid = self.decode_network_SSID(properties['Properties']['ssid'])
+        except KeyError:
+            return
+        self.__remove(network_path)
+        self._by_path[network_path] = ssid
+        self._by_ssid.setdefault(ssid, network_path)
+
+    def __remove(self, network_path):
+        ssid = self._by_path.pop(network_path, None)
+        if ssid is not None and self._by_ssid.get(ssid) == network_path:
+            del self._by_ssid[ssid]
+
+    def __network_added(self, network_path, properties):
+        with self._lock:
+            self.__update(network_path, properties)
+
+    def __network_removed(self, network_path):
+        with self._lock:
+            self.__remove(network_path)
+
+    def __network_changed(self, properties, path=None):
+        with self._lock:
+            if path in self._by_path:
+                self.__update(path, properties)
+
+    def __interface_removed(self, path):
+        if path == self._interface_path:
+            self.synced = False
+
+    def __service_lost(self, name, old_owner, new_owner):
+        self.synced = False
+
+    def find_path(self, ssid):
+        if self.synced:
+            network_path = self._by_ssid.get(ssid)
+            if network_path is not None:
+                self.hits += 1
+                return network_path
+
+        self.misses += 1
+        self.rebuild()
+        return self._by_ssid.get(ssid)
+
+    def get_ssid(self, network_path):
+        if not self.synced:
+            self.rebuild()
+        return self._by_path.get(network_path)
+
 
 if __name__ == '__main__':
     wifi = WpaSupplicantInterface('wlp6s0')
@@ -33,7 +33,14 @@
 # EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import count
+from .atomicwrite import get_writer
+from .filewatch import watch_file
+from .wpaconfig import WpaConfig
+from .networkstranslate import is_hex_psk, precompute_psk
+from .networkstranslate import convert_to_wificontrol_network
 
 
 class FileError(Exception):
@@ -54,7 +61,7 @@ class NetworkTemplate(object):
     def __str__(self):
         network_parameters = list()
         for key, value in self.network_parameters.items():
-            if key in self._strings:
+            if key in self._strings and not (key == 'psk' and is_hex_psk(value)):
                 network_parameters.append(self.string_template.format(key, value))
             else:
                 network_parameters.append(self.variant_template.format(key, value))
@@ -62,100 +69,273 @@ class NetworkTemplate(object):
         return self.network_template.format('\n'.join(network_parameters))
 
 
-def CfgFileUpdater(cfg_file_path="/etc/wpa_supplicant/wpa_supplicant.conf"):
+def CfgFileUpdater(cfg_file_path="/etc/wpa_supplicant/wpa_supplicant.conf",
+                   key_by_security=False, write_delay=0):
     try:
         with open(cfg_file_path, 'r') as cfg_file:
             pass
     except IOError:
         return NullFileUpdater()
     else:
-        return ConfigurationFileUpdater(cfg_file_path)
+        return ConfigurationFileUpdater(cfg_file_path, key_by_security,
+                                        write_delay)
 
 
 class NullFileUpdater(object):
     def __init__(self, config_file_path=None):
         self.head = None
         self.networks = list()
-        self.raw_file = None
+        self.document = None
 
-    def add_network(self, network):
+    def add_network(self, network, precompute=False):
         pass
 
     def remove_network(self, network):
         pass
 
+    def find_network(self, network_aim):
+        pass
+
+    def flush(self):
+        pass
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def add_networks(self, networks, precompute=False):
+        return list(networks)
+
+    def remove_networks(self, networks):
+        return list(networks)
+
 
 class ConfigurationFileUpdater(object):
 
-    def __init__(self, config_file_path="/etc/wpa_supplicant/wpa_supplicant.conf"):
+    def __init__(self, config_file_path="/etc/wpa_supplicant/wpa_supplicant.conf",
+                 key_by_security=False, write_delay=0):
 
         self.head = None
-        self.networks = list()
-        self.raw_file = None
+        self.document = None
+        self.key_by_security = key_by_security
+        self.write_delay = write_delay
         self.__config_file_path = config_file_path
+        self.__writer = get_writer(config_file_path)
+        self.__file = watch_file(config_file_path)
+        self.__reloads = None
+
+        self.__ids = count()
+        self.__networks = OrderedDict()
+        self.__index = {}
+        self.__layout = []
+        self.__blocks = {}
+        self.__batch_depth = 0
+        self.__dirty = False
 
         self.__initialise()
 
+    @property
+    def networks(self):
+        self.__refresh()
+        return list(self.__networks.values())
+
+    @networks.setter
+    def networks(self, networks):
+        self.__networks.clear()
+        self.__index.clear()
+        for network in networks:
+            self.__store(network)
+
     def __initialise(self):
         try:
-            with open(self.__config_file_path, 'r') as config_file:
-               self.raw_file = config_file.read() 
+            self.__file.get()
+            reloads = self.__file.reloads
+            self.document = self.__file.get(WpaConfig.parse)
         except IOError:
             raise FileError("No configuration file")
         else:
+            self.__reloads = reloads
             self.__parse_file()
 
-    def __parse_file(self):
-        self.head = self.__get_header()
-        self.networks = self.__get_network_list()
+    def __refresh(self):
+        if self.__batch_depth:
+            return
 
-    def __get_header(self):
         try:
-            return self.raw_file[0: self.raw_file.index('\nnetwork={')]
-        except ValueError:
-            return (self.raw_file.strip() + '\n')
+            self.__file.get()
+        except IOError:
+            return
 
-    def __get_network_list(self):
-        try:
-            raw_networks = self.raw_file[self.raw_file.index('\nnetwork={'):]
-        except ValueError:
-            return []
-        else:
-            return [self.__parse_network(network) for network in raw_networks.strip().split('\n\n')]
+        if self.__file.reloads != self.__reloads:
+            self.__networks.clear()
+            self.__index.clear()
+            self.__layout = []
+            self.__blocks = {}
+            self.__initialise()
 
-    def __parse_network(self, raw_network):
-        param_pair_list = raw_network[raw_network.find('\t'):raw_network.find('}')].strip().split('\n')
-        return {key.strip(): parameter.strip("\"") for key, parameter in (param_pair.split('=', 1) for param_pair in param_pair_list)}
+    def __parse_file(self):
+        self.head = self.document.header
+        for item in self.document.items:
+            if item.kind == 'network':
+                network_id = self.__store(OrderedDict(item.fields))
+                self.__blocks[network_id] = item
+            else:
+                self.__layout.append(item)
 
-    def __create_config_file(self):
-        return self.head + '\n' + '\n'.join([str(NetworkTemplate(network)) for network in self.networks])
+    def __render(self, network_id):
+        network = self.__networks[network_id]
+        block = self.__blocks.get(network_id)
+        if block is not None and block.fields == network:
+            return str(block)
 
-    def __findNetwork(self, network_aim):
-        for network in self.networks:
-            if network["ssid"].strip("\'\"") == network_aim["ssid"]:
-                return network
+        return str(NetworkTemplate(network))
+
+    def __create_config_file(self):
+        parts = []
+        layout = []
+        skip_blank = False
+        for entry in self.__layout:
+            if not isinstance(entry, int):
+                skipped = skip_blank and entry.kind == 'text' and entry.is_blank()
+                skip_blank = False
+                if skipped:
+                    continue
+                parts.append(str(entry))
+            elif entry not in self.__networks:
+                skip_blank = True
+                continue
+            else:
+                skip_blank = False
+                if entry not in self.__blocks and parts:
+                    parts.append(self.__separator(''.join(parts[-2:])))
+                parts.append(self.__render(entry))
+            layout.append(entry)
+
+        self.__layout = layout
+        return ''.join(parts)
+
+    @staticmethod
+    def __separator(previous):
+        if previous.endswith('\n\n'):
+            return ''
+        elif previous.endswith('\n'):
+            return '\n'
+        else:
+            return '\n\n'
+
+    def __keys(self, network):
+        ssid = network.get("ssid", "").strip("\'\"")
+        keys = [ssid]
+        if self.key_by_security and 'key_mgmt' in network:
+            security = convert_to_wificontrol_network(network, None)['security']
+            keys.append((ssid, security))
+        return keys
+
+    def __store(self, network):
+        network_id = next(self.__ids)
+        self.__networks[network_id] = network
+        self.__layout.append(network_id)
+        for key in self.__keys(network):
+            self.__index.setdefault(key, []).append(network_id)
+        return network_id
+
+    def __discard(self, network_id):
+        network = self.__networks.pop(network_id)
+        for key in self.__keys(network):
+            network_ids = self.__index[key]
+            network_ids.remove(network_id)
+            if not network_ids:
+                del self.__index[key]
+
+    def __find_id(self, network_aim):
+        keys = self.__keys(network_aim)
+        network_ids = self.__index.get(keys[-1])
+        if network_ids:
+            return network_ids[0]
+
+    def find_network(self, network_aim):
+        self.__refresh()
+        network_id = self.__find_id(network_aim)
+        if network_id is not None:
+            return self.__networks[network_id]
 
     def __update_config_file(self):
-        with open(self.__config_file_path, 'w') as config_file:
-            config_file.write(self.__create_config_file())
-            config_file.flush()
-            os.fsync(config_file)
-
-    def add_network(self, network):
-        if self.__findNetwork(network) is None:
-            self.networks.append(network)
+        if self.__batch_depth:
+            self.__dirty = True
+            return
+
+        self.__writer.write(self.__create_config_file(), self.write_delay)
+        self.__reloads = self.__file.reloads
+
+    def flush(self):
+        self.__writer.flush()
+
+    @contextmanager
+    def batch(self):
+        if self.__batch_depth:
+            yield self
+            return
+
+        self.__refresh()
+        snapshot = (OrderedDict(self.__networks),
+                    dict((key, list(ids)) for key, ids in self.__index.items()))
+        self.__batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self.__networks, self.__index = snapshot
+            self.__dirty = False
+            raise
+        finally:
+            self.__batch_depth -= 1
+
+        if self.__dirty:
+            self.__dirty = False
+            self.__update_config_file()
+
+    def add_network(self, network, precompute=False):
+        self.__refresh()
+        if self.__find_id(network) is None:
+            if precompute and 'psk' in network:
+                network = dict(network)
+                network['psk'] = precompute_psk(network['ssid'], network['psk'])
+            self.__store(network)
             self.__update_config_file()
+            return network
         else:
             raise AttributeError("Network already added")
 
     def remove_network(self, network):
-        try:
-            self.networks.remove(self.__findNetwork(network))
-        except ValueError:
+        self.__refresh()
+        network_id = self.__find_id(network)
+        if network_id is None:
             raise AttributeError("No such network")
         else:
+            self.__discard(network_id)
             self.__update_config_file()
 
+    def add_networks(self, networks, precompute=False):
+        added = []
+        with self.batch():
+            for network in networks:
+                try:
+                    added.append(self.add_network(network, precompute))
+                except AttributeError:
+                    pass
+        return added
+
+    def remove_networks(self, networks):
+        removed = []
+        with self.batch():
+            for network in networks:
+                try:
+                    self.remove_network(network)
+                except AttributeError:
+                    pass
+                else:
+                    removed.append(network)
+        return removed
+
 
 if __name__ == '__main__':
     config_updater = CfgFileUpdater('/etc/wpa_supplicant/wpa_supplicant.conf')
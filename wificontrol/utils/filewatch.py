@@ -0,0 +1,291 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from cStringIO import StringIO
+from threading import RLock, Thread
+from .atomicwrite import get_writer
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_DELETE)
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime)
+
+
+class Inotify(object):
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        try:
+            inotify_init1 = libc.inotify_init1
+            self.__add_watch = libc.inotify_add_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self.fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        descriptor = self.__add_watch(self.fd, path.encode('utf-8')
+                                      if isinstance(path, unicode) else path,
+                                      mask)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return descriptor
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return
+            raise
+
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            descriptor, mask, cookie, length = self.EVENT.unpack_from(data,
+                                                                      offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip('\0')
+            offset += length
+            yield descriptor, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchedFile(object):
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self.signature = None
+        self.reloads = 0
+        self.watched = False
+        self.__writer = get_writer(path)
+        self.__writer.listeners.append(self.refresh)
+        self.__lock = RLock()
+        self.__models = {}
+        self.__subscribers = []
+        self.__loaded = False
+
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def get(self, parser=None):
+        with self.__lock:
+            if not (self.watched and self.__loaded):
+                self.refresh()
+
+            if self.data is None:
+                raise IOError(errno.ENOENT, os.strerror(errno.ENOENT),
+                              self.path)
+            if parser is None:
+                return self.data
+            if parser not in self.__models:
+                self.__models[parser] = parser(StringIO(self.data))
+            return self.__models[parser]
+
+    def refresh(self):
+        with self.__lock:
+            pending = self.__writer.has_pending()
+            signature = None if pending else file_signature(self.path)
+            if self.__loaded and not pending and signature == self.signature:
+                return False
+
+            try:
+                data = self.__writer.read()
+            except IOError:
+                data = None
+
+            self.__loaded = True
+            self.signature = signature
+            if data == self.data:
+                return False
+
+            self.data = data
+            self.__models.clear()
+            self.reloads += 1
+
+        for callback in list(self.__subscribers):
+            callback(self)
+        return True
+
+
+class FileWatcher(object):
+    POLL_INTERVAL = 1
+
+    def __init__(self, use_inotify=True, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.__lock = RLock()
+        self.__files = {}
+        self.__directories = {}
+        self.__thread = None
+        self.__stop_read, self.__stop_write = os.pipe()
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                pass
+
+    def watch(self, path):
+        path = os.path.abspath(path)
+        with self.__lock:
+            if path in self.__files:
+                return self.__files[path]
+
+            watched = WatchedFile(path)
+            watched.watched = self.__add_watch(os.path.dirname(path))
+            self.__files[path] = watched
+
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run)
+                self.__thread.daemon = True
+                self.__thread.start()
+            return watched
+
+    def __add_watch(self, directory):
+        if self.inotify is None:
+            return False
+        if directory in self.__directories.values():
+            return True
+        try:
+            descriptor = self.inotify.add_watch(directory)
+        except OSError:
+            return False
+        self.__directories[descriptor] = directory
+        return True
+
+    def __refresh(self, files):
+        for watched in files:
+            try:
+                watched.refresh()
+            except Exception:
+                pass
+
+    def __process_events(self):
+        changed = set()
+        for descriptor, mask, name in self.inotify.read_events():
+            with self.__lock:
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self.__files.values())
+                    continue
+                if mask & IN_IGNORED:
+                    directory = self.__directories.pop(descriptor, None)
+                    for watched in self.__files.values():
+                        if os.path.dirname(watched.path) == directory:
+                            watched.watched = False
+                    continue
+
+                directory = self.__directories.get(descriptor)
+                if directory is not None:
+                    watched = self.__files.get(os.path.join(directory, name))
+                    if watched is not None:
+                        changed.add(watched)
+        self.__refresh(changed)
+
+    def __run(self):
+        descriptors = [self.__stop_read]
+        if self.inotify is not None:
+            descriptors.append(self.inotify.fd)
+
+        while True:
+            ready, _, _ = select.select(descriptors, [], [], self.poll_interval)
+            if self.__stop_read in ready:
+                break
+            if self.inotify is not None and self.inotify.fd in ready:
+                self.__process_events()
+
+            with self.__lock:
+                polled = [watched for watched in self.__files.values()
+                          if not watched.watched]
+            self.__refresh(polled)
+
+    def stop(self):
+        thread, self.__thread = self.__thread, None
+        if thread is not None:
+            os.write(self.__stop_write, b'x')
+            thread.join()
+        os.close(self.__stop_read)
+        os.close(self.__stop_write)
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+_file_watcher = None
+_file_watcher_lock = RLock()
+
+
+def get_file_watcher():
+    global _file_watcher
+    with _file_watcher_lock:
+        if _file_watcher is None:
+            _file_watcher = FileWatcher()
+        return _file_watcher
+
+
+def watch_file(path):
+    return get_file_watcher().watch(path)
@@ -0,0 +1,222 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import socket
+import tempfile
+from collections import OrderedDict, deque
+from itertools import count
+from threading import Lock
+
+
+class HostapdControlError(Exception):
+    pass
+
+
+def parse_fields(lines):
+    fields = OrderedDict()
+    for line in lines:
+        if '=' in line:
+            key, value = line.split('=', 1)
+            fields[key] = value
+    return fields
+
+
+def parse_station(reply):
+    lines = reply.strip().splitlines()
+    if not lines or lines[0] in ('FAIL', 'UNKNOWN COMMAND') or '=' in lines[0]:
+        return None
+
+    station = parse_fields(lines[1:])
+    station['address'] = lines[0].strip()
+    return station
+
+
+class HostapdControl(object):
+    TIMEOUT = 2
+    BUFFER_SIZE = 16384
+
+    _local_ids = count()
+
+    def __init__(self, socket_path="/var/run/hostapd/wlan0",
+                 local_directory=None, timeout=TIMEOUT):
+        self.socket_path = socket_path
+        self.local_directory = local_directory or tempfile.gettempdir()
+        self.timeout = timeout
+
+        self._socket = None
+        self._local_path = None
+        self._lock = Lock()
+        self._events = deque()
+        self.attached = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        if self._socket is not None:
+            return
+
+        local_path = os.path.join(self.local_directory,
+                                  "wificontrol_hostapd_{}-{}".format(
+                                      os.getpid(), next(self._local_ids)))
+        self.__remove(local_path)
+
+        control_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            control_socket.bind(local_path)
+            control_socket.connect(self.socket_path)
+        except socket.error as error:
+            control_socket.close()
+            self.__remove(local_path)
+            raise HostapdControlError(
+                "Can't connect to {}: {}".format(self.socket_path, error))
+
+        control_socket.settimeout(self.timeout)
+        self._socket = control_socket
+        self._local_path = local_path
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._local_path is not None:
+            self.__remove(self._local_path)
+            self._local_path = None
+        self.attached = False
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _receive(self):
+        return self._socket.recv(self.BUFFER_SIZE)
+
+    def request(self, command):
+        with self._lock:
+            self.open()
+            try:
+                self._socket.send(command)
+                while True:
+                    reply = self._receive()
+                    if not reply.startswith('<'):
+                        return reply
+                    if self.attached:
+                        self._events.append(reply)
+            except socket.timeout:
+                self.close()
+                raise HostapdControlError(
+                    "No reply from hostapd to {}".format(command.split()[0]))
+            except socket.error as error:
+                self.close()
+                raise HostapdControlError(
+                    "hostapd control error: {}".format(error))
+
+    def _expect_ok(self, command):
+        reply = self.request(command).strip()
+        if reply != 'OK':
+            raise HostapdControlError(
+                "{} failed: {}".format(command.split()[0], reply))
+
+    def attach(self):
+        self._expect_ok('ATTACH')
+        self.attached = True
+
+    def detach(self):
+        self._expect_ok('DETACH')
+        self.attached = False
+        self._events.clear()
+
+    def receive_event(self, timeout=None):
+        with self._lock:
+            if self._events:
+                message = self._events.popleft()
+            else:
+                self.open()
+                self._socket.settimeout(timeout)
+                try:
+                    message = self._receive()
+                except socket.timeout:
+                    return None
+                except socket.error as error:
+                    self.close()
+                    raise HostapdControlError(
+                        "hostapd control error: {}".format(error))
+                finally:
+                    if self._socket is not None:
+                        self._socket.settimeout(self.timeout)
+
+        if message.startswith('<') and '>' in message:
+            return message.split('>', 1)[1].strip()
+
+    def ping(self):
+        try:
+            return self.request('PING').strip() == 'PONG'
+        except HostapdControlError:
+            return False
+
+    def status(self):
+        return parse_fields(self.request('STATUS').splitlines())
+
+    def set(self, name, value):
+        self._expect_ok('SET {} {}'.format(name, value))
+
+    def reload(self):
+        self._expect_ok('RELOAD')
+
+    def enable(self):
+        self._expect_ok('ENABLE')
+
+    def disable(self):
+        self._expect_ok('DISABLE')
+
+    def sta(self, address):
+        return parse_station(self.request('STA {}'.format(address)))
+
+    def all_sta(self):
+        stations = OrderedDict()
+        station = parse_station(self.request('STA-FIRST'))
+        while station is not None and station['address'] not in stations:
+            stations[station['address']] = station
+            station = parse_station(
+                self.request('STA-NEXT {}'.format(station['address'])))
+        return stations
@@ -0,0 +1,106 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+class KeyValueConfig(object):
+    def __init__(self, lines=None):
+        self.lines = lines if lines is not None else []
+        self.__index = {}
+        self.__reindex()
+
+    @classmethod
+    def parse(cls, stream):
+        return cls(list(stream))
+
+    def __reindex(self):
+        self.__index = {}
+        depth = 0
+        for position, line in enumerate(self.lines):
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            if stripped.endswith('{'):
+                depth += 1
+            elif stripped == '}':
+                depth = max(depth - 1, 0)
+            elif not depth and '=' in line:
+                key = line.split('=', 1)[0].strip()
+                self.__index.setdefault(key, []).append(position)
+
+    def copy(self):
+        return KeyValueConfig(list(self.lines))
+
+    def __contains__(self, key):
+        return key in self.__index
+
+    def __str__(self):
+        return ''.join(self.lines)
+
+    def get(self, key, default=None):
+        positions = self.__index.get(key)
+        if not positions:
+            return default
+        return self.lines[positions[0]].split('=', 1)[1].rstrip('\r\n')
+
+    def set(self, key, value, after=None):
+        positions = self.__index.get(key)
+        if positions:
+            line = self.lines[positions[0]]
+            ending = line[len(line.rstrip('\r\n')):]
+            self.lines[positions[0]] = '{}={}{}'.format(key, value, ending)
+            return
+
+        line = '{}={}\n'.format(key, value)
+        anchor = self.__index.get(after)
+        if anchor:
+            if not self.lines[anchor[0]].endswith('\n'):
+                self.lines[anchor[0]] += '\n'
+            self.lines.insert(anchor[0] + 1, line)
+            self.__reindex()
+            return
+
+        if self.lines and not self.lines[-1].endswith('\n'):
+            self.lines[-1] += '\n'
+        self.__index[key] = [len(self.lines)]
+        self.lines.append(line)
+
+    def remove(self, key):
+        positions = self.__index.get(key)
+        if not positions:
+            return False
+
+        for position in reversed(positions):
+            del self.lines[position]
+        self.__reindex()
+        return True
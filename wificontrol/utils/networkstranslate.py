@@ -32,6 +32,45 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
 # EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import binascii
+import hashlib
+import re
+from collections import OrderedDict
+
+
+PSK_ITERATIONS = 4096
+PSK_LENGTH = 32
+PSK_CACHE_SIZE = 4
+
+_psk_cache = OrderedDict()
+
+
+def is_hex_psk(value):
+    return re.match("^[0-9a-fA-F]{64}$", value or '') is not None
+
+
+def derive_psk(ssid, passphrase):
+    if isinstance(ssid, type(u'')):
+        ssid = ssid.encode('utf-8')
+    if isinstance(passphrase, type(u'')):
+        passphrase = passphrase.encode('utf-8')
+
+    key = (ssid, passphrase)
+    psk = _psk_cache.pop(key, None)
+    if psk is None:
+        psk = binascii.hexlify(hashlib.pbkdf2_hmac(
+            'sha1', passphrase, ssid, PSK_ITERATIONS, PSK_LENGTH)).decode()
+    _psk_cache[key] = psk
+    while len(_psk_cache) > PSK_CACHE_SIZE:
+        _psk_cache.popitem(last=False)
+    return psk
+
+
+def precompute_psk(ssid, passphrase):
+    if is_hex_psk(passphrase) or not 8 <= len(passphrase) <= 63:
+        return passphrase
+    return derive_psk(ssid, passphrase)
+
 
 def create_security(proto, key_mgmt, group):
     if not proto:
@@ -55,8 +94,8 @@ def create_security(proto, key_mgmt, group):
             return None
 
 
-def convert_to_wpas_network(network):
-    return dict(WpasNetworkConverter(network))
+def convert_to_wpas_network(network, precompute=False):
+    return dict(WpasNetworkConverter(network, precompute))
 
 
 def convert_to_wificontrol_network(network, current_network):
@@ -72,12 +111,15 @@ def convert_to_wificontrol_network(network, current_network):
 
 
 class WpasNetworkConverter(object):
-    def __init__(self, network_dict):
+    def __init__(self, network_dict, precompute=False):
 
         self.security = network_dict.get('security')
         self.name = network_dict.get('ssid', '').encode('utf-8')
         self.password = network_dict.get('password', '').encode('utf-8')
         self.identity = network_dict.get('identity', '').encode('utf-8')
+        self.psk = self.password
+        if precompute:
+            self.psk = precompute_psk(self.name, self.password)
 
     def __iter__(self):
         if (self.security == 'open'):
@@ -94,7 +136,7 @@ class WpasNetworkConverter(object):
             yield "pairwise", "CCMP TKIP"
             yield "group", "CCMP TKIP"
             yield "eap", "TTLS PEAP TLS"
-            yield "psk", "{}".format(self.password)
+            yield "psk", "{}".format(self.psk)
         elif (self.security == 'wpa2psk'):
             yield "ssid", "{}".format(self.name)
             yield "proto", "RSN"
@@ -102,7 +144,7 @@ class WpasNetworkConverter(object):
             yield "pairwise", "CCMP TKIP"
             yield "group", "CCMP TKIP"
             yield "eap", "TTLS PEAP TLS"
-            yield "psk", "{}".format(self.password)
+            yield "psk", "{}".format(self.psk)
         elif (self.security == 'wpaeap'):
             yield "ssid", "{}".format(self.name)
             yield "key_mgmt", "WPA-EAP"
@@ -114,7 +156,7 @@ class WpasNetworkConverter(object):
             yield "phase1", "peaplable=0"
         else:
             yield "ssid", "{}".format(self.name)
-            yield "psk", "{}".format(self.password)
+            yield "psk", "{}".format(self.psk)
 
 
 class WifiControlNetworkConverter(object):
@@ -0,0 +1,103 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import json
+import time
+import binascii
+import dbus
+from .atomicwrite import atomic_write
+
+
+class PMKSACache(object):
+    BYTE_FIELDS = ('BSSID', 'PMKID', 'PMK')
+    INT64_FIELDS = ('expiration',)
+
+    LIFETIME = 43200
+
+    def __init__(self, cache_path="/var/lib/wificontrol/pmksa.json",
+                 lifetime=LIFETIME):
+        self.cache_path = cache_path
+        self.lifetime = lifetime
+
+    def encode(self, entry, now):
+        record = {}
+        for key, value in entry.items():
+            if key in self.BYTE_FIELDS:
+                record[key] = binascii.hexlify(bytearray(value)).decode()
+            else:
+                record[key] = int(value)
+        record.setdefault('expiration', int(now) + self.lifetime)
+        return record
+
+    def decode(self, record):
+        entry = {}
+        for key, value in record.items():
+            if key in self.BYTE_FIELDS:
+                entry[key] = dbus.ByteArray(binascii.unhexlify(value))
+            elif key in self.INT64_FIELDS:
+                entry[key] = dbus.Int64(value)
+            else:
+                entry[key] = dbus.UInt32(value)
+        return entry
+
+    def save(self, entries):
+        now = time.time()
+        records = [self.encode(entry, now) for entry in entries]
+        records = [record for record in records if record['expiration'] > now]
+
+        directory = os.path.dirname(self.cache_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        atomic_write(self.cache_path, json.dumps(records), 0o600)
+        return len(records)
+
+    def load(self):
+        try:
+            with open(self.cache_path, 'r') as cache_file:
+                records = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return []
+
+        now = time.time()
+        return [self.decode(record) for record in records
+                if record.get('expiration', 0) > now]
+
+    def clear(self):
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import dbus
+import dbus.mainloop.glib
+from threading import Thread, Lock, current_thread
+
+
+ITERATION_INTERVAL = 0.01
+
+_lock = Lock()
+_bus = None
+_loop = None
+_loop_thread = None
+
+
+def _import_gobject():
+    try:
+        from gi.repository import GObject
+    except ImportError:
+        import gobject as GObject
+    return GObject
+
+
+def get_system_bus():
+    global _bus
+
+    with _lock:
+        if _bus is None:
+            dbus.mainloop.glib.threads_init()
+            _bus = dbus.SystemBus(private=True,
+                                  mainloop=dbus.mainloop.glib.DBusGMainLoop())
+        return _bus
+
+
+def start_signal_loop():
+    global _loop, _loop_thread
+
+    with _lock:
+        if _loop_thread is None:
+            GObject = _import_gobject()
+            GObject.threads_init()
+            _loop = GObject.MainLoop()
+            _loop_thread = Thread(target=_loop.run, name="wificontrol-signals")
+            _loop_thread.daemon = True
+            _loop_thread.start()
+
+
+def attach_main_loop():
+    global _loop, _loop_thread
+
+    with _lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, current_thread()
+
+    if loop is not None:
+        _import_gobject().idle_add(loop.quit)
+        thread.join()
+
+
+def detach_main_loop():
+    global _loop_thread
+
+    with _lock:
+        if _loop is None:
+            _loop_thread = None
+
+
+def in_signal_loop():
+    return _loop_thread is not None and current_thread() is _loop_thread
+
+
+def iterate_signal_loop(timeout=ITERATION_INTERVAL):
+    GObject = _import_gobject()
+    try:
+        context = GObject.MainContext.default()
+    except AttributeError:
+        context = GObject.main_context_default()
+
+    if not context.iteration(False):
+        time.sleep(timeout)
+
+
+def wait_signal(event, timeout=None):
+    if not in_signal_loop():
+        return event.wait(timeout)
+
+    deadline = None if timeout is None else time.time() + timeout
+    while not event.is_set():
+        if deadline is None:
+            iterate_signal_loop()
+            continue
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        iterate_signal_loop(min(remaining, ITERATION_INTERVAL))
+    return event.is_set()
@@ -0,0 +1,256 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+import logging
+from collections import OrderedDict
+from threading import Event, RLock, Thread
+from .hostapdcontrol import HostapdControlError
+
+logger = logging.getLogger(__name__)
+
+
+class StationTable(object):
+    CONNECTED = 'AP-STA-CONNECTED'
+    DISCONNECTED = 'AP-STA-DISCONNECTED'
+
+    FIELDS = ('signal', 'rx_bytes', 'tx_bytes')
+
+    EVENT_TIMEOUT = 0.5
+    PING_INTERVAL = 5
+    RETRY_INTERVAL = 1
+
+    def __init__(self, control_factory):
+        self.control_factory = control_factory
+        self.__stations = OrderedDict()
+        self.__lock = RLock()
+        self.__control = None
+        self.__monitor = None
+        self.__thread = None
+        self.__stopped = Event()
+        self.__subscribers = []
+
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def __notify(self, event, station):
+        for callback in list(self.__subscribers):
+            try:
+                callback(event, station)
+            except Exception as error:
+                logger.error('Station subscriber {} error. {}'.format(
+                    callback.__name__, error))
+
+    def __station(self, address, connected_at=None):
+        station = {'mac': address, 'connected_at': connected_at}
+        for field in self.FIELDS:
+            station[field] = None
+        return station
+
+    def __export(self, station):
+        exported = dict((key, value) for key, value in station.items()
+                        if key != 'connected_at')
+        if station['connected_at'] is not None:
+            exported['connected_time'] = int(time.time() -
+                                             station['connected_at'])
+        else:
+            exported['connected_time'] = None
+        return exported
+
+    def __update(self, station, fields):
+        for field in self.FIELDS:
+            try:
+                station[field] = int(fields[field])
+            except (KeyError, ValueError):
+                pass
+        try:
+            station['connected_at'] = time.time() - int(fields['connected_time'])
+        except (KeyError, ValueError):
+            pass
+
+    def __get_control(self):
+        if self.__control is None:
+            self.__control = self.control_factory()
+        return self.__control
+
+    def get_stations(self, refresh=False):
+        if refresh:
+            self.refresh()
+        with self.__lock:
+            return [self.__export(station)
+                    for station in self.__stations.values()]
+
+    def get_station(self, address, refresh=False):
+        with self.__lock:
+            station = self.__stations.get(address)
+        if station is None:
+            return None
+
+        if refresh:
+            fields = self.__get_control().sta(address)
+            with self.__lock:
+                if fields is None:
+                    self.__stations.pop(address, None)
+                    return None
+                self.__update(station, fields)
+        with self.__lock:
+            return self.__export(station)
+
+    def refresh(self):
+        stations = self.__get_control().all_sta()
+        with self.__lock:
+            connected = [address for address in stations
+                         if address not in self.__stations]
+            disconnected = [self.__stations.pop(address)
+                            for address in list(self.__stations)
+                            if address not in stations]
+            for address, fields in stations.items():
+                station = self.__stations.setdefault(
+                    address, self.__station(address))
+                self.__update(station, fields)
+            connected = [self.__export(self.__stations[address])
+                         for address in connected]
+            disconnected = [self.__export(station) for station in disconnected]
+
+        for station in disconnected:
+            self.__notify(self.DISCONNECTED, station)
+        for station in connected:
+            self.__notify(self.CONNECTED, station)
+
+    def clear(self):
+        with self.__lock:
+            stations = [self.__export(station)
+                        for station in self.__stations.values()]
+            self.__stations.clear()
+        for station in stations:
+            self.__notify(self.DISCONNECTED, station)
+
+    def handle_event(self, event):
+        fields = event.split()
+        if len(fields) < 2 or fields[0] not in (self.CONNECTED,
+                                                self.DISCONNECTED):
+            return False
+
+        address = fields[1].lower()
+        with self.__lock:
+            if fields[0] == self.CONNECTED:
+                if address in self.__stations:
+                    return False
+                station = self.__station(address, time.time())
+                self.__stations[address] = station
+            else:
+                station = self.__stations.pop(address, None)
+                if station is None:
+                    return False
+            station = self.__export(station)
+
+        self.__notify(fields[0], station)
+        return True
+
+    def start(self):
+        if self.__thread is not None:
+            return
+        self.__stopped.clear()
+        self.__thread = Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        thread, self.__thread = self.__thread, None
+        self.__stopped.set()
+        if thread is not None:
+            thread.join()
+
+    def is_monitoring(self):
+        return self.__monitor is not None and self.__monitor.attached
+
+    def __attach(self):
+        monitor = self.control_factory()
+        try:
+            monitor.attach()
+            self.__control = None
+            self.refresh()
+        except HostapdControlError:
+            monitor.close()
+            raise
+        self.__monitor = monitor
+
+    def __detach(self, graceful=False):
+        monitor, self.__monitor = self.__monitor, None
+        if monitor is not None:
+            if graceful:
+                try:
+                    monitor.detach()
+                except HostapdControlError:
+                    pass
+            monitor.close()
+        if self.__control is not None:
+            self.__control.close()
+            self.__control = None
+
+    def __run(self):
+        last_activity = time.time()
+        while not self.__stopped.is_set():
+            if self.__monitor is None:
+                try:
+                    self.__attach()
+                except HostapdControlError:
+                    self.__stopped.wait(self.RETRY_INTERVAL)
+                    continue
+                last_activity = time.time()
+
+            try:
+                event = self.__monitor.receive_event(self.EVENT_TIMEOUT)
+            except HostapdControlError:
+                event = None
+                alive = False
+            else:
+                alive = True
+
+            if event is not None:
+                last_activity = time.time()
+                self.handle_event(event)
+            elif alive and time.time() - last_activity > self.PING_INTERVAL:
+                alive = self.__monitor.ping()
+                last_activity = time.time()
+
+            if not alive:
+                self.__detach()
+                self.clear()
+
+        self.__detach(graceful=True)
@@ -0,0 +1,141 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import dbus
+import time
+from threading import Lock, Condition
+from .signalloop import get_system_bus, start_signal_loop, in_signal_loop
+from .signalloop import iterate_signal_loop
+
+
+class UnitError(Exception):
+    pass
+
+
+class SystemdUnit(object):
+    _SYSTEMD_NAME = "org.freedesktop.systemd1"
+    _SYSTEMD_PATH = "/org/freedesktop/systemd1"
+    _MANAGER_NAME = "org.freedesktop.systemd1.Manager"
+
+    JOB_TIMEOUT = 10
+    PROBE_INTERVAL = 0.05
+
+    def __init__(self, unit, ready_probe=None):
+        self.unit = unit
+        self.ready_probe = ready_probe
+        self._bus = get_system_bus()
+        self._manager = None
+        self._job_lock = Lock()
+        self._condition = Condition()
+        self._jobs = {}
+
+    def __get_manager(self):
+        if self._manager is None:
+            try:
+                manager = dbus.Interface(
+                    self._bus.get_object(self._SYSTEMD_NAME,
+                                         self._SYSTEMD_PATH),
+                    self._MANAGER_NAME)
+            except dbus.exceptions.DBusException as error:
+                raise UnitError(error)
+            try:
+                manager.Subscribe()
+            except dbus.exceptions.DBusException:
+                pass
+            self._manager = manager
+        return self._manager
+
+    def __job_removed(self, job_id, job_path, unit, result):
+        if unit == self.unit:
+            with self._condition:
+                self._jobs[job_path] = result
+                self._condition.notify_all()
+
+    def __run_job(self, method, timeout):
+        deadline = time.time() + timeout
+
+        with self._job_lock:
+            start_signal_loop()
+            with self._condition:
+                self._jobs = {}
+            receiver = self._bus.add_signal_receiver(
+                self.__job_removed, dbus_interface=self._MANAGER_NAME,
+                signal_name="JobRemoved", path=self._SYSTEMD_PATH)
+            try:
+                try:
+                    job_path = getattr(self.__get_manager(), method)(
+                        self.unit, "replace")
+                except dbus.exceptions.DBusException as error:
+                    self._manager = None
+                    raise UnitError(error)
+
+                with self._condition:
+                    while job_path not in self._jobs:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise UnitError("{} {}: job timed out".format(
+                                method, self.unit))
+                        if in_signal_loop():
+                            iterate_signal_loop(
+                                min(remaining, self.PROBE_INTERVAL))
+                        else:
+                            self._condition.wait(remaining)
+                    result = self._jobs.pop(job_path)
+            finally:
+                receiver.remove()
+
+        if result != "done":
+            raise UnitError("{} {}: job {}".format(method, self.unit, result))
+        return deadline
+
+    def wait_ready(self, timeout=JOB_TIMEOUT):
+        deadline = time.time() + timeout
+        while not self.ready_probe():
+            if time.time() >= deadline:
+                raise UnitError("{} is not ready".format(self.unit))
+            time.sleep(self.PROBE_INTERVAL)
+
+    def start(self, timeout=JOB_TIMEOUT, wait_ready=True):
+        deadline = self.__run_job("StartUnit", timeout)
+        if wait_ready and self.ready_probe is not None:
+            self.wait_ready(max(deadline - time.time(), 0))
+
+    def stop(self, timeout=JOB_TIMEOUT):
+        self.__run_job("StopUnit", timeout)
+
+    def restart(self, timeout=JOB_TIMEOUT, wait_ready=True):
+        deadline = self.__run_job("RestartUnit", timeout)
+        if wait_ready and self.ready_probe is not None:
+            self.wait_ready(max(deadline - time.time(), 0))
@@ -0,0 +1,189 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from .atomicwrite import atomic_write, fsync_directory, get_writer
+from .atomicwrite import open_temporary, remove_file
+from .filewatch import watch_file
+
+
+class TransactionError(Exception):
+    pass
+
+
+class FileTransaction(object):
+    def __init__(self):
+        self.committed = False
+        self.record = {
+            'started': time.time(),
+            'files': [],
+            'steps': [],
+        }
+
+        self.__staged = OrderedDict()
+        self.__originals = {}
+        self.__actions = []
+        self.__completed = []
+        self.__closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        try:
+            if error_type is None:
+                try:
+                    if not self.committed:
+                        self.commit()
+                except Exception:
+                    self.__fail()
+                    raise
+                self.record['result'] = 'done'
+            else:
+                self.__fail()
+        finally:
+            self.record['duration'] = time.time() - self.record['started']
+            self.__closed = True
+
+    def __fail(self):
+        self.record['result'] = 'failed'
+        self.rollback()
+
+    def read(self, path):
+        if path in self.__staged:
+            return self.__staged[path]
+        return watch_file(path).get()
+
+    def stage(self, path, data):
+        if self.__closed or self.committed:
+            raise TransactionError("Transaction is already committed")
+
+        if path not in self.__originals:
+            try:
+                self.__originals[path] = watch_file(path).get()
+            except IOError:
+                self.__originals[path] = None
+            self.record['files'].append(path)
+        self.__staged[path] = data
+
+    def on_commit(self, action, undo=None):
+        self.__actions.append((action, undo))
+
+    @contextmanager
+    def step(self, name):
+        timing = {'name': name}
+        self.record['steps'].append(timing)
+
+        start = time.time()
+        try:
+            yield timing
+        except Exception as error:
+            timing['result'] = 'failed'
+            timing['error'] = str(error)
+            raise
+        else:
+            timing['result'] = 'done'
+        finally:
+            timing['duration'] = time.time() - start
+
+    def commit(self):
+        if self.committed:
+            raise TransactionError("Transaction is already committed")
+
+        temporaries = []
+        renamed = []
+        try:
+            with self.step('write'):
+                for path, data in self.__staged.items():
+                    get_writer(path).flush()
+                    temporary_file, temporary_path = open_temporary(path)
+                    temporaries.append((path, temporary_file, temporary_path))
+                    temporary_file.write(data)
+                    temporary_file.flush()
+
+            with self.step('sync'):
+                for _, temporary_file, _ in temporaries:
+                    os.fsync(temporary_file.fileno())
+                    temporary_file.close()
+
+            with self.step('rename'):
+                for path, _, temporary_path in temporaries:
+                    os.rename(temporary_path, path)
+                    renamed.append(path)
+                directories = set(os.path.dirname(os.path.abspath(path))
+                                  for path in renamed)
+                for directory in directories:
+                    fsync_directory(directory)
+        except Exception:
+            for path, temporary_file, temporary_path in temporaries:
+                temporary_file.close()
+                if path not in renamed:
+                    remove_file(temporary_path)
+            self.__restore(renamed)
+            raise
+        finally:
+            for path in renamed:
+                watch_file(path).refresh()
+
+        self.committed = True
+        with self.step('actions'):
+            for action, undo in self.__actions:
+                action()
+                self.__completed.append(undo)
+
+    def __restore(self, paths):
+        for path in paths:
+            original = self.__originals[path]
+            if original is None:
+                remove_file(path)
+            else:
+                atomic_write(path, original)
+            watch_file(path).refresh()
+
+    def rollback(self):
+        if not self.committed:
+            self.__staged.clear()
+            return
+
+        with self.step('rollback'):
+            self.__restore(self.__staged.keys())
+            self.committed = False
+            completed, self.__completed = self.__completed, []
+            for undo in reversed(completed):
+                if undo is not None:
+                    undo()
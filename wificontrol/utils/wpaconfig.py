@@ -0,0 +1,146 @@
+# Written by Ivan Sapozhkov and Denis Chagin <denis.chagin@emlid.com>
+#
+# Copyright (c) 2016, Emlid Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+# may be used to endorse or promote products derived from this software
+# without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import re
+from collections import OrderedDict
+
+BLOCK_START = re.compile(r'^\s*(network|cred)\s*=\s*\{\s*$')
+BLOCK_END = re.compile(r'^\s*\}\s*$')
+
+
+def parse_field(line):
+    line = line.strip()
+    if not line or line.startswith('#') or '=' not in line:
+        return None
+
+    key, value = line.split('=', 1)
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    return key.strip(), value
+
+
+class ConfigText(object):
+    kind = 'text'
+
+    def __init__(self, lines=None):
+        self.lines = lines if lines is not None else []
+
+    def __str__(self):
+        return ''.join(self.lines)
+
+    def is_blank(self):
+        return all(not line.strip() for line in self.lines)
+
+
+class ConfigBlock(object):
+    def __init__(self, kind, lines=None):
+        self.kind = kind
+        self.lines = lines if lines is not None else []
+        self.closed = False
+        self.__fields = None
+
+    def __str__(self):
+        return ''.join(self.lines)
+
+    @property
+    def fields(self):
+        if self.__fields is None:
+            self.__fields = OrderedDict()
+            for line in self.lines[1:]:
+                if BLOCK_END.match(line):
+                    break
+                field = parse_field(line)
+                if field is not None:
+                    self.__fields[field[0]] = field[1]
+        return self.__fields
+
+
+def tokenize(stream):
+    text = ConfigText()
+    block = None
+
+    for line in stream:
+        if block is not None:
+            block.lines.append(line)
+            if BLOCK_END.match(line):
+                block.closed = True
+                yield block
+                block = None
+            continue
+
+        match = BLOCK_START.match(line)
+        if match is None:
+            text.lines.append(line)
+            continue
+
+        if text.lines:
+            yield text
+            text = ConfigText()
+        block = ConfigBlock(match.group(1), [line])
+
+    if block is not None:
+        yield block
+    if text.lines:
+        yield text
+
+
+class WpaConfig(object):
+    def __init__(self, items=None):
+        self.items = items if items is not None else []
+
+    @classmethod
+    def parse(cls, stream):
+        return cls(list(tokenize(stream)))
+
+    @property
+    def header(self):
+        header = []
+        for item in self.items:
+            if item.kind != 'text':
+                break
+            header.append(str(item))
+        return ''.join(header)
+
+    def blocks(self, kind=None):
+        return [item for item in self.items
+                if item.kind != 'text' and kind in (None, item.kind)]
+
+    def write(self, stream):
+        for item in self.items:
+            stream.write(str(item))
+
+    def __str__(self):
+        return ''.join(str(item) for item in self.items)
@@ -33,12 +33,13 @@
 # EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-import os
-import re
 import subprocess
+from cStringIO import StringIO
+from contextlib import contextmanager
 
 from sysdmanager import SystemdManager
 from netifaces import ifaddresses, AF_INET, AF_LINK
+from utils import UnitError, KeyValueConfig, get_writer, flush_all, watch_file
 
 
 class WiFiControlError(Exception):
@@ -48,6 +49,7 @@ class WiFiControlError(Exception):
 class WiFi(object):
     restart_mdns = "systemctl restart mdns.service && sleep 2"
     rfkill_wifi_control = lambda self, action: "rfkill {} wifi".format(action)
+    write_delay = 0
 
     def __init__(self, interface):
         self.interface = interface
@@ -74,19 +76,43 @@ class WiFi(object):
         except KeyError:
             return "00:00:00:00:00:00"
 
-    def re_search(self, pattern, file):
-        with open(file, 'r', 0) as data_file:
-            data = data_file.read()
-        return re.search(pattern, data, re.MULTILINE).group(0)
-
-    def replace(self, pattern, text, file):
-        with open(file, 'r', 0) as data_file:
-            data = data_file.read()
-        old = re.search(pattern, data, re.MULTILINE).group(0)
-        with open(file, 'w', 0) as data_file:
-            data_file.write(data.replace(old, text))
-            data_file.flush()
-            os.fsync(data_file)
+    def read_file(self, file, transaction=None):
+        if transaction is not None:
+            return transaction.read(file)
+        return watch_file(file).get()
+
+    def write_file(self, file, data, transaction=None):
+        if transaction is not None:
+            transaction.stage(file, data)
+        else:
+            get_writer(file).write(data, self.write_delay)
+
+    def flush(self, file=None):
+        if file is None:
+            flush_all()
+        else:
+            get_writer(file).flush()
+
+    def read_config(self, file, transaction=None):
+        if transaction is not None:
+            return KeyValueConfig.parse(StringIO(transaction.read(file)))
+        return watch_file(file).get(KeyValueConfig.parse)
+
+    @contextmanager
+    def edit_config(self, file, transaction=None):
+        config = self.read_config(file, transaction).copy()
+        yield config
+        self.write_file(file, str(config), transaction)
+
+    def control_unit(self, unit, action, *args):
+        self.flush()
+        try:
+            getattr(unit, action)(*args)
+        except UnitError as error:
+            error_message = "WiFiControl: systemd job error\n"
+            error_message += "Unit: {}\n".format(unit.unit)
+            error_message += "Error: {}".format(error)
+            raise WiFiControlError(error_message)
 
     def execute_command(self, args):
         try:
@@ -36,51 +36,78 @@
 from hostapd import HostAP
 from wificommon import WiFi
 from wpasupplicant import WpaSupplicant
-from utils import PropertyError
+from transitions import TransitionEngine
+from utils import FileTransaction, PropertyError, watch_file
 
 
 class WiFiControl(object):
-    WPA_STATE = 'wpa_supplicant'
-    HOST_STATE = 'hostapd'
-    OFF_STATE = 'wifi_off'
+    WPA_STATE = TransitionEngine.CLIENT
+    HOST_STATE = TransitionEngine.HOST
+    OFF_STATE = TransitionEngine.OFF
 
     def __init__(self, interface='wlan0',
                  wpas_config="/etc/wpa_supplicant/wpa_supplicant.conf",
                  p2p_config="/etc/wpa_supplicant/p2p_supplicant.conf",
                  hostapd_config="/etc/hostapd/hostapd.conf",
-                 hostname_config='/etc/hostname'):
+                 hostname_config='/etc/hostname',
+                 mirror_properties=False, fast_switch=False,
+                 pmksa_cache=None, precompute_psk=False, write_delay=0):
 
         self.wifi = WiFi(interface)
-        self.wpasupplicant = WpaSupplicant(interface, wpas_config, p2p_config)
+        self.wpasupplicant = WpaSupplicant(interface, wpas_config, p2p_config,
+                                           mirror_properties, fast_switch,
+                                           pmksa_cache, precompute_psk)
         self.hotspot = HostAP(interface, hostapd_config, hostname_config)
+        for component in (self.wifi, self.wpasupplicant, self.hotspot,
+                          self.wpasupplicant.config_updater):
+            component.write_delay = write_delay
+        self.transitions = TransitionEngine(self.wifi, self.wpasupplicant,
+                                            self.hotspot)
+        self.device_names_record = None
 
     def start_host_mode(self):
         if not self.hotspot.started():
-            self.wpasupplicant.stop()
-            self.hotspot.start()
+            self.transitions.run(self.HOST_STATE)
         return True
 
     def start_client_mode(self):
         if not self.wpasupplicant.started():
-            self.hotspot.stop()
-            self.wpasupplicant.start()
+            self.transitions.run(self.WPA_STATE)
         return True
 
     def turn_on_wifi(self):
         if self.get_state() == self.OFF_STATE:
-            self.wifi.unblock()
-            self.wpasupplicant.start()
+            self.transitions.run(self.WPA_STATE)
 
     def turn_off_wifi(self):
-        self.hotspot.stop()
-        self.wpasupplicant.stop()
-        self.wifi.block()
+        self.transitions.run(self.OFF_STATE)
+
+    def get_transition_timings(self, count=None):
+        return self.transitions.get_timings(count)
+
+    def set_transition_timeout(self, stage, timeout):
+        self.transitions.set_stage_timeout(stage, timeout)
+
+    def flush(self):
+        self.wifi.flush()
+
+    def subscribe_config_changes(self, callback):
+        paths = (self.wpasupplicant.wpa_supplicant_path,
+                 self.wpasupplicant.p2p_supplicant_path,
+                 self.hotspot.hostapd_path, self.hotspot.hostname_path)
+        for path in paths:
+            watched = watch_file(path)
+            try:
+                watched.get()
+            except IOError:
+                pass
+            watched.subscribe(lambda watched_file: callback(watched_file.path))
 
     def get_wifi_turned_on(self):
         return (self.wpasupplicant.started() or self.hotspot.started())
 
-    def set_hostap_password(self, password):
-        return self.hotspot.set_hostap_password(password)
+    def set_hostap_password(self, password, precompute_psk=False, live=False):
+        return self.hotspot.set_hostap_password(password, precompute_psk, live)
 
     def get_device_name(self):
         return self.hotspot.get_host_name()
@@ -88,22 +115,37 @@ class WiFiControl(object):
     def get_hostap_name(self):
         return self.hotspot.get_hostap_name()
 
-    def set_device_names(self, name):
-        self.wpasupplicant.set_p2p_name(name)
-        self.hotspot.set_hostap_name(name)
-        self.hotspot.set_host_name(name)
-        self.wifi.restart_dns()
-        return self.verify_device_names(name)
+    def get_stations(self, refresh=False):
+        return self.hotspot.get_stations(refresh)
+
+    def set_device_names(self, name, live=False):
+        transaction = FileTransaction()
+        self.device_names_record = transaction.record
+
+        with transaction:
+            with transaction.step('stage'):
+                self.wpasupplicant.set_p2p_name(name, transaction)
+                self.hotspot.set_hostap_name(name, transaction, live)
+                self.hotspot.set_host_name(name, transaction)
+            transaction.commit()
+            with transaction.step('restart_dns'):
+                self.wifi.restart_dns()
+            with transaction.step('verify'):
+                return self.verify_device_names(name, transaction)
+
+    def get_device_names_timings(self):
+        return self.device_names_record
 
-    def verify_hostap_name(self, name):
+    def verify_hostap_name(self, name, transaction=None):
         mac_addr = self.hotspot.get_device_mac()[-6:]
-        return "{}{}".format(name, mac_addr) == self.hotspot.get_hostap_name()
+        return "{}{}".format(name, mac_addr) == \
+            self.hotspot.get_hostap_name(transaction)
 
-    def verify_device_names(self, name):
+    def verify_device_names(self, name, transaction=None):
         verified = False
-        if name == self.hotspot.get_host_name():
-            if name == self.wpasupplicant.get_p2p_name():
-                if self.verify_hostap_name(name):
+        if name == self.hotspot.get_host_name(transaction):
+            if name == self.wpasupplicant.get_p2p_name(transaction):
+                if self.verify_hostap_name(name, transaction):
                     verified = True
         return verified
 
@@ -125,11 +167,30 @@ class WiFiControl(object):
     def get_ip(self):
         return self.wifi.get_device_ip()
 
-    def scan(self):
-        self.wpasupplicant.scan()
+    def scan(self, timeout=WpaSupplicant.SCAN_TIMEOUT, scan_type=None,
+             ssids=None, channels=None, allow_roam=None, max_age=None):
+        return self.wpasupplicant.scan(timeout, scan_type, ssids, channels,
+                                       allow_roam, max_age)
 
-    def get_scan_results(self):
-        return self.wpasupplicant.get_scan_results()
+    def start_scanning(self, callback=None, args=None,
+                       timeout=WpaSupplicant.SCAN_TIMEOUT, scan_type=None,
+                       ssids=None, channels=None, allow_roam=None,
+                       max_age=None):
+        return self.wpasupplicant.start_scanning(callback, args, timeout,
+                                                 scan_type, ssids, channels,
+                                                 allow_roam, max_age)
+
+    def get_scan_results(self, max_age=None):
+        return self.wpasupplicant.get_scan_results(max_age)
+
+    def invalidate_scan_results(self):
+        self.wpasupplicant.invalidate_scan_results()
+
+    def get_network_scan_results(self, ssid):
+        return self.wpasupplicant.get_network_scan_results(ssid)
+
+    def is_network_visible(self, ssid):
+        return self.wpasupplicant.is_network_visible(ssid)
 
     def add_network(self, network_parameters):
         self.wpasupplicant.add_network(network_parameters)
@@ -137,6 +198,15 @@ class WiFiControl(object):
     def remove_network(self, network):
         self.wpasupplicant.remove_network(network)
 
+    def add_networks(self, networks_parameters):
+        return self.wpasupplicant.add_networks(networks_parameters)
+
+    def remove_networks(self, networks):
+        return self.wpasupplicant.remove_networks(networks)
+
+    def batch(self):
+        return self.wpasupplicant.batch()
+
     def start_connecting(self, network, callback=None, args=None, timeout=10):
         if callback is None:
             callback = self.revert_on_connect_failure
@@ -38,6 +38,8 @@ import dbus.service
 import dbus.mainloop.glib
 import logging
 from . import WiFiControl
+from .utils import attach_main_loop, detach_main_loop, StationTable
+from .utils import ServiceError, InterfaceError
 
 try:
     from gi.repository import GObject
@@ -48,6 +50,7 @@ logger = logging.getLogger(__name__)
 
 DBUS_PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
 
+WPAS_DBUS_IFACE = "fi.w1.wpa_supplicant1"
 WPAS_INTERFACE_DBUS_OPATH = "/fi/w1/wpa_supplicant1/Interfaces/1"
 WPAS_INTERFACE_DBUS_IFACE = "fi.w1.wpa_supplicant1.Interface"
 
@@ -70,6 +73,9 @@ class WiFiMonitor(object):
     SUCCESS_EVENT = 'SUCCESS'
     REVERT_EVENT = 'REVERT'
 
+    STA_CONNECTED_EVENT = 'STA_CONNECTED'
+    STA_DISCONNECTED_EVENT = 'STA_DISCONNECTED'
+
     STATES = {
         'completed': CLIENT_STATE,
         'scanning': SCAN_STATE,
@@ -84,6 +90,11 @@ class WiFiMonitor(object):
         ('failed', 'failed'): OFF_STATE,
     }
 
+    STATION_EVENTS = {
+        StationTable.CONNECTED: STA_CONNECTED_EVENT,
+        StationTable.DISCONNECTED: STA_DISCONNECTED_EVENT,
+    }
+
     def __init__(self):
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
         self.bus = dbus.SystemBus()
@@ -95,6 +106,7 @@ class WiFiMonitor(object):
 
         self.current_state = self.OFF_STATE
         self.current_ssid = None
+        self.wpas_interface_path = WPAS_INTERFACE_DBUS_OPATH
 
     def _initialize(self):
         systemd_obj = self.bus.get_object(SYSTEMD_DBUS_SERVICE,
@@ -106,7 +118,11 @@ class WiFiMonitor(object):
         self.bus.add_signal_receiver(self._wpa_props_changed,
                                      dbus_interface=WPAS_INTERFACE_DBUS_IFACE,
                                      signal_name="PropertiesChanged",
-                                     path=WPAS_INTERFACE_DBUS_OPATH)
+                                     path_keyword='path')
+
+        self.bus.add_signal_receiver(self._wpa_interface_added,
+                                     dbus_interface=WPAS_DBUS_IFACE,
+                                     signal_name="InterfaceAdded")
 
         self.bus.add_signal_receiver(self._host_props_changed,
                                      dbus_interface=DBUS_PROPERTIES_IFACE,
@@ -120,11 +136,27 @@ class WiFiMonitor(object):
         self.register_callback(self.CLIENT_STATE, self._check_current_ssid)
         self.register_callback(self.HOST_STATE, self._clear_ssid)
 
+        stations = self.wifi_manager.hotspot.get_station_table()
+        stations.subscribe(self._station_event)
+
+        self.register_callback(self.HOST_STATE, self._start_station_monitor)
+        self.register_callback(self.CLIENT_STATE, self._stop_station_monitor)
+        self.register_callback(self.OFF_STATE, self._stop_station_monitor)
+
     def _set_initial_state(self):
+        self._find_interface_path()
         state = self.wifi_manager.get_state()
         logger.debug('Initiate WiFiMonitor with "{}" state'.format(state))
         self._process_new_state(state)
 
+    def _find_interface_path(self):
+        wpa_interface = self.wifi_manager.wpasupplicant.wpa_supplicant_interface
+        try:
+            self.wpas_interface_path = wpa_interface.get_interface(
+                self.wifi_manager.wifi.interface)
+        except (ServiceError, InterfaceError):
+            self.wpas_interface_path = WPAS_INTERFACE_DBUS_OPATH
+
     def _host_props_changed(self, *args):
         _, props, _ = args
         active_state = props.get('ActiveState')
@@ -133,7 +165,14 @@ class WiFiMonitor(object):
         if active_state and sub_state:
             self._process_new_state((active_state, sub_state))
 
-    def _wpa_props_changed(self, props):
+    def _wpa_interface_added(self, path, props):
+        if props.get('Ifname') == self.wifi_manager.wifi.interface:
+            self.wpas_interface_path = path
+
+    def _wpa_props_changed(self, props, path=None):
+        if path is not None and path != self.wpas_interface_path:
+            return
+
         state = props.get('State')
         disconnect = props.get('DisconnectReason', None)
 
@@ -177,19 +216,30 @@ class WiFiMonitor(object):
     def _clear_ssid(self):
         self.current_ssid = None
 
+    def _start_station_monitor(self):
+        self.wifi_manager.hotspot.start_station_monitor()
+
+    def _stop_station_monitor(self):
+        self.wifi_manager.hotspot.stop_station_monitor()
+
+    def _station_event(self, event, station):
+        msg = self.STATION_EVENTS.get(event)
+        if msg is not None:
+            GObject.idle_add(self._execute_callbacks, msg, station)
+
     def register_callback(self, msg, callback, args=()):
         if msg not in self.callbacks:
             self.callbacks[msg] = []
 
         self.callbacks[msg].append((callback, args))
 
-    def _execute_callbacks(self, msg):
+    def _execute_callbacks(self, msg, *extra):
         callbacks = self.callbacks.get(msg)
         if callbacks:
             for callback in callbacks:
                 callback, args = callback
                 try:
-                    callback(*args)
+                    callback(*(args + extra))
                 except Exception as error:
                     logger.error('Callback {} execution error. {}'.format(callback.__name__, error))
 
@@ -200,9 +250,14 @@ class WiFiMonitor(object):
             logger.error(error)
             raise WiFiMonitorError(error)
 
-        self._mainloop.run()
+        attach_main_loop()
+        try:
+            self._mainloop.run()
+        finally:
+            detach_main_loop()
 
     def shutdown(self):
+        self._stop_station_monitor()
         self._deinitialize()
         self._mainloop.quit()
         logger.info('WiFiMonitor stopped')
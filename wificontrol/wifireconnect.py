@@ -55,7 +55,7 @@ class ReconnectWorker(object):
 
         while not self.interrupt.is_set():
             try:
-                self.manager.scan()
+                self.manager.scan(ssids=[ssid])
                 scan_results = self.manager.get_scan_results()
 
                 scanned_ssids = [net['ssid'] for net in scan_results]
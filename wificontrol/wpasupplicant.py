@@ -36,57 +36,262 @@
 from wificommon import WiFi
 from utils import CfgFileUpdater
 from utils import WpaSupplicantInterface, WpaSupplicantNetwork, WpaSupplicantBSS
+from utils import BSSTable, NetworkIndex
+from utils import SystemdUnit, PMKSACache, wait_signal
 from utils import convert_to_wpas_network, convert_to_wificontrol_network, \
     create_security
 from utils import FileError
 from utils import ServiceError, InterfaceError, PropertyError
-from threading import Thread, Event, Timer
+from threading import Thread, Event, Timer, Lock
+from contextlib import contextmanager
+from collections import OrderedDict
 import time
 import sys
 
 
+class ScanRequest(object):
+    def __init__(self, interface, callback, timeout, scan_args=None):
+        self.interface = interface
+        self.callback = callback
+        self.scan_args = scan_args or {}
+        self.timer = Timer(timeout, self.timed_out)
+        self.timer.daemon = True
+        self.receivers = []
+        self.lock = Lock()
+        self.finished = False
+
+    def start(self):
+        self.receivers.append(self.interface.add_signal_receiver(
+            "ScanDone", self.scan_done))
+        self.receivers.append(self.interface.add_signal_receiver(
+            "PropertiesChanged", self.properties_changed))
+        try:
+            self.interface.scan(**self.scan_args)
+        except ServiceError:
+            self.teardown()
+            raise
+        else:
+            self.timer.start()
+
+    def scan_done(self, success):
+        self.finish(bool(success))
+
+    def properties_changed(self, properties):
+        if 'Scanning' in properties and not properties['Scanning']:
+            self.finish(True)
+
+    def timed_out(self):
+        try:
+            scanning = self.interface.get_scanning()
+        except PropertyError:
+            scanning = True
+        self.finish(not scanning)
+
+    def finish(self, result):
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+        self.teardown()
+        self.callback(result)
+
+    def teardown(self):
+        self.timer.cancel()
+        for receiver in self.receivers:
+            receiver.remove()
+        self.receivers = []
+
+
+class ConnectionMonitor(object):
+    HANDSHAKE_STATES = ("4way_handshake", "group_handshake")
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.state = None
+        self.failed = False
+        self.changed = Event()
+        self.receiver = None
+
+    def start(self):
+        self.receiver = self.interface.add_signal_receiver(
+            "PropertiesChanged", self.properties_changed)
+
+    def stop(self):
+        if self.receiver is not None:
+            self.receiver.remove()
+            self.receiver = None
+
+    def properties_changed(self, properties):
+        if properties.get('DisconnectReason') and \
+                self.state in self.HANDSHAKE_STATES:
+            self.failed = True
+        if 'State' in properties:
+            self.state = str(properties['State'])
+        self.changed.set()
+
+    def update_state(self):
+        self.state = str(self.interface.get_state())
+
+    def wait(self, timeout):
+        changed = wait_signal(self.changed, timeout)
+        self.changed.clear()
+        return changed
+
+    def wake(self):
+        self.changed.set()
+
+
+class ScanCache(object):
+    def __init__(self):
+        self.last_scan = None
+        self.hits = 0
+        self.misses = 0
+
+    def scan_finished(self):
+        self.last_scan = time.time()
+
+    def invalidate(self):
+        self.last_scan = None
+
+    def is_fresh(self, max_age):
+        last_scan = self.last_scan
+        if last_scan is not None and time.time() - last_scan <= max_age:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def get_statistics(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'last scan': self.last_scan}
+
+
 class WpaSupplicant(WiFi):
-    wpas_control = lambda self, action: "systemctl {} wpa_supplicant.service && sleep 2".format(
-        action)
+    SCAN_TIMEOUT = 10
+    CONNECTION_POLL_INTERVAL = 2
 
     def __init__(self, interface,
                  wpas_config="/etc/wpa_supplicant/wpa_supplicant.conf",
-                 p2p_config="/etc/wpa_supplicant/p2p_supplicant.conf"):
+                 p2p_config="/etc/wpa_supplicant/p2p_supplicant.conf",
+                 mirror_properties=False, fast_switch=False,
+                 pmksa_cache=None, precompute_psk=False):
 
         super(WpaSupplicant, self).__init__(interface)
         self.wpa_supplicant_path = wpas_config
         self.p2p_supplicant_path = p2p_config
+        self.fast_switch = fast_switch
+        self.precompute_psk = precompute_psk
 
         if (b'bin/wpa_supplicant' not in self.execute_command(
                 "whereis wpa_supplicant")):
             raise OSError('No WPA_SUPPLICANT service')
 
-        self.wpa_supplicant_interface = WpaSupplicantInterface(self.interface)
+        self.wpa_supplicant_interface = WpaSupplicantInterface(
+            self.interface, mirror=mirror_properties)
         self.wpa_bss_manager = WpaSupplicantBSS()
+        self.wpa_bss_table = BSSTable(self.wpa_supplicant_interface)
+        self.wpa_network_index = NetworkIndex(self.wpa_supplicant_interface)
         self.wpa_network_manager = WpaSupplicantNetwork()
         self.config_updater = CfgFileUpdater(self.wpa_supplicant_path)
+        self.scan_cache = ScanCache()
+        self.wpas_unit = SystemdUnit(
+            "wpa_supplicant.service",
+            ready_probe=self.wpa_supplicant_interface.is_ready)
+        self.pmksa_cache = None
+        if pmksa_cache is not None:
+            self.pmksa_cache = PMKSACache(pmksa_cache)
 
         self.connection_thread = None
         self.connection_event = Event()
+        self.connection_monitor = None
 
         self.connection_timer = None
         self.break_event = Event()
 
+        self.pending_changes = None
+
+    def service_active(self):
+        return self.sysdmanager.is_active("wpa_supplicant.service")
+
     def started(self):
-        wpa_supplicant_started = self.sysdmanager.is_active(
-            "wpa_supplicant.service")
+        wpa_supplicant_started = self.service_active()
 
         if wpa_supplicant_started:
-            self.wpa_supplicant_interface.initialize()
+            try:
+                self.wpa_supplicant_interface.initialize()
+            except InterfaceError:
+                if not self.fast_switch:
+                    raise
+                wpa_supplicant_started = False
 
         return wpa_supplicant_started
 
-    def start(self):
-        self.execute_command(self.wpas_control("start"))
-        self.wpa_supplicant_interface.initialize()
+    def start(self, timeout=SystemdUnit.JOB_TIMEOUT, wait_ready=True):
+        self.wpa_supplicant_interface.invalidate()
+        if self.fast_switch and self.service_active():
+            self.attach_interface(timeout, wait_ready)
+        else:
+            self.control_unit(self.wpas_unit, "start", timeout, wait_ready)
+        self.scan_cache.invalidate()
+        if wait_ready:
+            self.restore_pmksa()
 
-    def stop(self):
-        self.execute_command(self.wpas_control("stop"))
+    def wait_ready(self, timeout=SystemdUnit.JOB_TIMEOUT):
+        self.control_unit(self.wpas_unit, "wait_ready", timeout)
+        self.restore_pmksa()
+
+    def stop(self, timeout=SystemdUnit.JOB_TIMEOUT, keep_service=None):
+        if keep_service is None:
+            keep_service = self.fast_switch
+
+        self.save_pmksa()
+
+        if keep_service and self.service_active():
+            self.detach_interface(timeout)
+        else:
+            self.control_unit(self.wpas_unit, "stop", timeout)
+        self.wpa_supplicant_interface.invalidate()
+        self.scan_cache.invalidate()
+
+    def save_pmksa(self):
+        if self.pmksa_cache is None:
+            return
+        try:
+            self.wpa_supplicant_interface.initialize()
+            entries = self.wpa_supplicant_interface.get_pmksa()
+        except (ServiceError, InterfaceError):
+            return
+        try:
+            self.pmksa_cache.save(entries)
+        except (IOError, OSError):
+            pass
+
+    def restore_pmksa(self):
+        if self.pmksa_cache is None:
+            return 0
+        restored = 0
+        for entry in self.pmksa_cache.load():
+            try:
+                self.wpa_supplicant_interface.add_pmksa(entry)
+            except (ServiceError, InterfaceError):
+                continue
+            restored += 1
+        return restored
+
+    def attach_interface(self, timeout=SystemdUnit.JOB_TIMEOUT,
+                         wait_ready=True):
+        self.flush(self.wpa_supplicant_path)
+        try:
+            self.wpa_supplicant_interface.attach(
+                config_file=self.wpa_supplicant_path)
+        except (ServiceError, InterfaceError):
+            self.control_unit(self.wpas_unit, "restart", timeout, wait_ready)
+
+    def detach_interface(self, timeout=SystemdUnit.JOB_TIMEOUT):
+        try:
+            self.wpa_supplicant_interface.detach()
+        except (ServiceError, InterfaceError):
+            self.control_unit(self.wpas_unit, "stop", timeout)
 
     def get_status(self):
         network_params = None
@@ -97,18 +302,85 @@ class WpaSupplicant(WiFi):
             network_params['IP address'] = self.get_device_ip()
         return network_params
 
-    def scan(self):
+    def scan(self, timeout=SCAN_TIMEOUT, scan_type=None, ssids=None,
+             channels=None, allow_roam=None, max_age=None):
+        scan_finished = Event()
+        scan_result = []
+
+        def scan_callback(result):
+            scan_result.append(result)
+            scan_finished.set()
+
+        if self.start_scanning(scan_callback, timeout=timeout,
+                               scan_type=scan_type, ssids=ssids,
+                               channels=channels, allow_roam=allow_roam,
+                               max_age=max_age):
+            wait_signal(scan_finished)
+            return scan_result[0]
+        return False
+
+    def start_scanning(self, callback=None, args=None, timeout=SCAN_TIMEOUT,
+                       scan_type=None, ssids=None, channels=None,
+                       allow_roam=None, max_age=None):
+        if not self.started():
+            return False
+
+        if max_age is not None and self.scan_cache.is_fresh(max_age):
+            self.callback_response(True, callback, args)
+            return True
+
+        full_scan = not (ssids or channels)
+
+        def scan_callback(result):
+            if result and full_scan:
+                self.scan_cache.scan_finished()
+            self.callback_response(result, callback, args)
+
+        scan_request = ScanRequest(
+            self.wpa_supplicant_interface, scan_callback, timeout,
+            {'scan_type': scan_type, 'ssids': ssids, 'channels': channels,
+             'allow_roam': allow_roam})
+        scan_request.start()
+        return True
+
+    def get_scan_results(self, max_age=None):
+        if max_age is not None:
+            self.scan(max_age=max_age)
+
         if self.started():
-            self.wpa_supplicant_interface.scan()
-            self.wait_scanning()
+            self.wpa_bss_table.start()
+            return [self.get_bss_record_info(record) for record in
+                    self.wpa_bss_table.get_records()
+                    if self.is_record_fresh(record, max_age)]
+        else:
+            return []
+
+    def is_record_fresh(self, record, max_age):
+        if max_age is None:
+            return True
+        age = record.get_age()
+        return age is None or age <= max_age
+
+    def invalidate_scan_results(self):
+        self.scan_cache.invalidate()
 
-    def get_scan_results(self):
+    def get_scan_cache_statistics(self):
+        return self.scan_cache.get_statistics()
+
+    def get_network_scan_results(self, ssid):
         if self.started():
-            return [self.get_bss_network_info(bss) for bss in
-                    self.wpa_supplicant_interface.get_BSSs()]
+            self.wpa_bss_table.start()
+            return [self.get_bss_record_info(record) for record in
+                    self.wpa_bss_table.find_ssid(ssid)]
         else:
             return []
 
+    def is_network_visible(self, ssid):
+        if self.started():
+            self.wpa_bss_table.start()
+            return self.wpa_bss_table.is_visible(ssid)
+        return False
+
     def get_added_networks(self):
         current_network = None
         if self.started():
@@ -117,24 +389,83 @@ class WpaSupplicant(WiFi):
                 network in self.config_updater.networks]
 
     def add_network(self, network_parameters):
-        network = convert_to_wpas_network(network_parameters)
+        network = convert_to_wpas_network(network_parameters,
+                                          self.precompute_psk)
         try:
             self.config_updater.add_network(network)
         except AttributeError:
-            pass
-        else:
-            if self.started():
-                self.wpa_supplicant_interface.add_network(network)
+            return False
+
+        if self.pending_changes is not None:
+            self.pending_changes.append(("add", network))
+        elif self.started():
+            self.wpa_supplicant_interface.add_network(network)
+        return True
 
     def remove_network(self, network):
         try:
             self.config_updater.remove_network(network)
         except AttributeError:
-            pass
-        else:
-            if self.started():
-                self.wpa_supplicant_interface.remove_network(
-                    self.find_network_path(network))
+            return False
+
+        if self.pending_changes is not None:
+            self.pending_changes.append(("remove", network))
+        elif self.started():
+            self.wpa_supplicant_interface.remove_network(
+                self.find_network_path(network))
+        return True
+
+    def add_networks(self, networks_parameters):
+        with self.batch():
+            return [network_parameters
+                    for network_parameters in networks_parameters
+                    if self.add_network(network_parameters)]
+
+    def remove_networks(self, networks):
+        with self.batch():
+            return [network for network in networks
+                    if self.remove_network(network)]
+
+    @contextmanager
+    def batch(self):
+        if self.pending_changes is not None:
+            yield self
+            return
+
+        self.pending_changes = []
+        try:
+            with self.config_updater.batch():
+                yield self
+            changes = self.pending_changes
+        finally:
+            self.pending_changes = None
+
+        if changes and self.started():
+            self.push_changes(changes)
+
+    def push_changes(self, changes):
+        added = OrderedDict()
+        removed = []
+        for action, network in changes:
+            ssid = network['ssid']
+            if action == "add":
+                added[ssid] = network
+            elif ssid in added:
+                del added[ssid]
+            else:
+                removed.append(network)
+
+        network_paths = [self.find_network_path(network)
+                         for network in removed]
+        results = self.wpa_supplicant_interface.remove_networks(
+            [network_path for network_path in network_paths
+             if network_path is not None])
+        results += self.wpa_supplicant_interface.add_networks(
+            list(added.values()))
+
+        for result in results:
+            if isinstance(result, ServiceError):
+                raise result
 
     def start_connecting(self, network, callback=None,
                          args=None, timeout=10):
@@ -156,27 +487,42 @@ class WpaSupplicant(WiFi):
                 callback(result)
 
     def stop_connecting(self):
+        connection_thread = self.connection_thread
         self.connection_event.clear()
-        self.connection_thread.join()
+        if self.connection_monitor is not None:
+            self.connection_monitor.wake()
+        connection_thread.join()
 
     def disconnect(self):
         self.wpa_supplicant_interface.disconnect()
 
     # Scan functions
-    def wait_scanning(self):
-        while self.wpa_supplicant_interface.get_scanning():
-            pass
-
     def get_bss_network_info(self, bss):
+        return self.get_bss_info(self.wpa_bss_manager.get_all(bss))
+
+    def get_bss_info(self, bss_properties):
         return {
-            "ssid": self.wpa_bss_manager.get_SSID(bss),
-            "mac address": self.wpa_bss_manager.get_BSSID(bss),
-            "security": self.get_security(bss)
+            "ssid": self.wpa_bss_manager.decode_SSID(bss_properties['SSID']),
+            "mac address": self.wpa_bss_manager.decode_BSSID(
+                bss_properties['BSSID']),
+            "security": self.get_bss_security(bss_properties)
+        }
+
+    def get_bss_record_info(self, record):
+        return {
+            "ssid": record.ssid,
+            "mac address": record.bssid,
+            "security": self.create_bss_security(record.wpa, record.rsn)
         }
 
     def get_security(self, bss_path):
-        wpa_array = self.wpa_bss_manager.get_WPA(bss_path)
-        rsn_array = self.wpa_bss_manager.get_RSN(bss_path)
+        return self.get_bss_security(self.wpa_bss_manager.get_all(bss_path))
+
+    def get_bss_security(self, bss_properties):
+        return self.create_bss_security(bss_properties['WPA'],
+                                        bss_properties['RSN'])
+
+    def create_bss_security(self, wpa_array, rsn_array):
         proto = self.get_protocol(wpa_array, rsn_array)
         key_mgmt, group = self.get_keymgmt_group(wpa_array, rsn_array, proto)
         return create_security(proto, key_mgmt, group)
@@ -204,25 +550,26 @@ class WpaSupplicant(WiFi):
         return True
 
     # Names changung actions
-    def set_p2p_name(self, name='reach'):
-        self.replace("^p2p_ssid_postfix=.*", "p2p_ssid_postfix={}".format(name),
-                     self.p2p_supplicant_path)
+    def set_p2p_name(self, name='reach', transaction=None):
+        with self.edit_config(self.p2p_supplicant_path, transaction) as config:
+            config.set('p2p_ssid_postfix', name)
 
-    def get_p2p_name(self):
-        return self.re_search("(?<=^p2p_ssid_postfix=).*",
-                              self.p2p_supplicant_path)
+    def get_p2p_name(self, transaction=None):
+        return self.read_config(self.p2p_supplicant_path, transaction).get(
+            'p2p_ssid_postfix')
 
     # Network actions
     def find_network_path(self, aim_network):
-        for network in self.wpa_supplicant_interface.get_networks():
-            if self.wpa_network_manager.get_network_SSID(network) == \
-                    aim_network['ssid']:
-                return network
+        self.wpa_network_index.start()
+        return self.wpa_network_index.find_path(aim_network['ssid'])
 
     def get_current_network_ssid(self):
-        self.wpa_supplicant_interface.initialize()
         network = self.wpa_supplicant_interface.get_current_network()
-        return self.wpa_network_manager.get_network_SSID(network)
+        self.wpa_network_index.start()
+        ssid = self.wpa_network_index.get_ssid(network)
+        if ssid is None:
+            ssid = self.wpa_network_manager.get_network_SSID(network)
+        return ssid
 
     # Connection actions
     def start_network_connection(self, network):
@@ -233,10 +580,15 @@ class WpaSupplicant(WiFi):
             self.wpa_supplicant_interface.reassociate()
 
     def wait_untill_connection_complete(self):
-        while self.wpa_supplicant_interface.get_state() != "completed":
+        monitor = self.connection_monitor
+        monitor.update_state()
+        while monitor.state != "completed":
             if not self.connection_event.is_set():
                 raise RuntimeError("Can't connect to network")
-            time.sleep(0.5)
+            if monitor.failed:
+                raise RuntimeError("Network authentication failed")
+            if not monitor.wait(self.CONNECTION_POLL_INTERVAL):
+                monitor.update_state()
 
     def check_correct_connection(self, aim_network):
         if aim_network is not None:
@@ -244,6 +596,9 @@ class WpaSupplicant(WiFi):
                 raise RuntimeError("Network not available")
 
     def connect_to_network(self, network):
+        self.connection_monitor = ConnectionMonitor(
+            self.wpa_supplicant_interface)
+        self.connection_monitor.start()
         try:
             self.start_network_connection(network)
             self.wait_untill_connection_complete()
@@ -252,6 +607,8 @@ class WpaSupplicant(WiFi):
             return False
         else:
             return True
+        finally:
+            self.connection_monitor.stop()
 
     def start_connecting_thread(self, timeout):
         self.connection_timer = Timer(timeout, self.stop_connecting)